@@ -27,6 +27,10 @@ def create_app():
         from routes import register_routes  # or adapt if your route file is elsewhere
         register_routes(app)
 
+    # 2b) Register CLI commands (flask books import ...)
+    from commands import register_commands
+    register_commands(app)
+
     # 3) Define error handlers
     @app.errorhandler(400)
     def bad_request(error):
@@ -0,0 +1,83 @@
+# benchmarks/bench_borrow.py
+#
+# Borrow latency before and after folding the eligibility checks into one
+# statement. "legacy" replays the old student borrow (user lookup, book
+# lookup, unpaid-fines exists(), active-loan count, then the write).
+# --rtt adds a simulated network round trip per statement, since a local
+# SQLite file hides the cost of talking to a remote PostgreSQL server.
+#   python benchmarks/bench_borrow.py --repeat 2000 --rtt 0.5
+
+import argparse
+import itertools
+import time
+from datetime import datetime, timedelta
+
+from common import bench_app, seed_catalog, measure, report
+
+
+def legacy_borrow(user_id, book_id):
+    """The four-round-trip eligibility check the student route used to run."""
+    from sqlalchemy import exists
+    from models import db
+    from models.user_model import User
+    from models.book_model import Book
+    from models.transaction_model import BorrowedBook
+
+    user = User.query.get(user_id)
+    book = Book.get_active(book_id)
+    if not book or book.copies_available < 1:
+        return None, "unavailable"
+    if db.session.query(exists().where(
+        BorrowedBook.user_id == user_id, BorrowedBook.fine_amount > 0, BorrowedBook.fine_paid.is_(False)
+    )).scalar():
+        return None, "unpaid_fines"
+    if BorrowedBook.query.filter_by(user_id=user.id, returned=False).count() >= 3:
+        return None, "borrow_limit"
+
+    loan = BorrowedBook(user_id=user.id, book_id=book.id, due_date=datetime.utcnow() + timedelta(days=14))
+    book.copies_available -= 1
+    db.session.add(loan)
+    db.session.commit()
+    return loan, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--rtt", type=float, default=0.0, help="Simulated round trip per statement (ms)")
+    args = parser.parse_args()
+
+    app = bench_app()
+    with app.app_context():
+        from models import db
+        from models.user_model import User
+        from services.circulation_service import CirculationService
+
+        seed_catalog(args.books)
+        db.session.execute(User.__table__.insert(), [
+            {"name": f"user {i}", "email": f"user{i}@example.com", "password": "x"}
+            for i in range(2 * args.repeat)
+        ])
+        db.session.commit()
+
+        if args.rtt:
+            from sqlalchemy import event
+            event.listen(db.engine, "before_cursor_execute", lambda *_: time.sleep(args.rtt / 1000))
+
+        # Each call uses a fresh user and book so every borrow succeeds
+        users = itertools.count(1)
+        books = itertools.cycle(range(1, args.books + 1))
+
+        def run(borrow):
+            def call():
+                borrow(next(users), next(books))
+                db.session.remove()
+            return call
+
+        report("legacy borrow (4 reads + write)", measure(run(legacy_borrow), args.repeat))
+        report("borrow (1 read + write)", measure(run(CirculationService.borrow), args.repeat))
+
+
+if __name__ == "__main__":
+    main()
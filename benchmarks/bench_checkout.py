@@ -0,0 +1,98 @@
+# benchmarks/bench_checkout.py
+#
+# Stress-tests checkout with a pool of parallel borrowers: reports throughput
+# and latency, and counts loans handed out beyond the available copies.
+# --legacy runs the old read-check-decrement code for comparison.
+#   python benchmarks/bench_checkout.py --threads 64 --copies 50
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from common import bench_app, report
+
+
+def legacy_checkout(user_id, book_id):
+    """The read-check-write borrow every route used before CirculationService."""
+    from models import db
+    from models.book_model import Book
+    from models.transaction_model import BorrowedBook
+
+    book = Book.get_active(book_id)
+    if not book or book.copies_available < 1:
+        return None, "unavailable"
+    loan = BorrowedBook(user_id=user_id, book_id=book_id, due_date=datetime.utcnow() + timedelta(days=14))
+    book.copies_available -= 1
+    db.session.add(loan)
+    db.session.commit()
+    return loan, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--borrowers", type=int, default=640)
+    parser.add_argument("--copies", type=int, default=50)
+    parser.add_argument("--books", type=int, default=5)
+    parser.add_argument("--legacy", action="store_true")
+    args = parser.parse_args()
+
+    app = bench_app()
+    with app.app_context():
+        from models import db
+        from models.user_model import User
+        from models.book_model import Book, Category
+        from models.transaction_model import BorrowedBook
+        from services.circulation_service import CirculationService
+
+        category = Category(name="Bench")
+        db.session.add(category)
+        db.session.flush()
+        db.session.add_all(
+            Book(title=f"Book {i}", author="Bench", isbn=f"978{i:010d}", category_id=category.id,
+                 copies_available=args.copies)
+            for i in range(args.books)
+        )
+        db.session.execute(User.__table__.insert(), [
+            {"name": f"user {i}", "email": f"user{i}@example.com", "password": "x"}
+            for i in range(args.borrowers)
+        ])
+        db.session.commit()
+        book_ids = [book_id for (book_id,) in db.session.query(Book.id)]
+        user_ids = [user_id for (user_id,) in db.session.query(User.id)]
+
+    checkout = legacy_checkout if args.legacy else CirculationService.checkout
+    latencies = []
+
+    def borrow(index):
+        with app.app_context():
+            started = time.perf_counter()
+            try:
+                _, error = checkout(user_ids[index], book_ids[index % len(book_ids)])
+            except Exception:
+                db.session.rollback()
+                error = "error"
+            latencies.append((time.perf_counter() - started) * 1000)
+            return error
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        errors = list(pool.map(borrow, range(args.borrowers)))
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        loans = BorrowedBook.query.count()
+        lowest = min(copies for (copies,) in db.session.query(Book.copies_available))
+
+    capacity = args.copies * args.books
+    label = "legacy" if args.legacy else "atomic"
+    report(f"{label} checkout", latencies)
+    print(f"{args.borrowers} borrowers on {args.threads} threads in {elapsed:.2f} s "
+          f"({args.borrowers / elapsed:,.0f} checkouts/s), {errors.count(None)} succeeded, "
+          f"{errors.count('error')} errored")
+    print(f"loans={loans} capacity={capacity} oversubscribed={max(0, loans - capacity)} lowest copies={lowest}")
+
+
+if __name__ == "__main__":
+    main()
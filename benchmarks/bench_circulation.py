@@ -0,0 +1,101 @@
+# benchmarks/bench_circulation.py
+#
+# Per-operation latency of the circulation engine: eligibility check,
+# checkout, renewal, return (with fine assessment), fine settlement and the
+# desk batches (--batch items per issue/return request) and the nightly
+# fine accrual over --batch overdue loans. Every operation
+# runs against its own fresh loans so each call does real work. --rtt adds
+# a simulated network round trip per statement.
+#   python benchmarks/bench_circulation.py --repeat 2000 --batch 1000 --rtt 0.5
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from common import bench_app, seed_catalog, measure, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=1000, help="Items per desk batch")
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--rtt", type=float, default=0.0, help="Simulated round trip per statement (ms)")
+    args = parser.parse_args()
+
+    app = bench_app()
+    with app.app_context():
+        from sqlalchemy import event, update
+        from models import db
+        from models.book_model import Book
+        from models.user_model import User
+        from models.transaction_model import BorrowedBook, ACTIVE_LOAN
+        from services.circulation_service import CirculationService
+        from services.inventory_service import InventoryService
+
+        seed_catalog(args.books)
+        db.session.execute(update(Book).values(copies_available=5))
+        InventoryService.match_copies(db.session, dict.fromkeys(range(1, args.books + 1), 5))
+        db.session.execute(User.__table__.insert(), [
+            {"name": f"user {i}", "email": f"user{i}@example.com", "password": "x"}
+            for i in range(max(args.repeat, args.batch))
+        ])
+        db.session.commit()
+
+        if args.rtt:
+            event.listen(db.engine, "before_cursor_execute", lambda *_: time.sleep(args.rtt / 1000))
+
+        # One loan per user on its own book, so operations never contend
+        pairs = [(user_id, user_id % args.books + 1) for user_id in range(1, args.repeat + 1)]
+
+        def timed(label, operation):
+            calls = iter(pairs)
+
+            def call():
+                operation(*next(calls))
+                db.session.remove()
+            report(label, measure(call, len(pairs)))
+
+        timed("check_eligibility", CirculationService.check_eligibility)
+        timed("checkout", CirculationService.checkout)
+        timed("renew_loan", lambda user_id, book_id: CirculationService.renew_loan(user_id=user_id, book_id=book_id))
+
+        # Make every loan a few days late so returns assess a fine
+        db.session.execute(update(BorrowedBook).values(due_date=datetime.utcnow() - timedelta(days=3)))
+        db.session.commit()
+        timed("return_loan (+ fine)", lambda user_id, book_id: CirculationService.return_loan(user_id=user_id, book_id=book_id))
+
+        def settle(user_id, book_id):
+            CirculationService.settle_fines(user_id)
+            db.session.commit()
+        timed("settle_fines", settle)
+
+        # Desk batches: alternate issuing and returning the same stack
+        stack = [{"student_id": user_id, "book_id": book_id} for user_id, book_id in
+                 ((user_id, user_id % args.books + 1) for user_id in range(1, args.batch + 1))]
+        issue_timings, return_timings = [], []
+        for _ in range(args.batches):
+            issue_timings += measure(lambda: CirculationService.checkout_batch(stack), 1)
+            db.session.remove()
+            return_timings += measure(lambda: CirculationService.return_batch(stack), 1)
+            db.session.remove()
+        report(f"checkout_batch ({args.batch} items)", issue_timings)
+        report(f"return_batch ({args.batch} items)", return_timings)
+
+        # Nightly accrual over a stack of overdue loans; fines are reset so every run does the work
+        CirculationService.checkout_batch(stack)
+        db.session.execute(update(BorrowedBook).where(ACTIVE_LOAN)
+                           .values(due_date=datetime.utcnow() - timedelta(days=4)))
+        db.session.commit()
+        accrual_timings = []
+        for _ in range(args.batches):
+            db.session.execute(update(BorrowedBook).values(fine_amount=0))
+            db.session.commit()
+            accrual_timings += measure(CirculationService.accrue_fines, 1)
+            db.session.remove()
+        report(f"accrue_fines ({args.batch} overdue)", accrual_timings)
+
+
+if __name__ == "__main__":
+    main()
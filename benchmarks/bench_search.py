@@ -0,0 +1,51 @@
+# benchmarks/bench_search.py
+#
+# Compares the indexed full-text search against the old ilike scan, and
+# times "did you mean" suggestions for misspelled queries and typeahead
+# prefix lookups.
+#   python benchmarks/bench_search.py --rows 1000000
+
+import argparse
+
+from common import bench_app, seed_catalog, measure, report
+
+QUERIES = ["garden", "silent river", "smith", "hist", "golden stone jour"]
+MISSPELLED = ["gardn", "slient rivr", "smiht", "histroy"]
+PREFIXES = ["g", "ga", "gar", "garden s", "silent river gol"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    app = bench_app()
+    with app.app_context():
+        from services.search_service import SearchService
+        from services.typeahead_service import TypeaheadService
+
+        print(f"Seeding {args.rows} books...")
+        seed_catalog(args.rows)
+
+        for query in QUERIES:
+            report(f"ilike   '{query}'", measure(
+                lambda: SearchService.ilike_query(query).all(), args.repeat))
+            report(f"indexed '{query}'", measure(
+                lambda: SearchService.search(query, limit=50), args.repeat))
+
+        # Build the spelling index up front so only lookups are timed
+        SearchService.suggest(MISSPELLED[0])
+        for query in MISSPELLED:
+            report(f"suggest '{query}'", measure(
+                lambda: SearchService.suggest(query), args.repeat))
+
+        # Load the prefix index up front so only in-memory lookups are timed
+        TypeaheadService.suggest(PREFIXES[0])
+        for prefix in PREFIXES:
+            report(f"typeahead '{prefix}'", measure(
+                lambda: TypeaheadService.suggest(prefix), args.repeat * 50))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# benchmarks/common.py
+#
+# Shared helpers for the standalone benchmark scripts. Each script builds the
+# app against BENCH_DATABASE_URL (a throwaway SQLite file by default), seeds
+# synthetic data and prints latency percentiles.
+
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL", "sqlite:///bench.db")
+
+from config import Config
+
+Config.RATELIMIT_ENABLED = False
+
+WORDS = (
+    "history science garden river shadow empire silent winter ocean machine "
+    "kingdom secret light stone journey modern ancient theory design data "
+    "python network music city forest night storm glass iron golden"
+).split()
+SURNAMES = (
+    "smith johnson williams brown jones garcia miller davis rodriguez martinez "
+    "hernandez lopez gonzalez wilson anderson thomas taylor moore jackson martin"
+).split()
+
+
+def bench_app():
+    """Creates the app with a fresh schema on the benchmark database."""
+    from app import create_app
+    from models import db
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def seed_catalog(rows, categories=20, batch_size=10000, seed=42):
+    """Bulk-inserts `rows` synthetic books and their copies; must run inside an app context."""
+    from models import db
+    from models.book_model import Book, Category
+    from services.inventory_service import InventoryService
+
+    rng = random.Random(seed)
+    db.session.execute(
+        Category.__table__.insert(),
+        [{"name": f"Category {i}"} for i in range(categories)],
+    )
+    category_ids = [row.id for row in db.session.query(Category.id)]
+
+    for start in range(0, rows, batch_size):
+        inserted = db.session.execute(Book.__table__.insert().returning(Book.id, Book.copies_available), [
+            {
+                "title": " ".join(rng.choices(WORDS, k=rng.randint(2, 5))).title(),
+                "author": f"{rng.choice(WORDS).title()} {rng.choice(SURNAMES).title()}",
+                "isbn": f"978{i:010d}",
+                "category_id": rng.choice(category_ids),
+                "copies_available": rng.randint(0, 5),
+            }
+            for i in range(start, min(start + batch_size, rows))
+        ])
+        InventoryService.match_copies(db.session, dict(inserted.all()))
+        db.session.commit()
+
+
+def measure(fn, repeat):
+    """Calls fn `repeat` times and returns the latencies in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(label, timings):
+    """Prints p50/p99/mean for a list of millisecond latencies."""
+    ordered = sorted(timings)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"{label:<32} p50={statistics.median(ordered):8.2f} ms  "
+          f"p99={p99:8.2f} ms  mean={statistics.fmean(ordered):8.2f} ms  n={len(ordered)}")
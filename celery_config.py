@@ -1,6 +1,7 @@
 import os
 import logging
 from celery import Celery
+from celery.schedules import crontab
 from flask import Flask
 
 # Configure logging for Celery
@@ -20,6 +21,33 @@ def init_celery(app: Flask):
             task_serializer="json",
             accept_content=["json"],
             timezone="UTC",
+            imports=("tasks.notification_tasks", "tasks.payment_tasks", "tasks.circulation_tasks",
+                     "tasks.reservation_tasks"),
+            beat_schedule={
+                # Loans turn overdue with time, so summaries are refreshed periodically
+                "reconcile-circulation-summaries": {
+                    "task": "tasks.circulation_tasks.reconcile_circulation_summaries_task",
+                    "schedule": app.config["SUMMARY_RECONCILE_INTERVAL"],
+                },
+                "accrue-fines-nightly": {
+                    "task": "tasks.circulation_tasks.accrue_fines_task",
+                    "schedule": crontab(hour=app.config["FINE_ACCRUAL_HOUR"], minute=0),
+                },
+                # Emails queued by requests (e.g. reservation notices) go out from here
+                "drain-notification-outbox": {
+                    "task": "tasks.notification_tasks.drain_outbox_task",
+                    "schedule": app.config["OUTBOX_POLL_INTERVAL"],
+                },
+                # Uncollected holds pass to the next student in line
+                "expire-reservation-holds": {
+                    "task": "tasks.reservation_tasks.expire_holds_task",
+                    "schedule": app.config["HOLD_EXPIRY_INTERVAL"],
+                },
+                "check-inventory": {
+                    "task": "tasks.circulation_tasks.check_inventory_task",
+                    "schedule": app.config["INVENTORY_CHECK_INTERVAL"],
+                },
+            },
         )
         logging.info("✅ Celery successfully configured with Redis broker.")
     except Exception as e:
@@ -0,0 +1,87 @@
+# commands.py
+
+import click
+from flask import Flask
+from flask.cli import AppGroup
+
+from services.circulation_service import CirculationService
+from services.import_service import ImportService
+from services.inventory_service import InventoryService
+from services.reservation_service import ReservationService
+from services.summary_service import SummaryService
+
+books_cli = AppGroup("books", help="Catalog maintenance commands.")
+circulation_cli = AppGroup("circulation", help="Circulation maintenance commands.")
+
+
+@books_cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(ImportService.FORMATS), help="Defaults to the file extension.")
+@click.option("--chunk-size", type=int, default=None, help="Rows per transaction (IMPORT_CHUNK_SIZE).")
+def import_books(path, fmt, chunk_size):
+    """Bulk-imports books from a CSV or JSONL file."""
+    fmt = fmt or ImportService.detect_format(path)
+    with open(path, "rb") as stream:
+        report = ImportService.import_books(ImportService.read_rows(stream, fmt), chunk_size)
+
+    for error in report["errors"]:
+        click.echo(f"line {error['line']}: {error['error']} (isbn={error['isbn']})", err=True)
+    click.echo(
+        f"✅ Imported {report['imported']} of {report['processed']} rows "
+        f"({report['failed']} failed, {report['categories_created']} new categories)"
+    )
+
+
+@books_cli.command("check-inventory")
+@click.option("--dry-run", is_flag=True, help="Only report drift, do not repair it.")
+@click.option("--batch-size", type=int, default=None, help="Books repaired per transaction (INVENTORY_REPAIR_BATCH_SIZE).")
+def check_inventory(dry_run, batch_size):
+    """Checks every book's copy counters against its copies and active loans and repairs drift."""
+    report = InventoryService.check_consistency(repair=not dry_run, batch_size=batch_size)
+    click.echo(
+        f"✅ {report['drifted']} books drifted" +
+        (" (dry run)" if dry_run else f", repaired in {report['batches']} batches")
+    )
+    if report["book_ids"]:
+        click.echo(f"Drifted books: {', '.join(map(str, report['book_ids']))}", err=True)
+
+
+@circulation_cli.command("reconcile")
+@click.option("--dry-run", is_flag=True, help="Only report drift, do not repair it.")
+def reconcile_summaries(dry_run):
+    """Recomputes every user's circulation summary and repairs drift."""
+    report = SummaryService.reconcile(repair=not dry_run)
+    click.echo(
+        f"✅ Checked {report['checked']} users: {report['drifted']} drifted, {report['missing']} missing, "
+        f"{report['overdue_refreshed']} overdue counts refreshed" + (" (dry run)" if dry_run else "")
+    )
+    if report["user_ids"]:
+        click.echo(f"Drifted users: {', '.join(map(str, report['user_ids']))}", err=True)
+
+
+@circulation_cli.command("accrue-fines")
+@click.option("--chunk-size", type=int, default=None, help="Overdue loans per transaction (FINE_ACCRUAL_CHUNK_SIZE).")
+def accrue_fines(chunk_size):
+    """Brings the fines of all overdue active loans up to date."""
+    report = CirculationService.accrue_fines(chunk_size=chunk_size)
+    click.echo(
+        f"✅ Accrued fines as of {report['as_of']}: {report['touched']} loans of {report['users']} users "
+        f"in {report['chunks']} chunks ({report['elapsed_ms']} ms)"
+    )
+
+
+@circulation_cli.command("expire-holds")
+@click.option("--batch-size", type=int, default=None, help="Holds per transaction (HOLD_EXPIRY_BATCH_SIZE).")
+def expire_holds(batch_size):
+    """Expires uncollected reservation holds and notifies the next students in line."""
+    report = ReservationService.expire_holds(batch_size=batch_size)
+    click.echo(
+        f"✅ Expired {report['expired']} holds, notified {report['promoted']} next in line "
+        f"in {report['batches']} batches"
+    )
+
+
+def register_commands(app: Flask):
+    """Registers the custom `flask` CLI command groups."""
+    app.cli.add_command(books_cli)
+    app.cli.add_command(circulation_cli)
@@ -68,6 +68,14 @@ class Config:
 
     MAIL_DEFAULT_SENDER = MAIL_USERNAME if MAIL_USERNAME else "noreply@example.com"
 
+    # ─────────────────────────────────────────────────────────
+    #  Email Outbox (sent by Celery, never inside a request)
+    # ─────────────────────────────────────────────────────────
+    OUTBOX_POLL_INTERVAL = int(os.getenv("OUTBOX_POLL_INTERVAL", 10))  # Seconds between outbox drains
+    OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 100))  # Messages per SMTP connection and transaction
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 8))  # Attempts before a message is marked failed
+    OUTBOX_RETRY_BASE_SECONDS = int(os.getenv("OUTBOX_RETRY_BASE_SECONDS", 30))  # Backoff doubles from this per attempt
+
     # ─────────────────────────────────────────────────────────
     #  WebSocket (SocketIO) Settings
     # ─────────────────────────────────────────────────────────
@@ -84,3 +92,58 @@ class Config:
     # ─────────────────────────────────────────────────────────
     CELERY_BROKER_URL = REDIS_URL
     CELERY_RESULT_BACKEND = REDIS_URL
+
+    # ─────────────────────────────────────────────────────────
+    #  Catalog Pagination
+    # ─────────────────────────────────────────────────────────
+    CATALOG_PAGE_SIZE = int(os.getenv("CATALOG_PAGE_SIZE", 50))
+    CATALOG_MAX_PAGE_SIZE = int(os.getenv("CATALOG_MAX_PAGE_SIZE", 200))
+    CATALOG_EXPORT_BATCH_SIZE = int(os.getenv("CATALOG_EXPORT_BATCH_SIZE", 1000))
+    CHANGE_FEED_LAG_SECONDS = int(os.getenv("CHANGE_FEED_LAG_SECONDS", 2))  # Hold back rows that may still be committing
+
+    # ─────────────────────────────────────────────────────────
+    #  Catalog Search
+    # ─────────────────────────────────────────────────────────
+    SEARCH_SUGGESTION_LIMIT = int(os.getenv("SEARCH_SUGGESTION_LIMIT", 5))
+    SEARCH_SUGGEST_MAX_TOKENS = int(os.getenv("SEARCH_SUGGEST_MAX_TOKENS", 8))  # Later words are kept as typed
+    SEARCH_FACET_LIMIT = int(os.getenv("SEARCH_FACET_LIMIT", 20))  # Values returned per facet
+    FUZZY_INDEX_TTL = int(os.getenv("FUZZY_INDEX_TTL", 600))  # Seconds before the spelling index is rebuilt
+    TYPEAHEAD_LIMIT = int(os.getenv("TYPEAHEAD_LIMIT", 10))
+    TYPEAHEAD_MAX_LIMIT = int(os.getenv("TYPEAHEAD_MAX_LIMIT", 25))
+    TYPEAHEAD_SYNC_INTERVAL = float(os.getenv("TYPEAHEAD_SYNC_INTERVAL", 1))  # Seconds between change feed checks
+
+    # ─────────────────────────────────────────────────────────
+    #  Catalog Cache (Redis)
+    # ─────────────────────────────────────────────────────────
+    CATALOG_CACHE_ENABLED = os.getenv("CATALOG_CACHE_ENABLED", "True").lower() in ("true", "1", "yes")
+    CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", 300))
+    CACHE_RETRY_AFTER = int(os.getenv("CACHE_RETRY_AFTER", 30))  # Seconds to bypass Redis after an error
+
+    # ─────────────────────────────────────────────────────────
+    #  Bulk Catalog Import
+    # ─────────────────────────────────────────────────────────
+    IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", 5000))  # Rows resolved and inserted per transaction
+
+    # ─────────────────────────────────────────────────────────
+    #  Circulation (Desk Batches, Summaries, Fine Accrual)
+    # ─────────────────────────────────────────────────────────
+    CIRCULATION_BATCH_MAX_ITEMS = int(os.getenv("CIRCULATION_BATCH_MAX_ITEMS", 2000))  # Items per batch issue/return request
+    SUMMARY_RECONCILE_INTERVAL = int(os.getenv("SUMMARY_RECONCILE_INTERVAL", 3600))  # Seconds between summary reconcile runs
+    FINE_ACCRUAL_HOUR = int(os.getenv("FINE_ACCRUAL_HOUR", 1))  # UTC hour of the nightly fine accrual run
+    FINE_ACCRUAL_CHUNK_SIZE = int(os.getenv("FINE_ACCRUAL_CHUNK_SIZE", 5000))  # Overdue loans updated per transaction
+    INVENTORY_CHECK_INTERVAL = int(os.getenv("INVENTORY_CHECK_INTERVAL", 86400))  # Seconds between copy counter checks
+    INVENTORY_REPAIR_BATCH_SIZE = int(os.getenv("INVENTORY_REPAIR_BATCH_SIZE", 500))  # Drifted books repaired per transaction
+
+    # ─────────────────────────────────────────────────────────
+    #  Reservation Holds
+    # ─────────────────────────────────────────────────────────
+    HOLD_PICKUP_HOURS = int(os.getenv("HOLD_PICKUP_HOURS", 48))  # Hours a notified student has to collect the book
+    HOLD_EXPIRY_INTERVAL = int(os.getenv("HOLD_EXPIRY_INTERVAL", 900))  # Seconds between hold expiry runs
+    HOLD_EXPIRY_BATCH_SIZE = int(os.getenv("HOLD_EXPIRY_BATCH_SIZE", 500))  # Holds expired per transaction
+
+    # ─────────────────────────────────────────────────────────
+    #  Idempotency Keys (Redis)
+    # ─────────────────────────────────────────────────────────
+    IDEMPOTENCY_ENABLED = os.getenv("IDEMPOTENCY_ENABLED", "True").lower() in ("true", "1", "yes")
+    IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", 86400))  # Seconds a stored response is replayed
+    IDEMPOTENCY_LOCK_TTL = int(os.getenv("IDEMPOTENCY_LOCK_TTL", 30))  # Max seconds a request holds its key
@@ -1,5 +1,5 @@
 import logging
-from sqlalchemy import inspect
+from sqlalchemy import Float, Integer, inspect, text
 
 # Import the single db instance from extensions
 from extensions import db
@@ -28,3 +28,29 @@ def init_db(app):
 def get_db():
     """Returns the database instance."""
     return db
+
+def values_table(name, columns, rows):
+    """
+    Returns `rows` as an inline `(VALUES ...)` table named `name`, for
+    joining in UPDATE ... FROM. `columns` maps column names to Integer or
+    Float; the positional column1..N names work on SQLite and PostgreSQL.
+
+    Values are cast through int()/float() and inlined rather than bound:
+    a few thousand bind parameters cost more to build and cache-key than
+    the statement itself takes to run.
+    """
+    casts = {Integer: ("INTEGER", int), Float: ("FLOAT", float)}
+    selected = ", ".join(
+        f"CAST(column{i} AS {casts[sql_type][0]}) AS {column}"
+        for i, (column, sql_type) in enumerate(columns.items(), start=1)
+    )
+    converters = [casts[sql_type][1] for sql_type in columns.values()]
+    values = ", ".join(
+        "(" + ", ".join(repr(convert(value)) for convert, value in zip(converters, row)) + ")"
+        for row in rows
+    )
+    return (
+        text(f"SELECT {selected} FROM (VALUES {values}) AS {name}_rows")
+        .columns(**{column: sql_type for column, sql_type in columns.items()})
+        .subquery(name)
+    )
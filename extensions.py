@@ -1,6 +1,7 @@
 # extensions.py
 
 import os
+import redis
 from flask_sqlalchemy import SQLAlchemy
 from flask_mail import Mail
 from flask_migrate import Migrate
@@ -24,6 +25,14 @@ limiter = Limiter(
     default_limits=["200 per hour", "50 per minute"],
 )
 
+# Shared Redis client for application caches (connects lazily on first use)
+redis_client = redis.Redis.from_url(
+    REDIS_URL,
+    decode_responses=True,
+    socket_connect_timeout=1,
+    socket_timeout=1,
+)
+
 
 def init_extensions(app):
     """
@@ -40,6 +49,7 @@ def init_extensions(app):
             mail.init_app(app)
             jwt.init_app(app)
             limiter.init_app(app)
+            app.extensions["redis"] = redis_client
 
             # ✅ Ensure `socketio` is initialized
             socketio = SocketIO(
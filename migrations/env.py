@@ -90,9 +90,23 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    # the search indexes (SQLite FTS5 shadow tables, the PostgreSQL
+    # search_vector column) are managed by hand in their own migration
+    def include_object(object, name, type_, reflected, compare_to):
+        if type_ == 'table' and name.startswith('book_fts'):
+            return False
+        if type_ == 'column' and name == 'search_vector':
+            return False
+        if type_ == 'index' and name in (
+                'idx_book_search_vector', 'idx_book_title_trgm', 'idx_book_author_trgm'):
+            return False
+        return True
+
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    if conf_args.get("include_object") is None:
+        conf_args["include_object"] = include_object
 
     connectable = get_engine()
 
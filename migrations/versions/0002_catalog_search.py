@@ -0,0 +1,67 @@
+"""catalog full-text and trigram search
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 18:50:12.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+SQLITE_FTS = (
+    "CREATE VIRTUAL TABLE book_fts USING fts5("
+    "title, author, isbn, content='book', content_rowid='id')",
+    "CREATE TRIGGER book_fts_ai AFTER INSERT ON book BEGIN "
+    "INSERT INTO book_fts(rowid, title, author, isbn) "
+    "VALUES (new.id, new.title, new.author, new.isbn); END",
+    "CREATE TRIGGER book_fts_ad AFTER DELETE ON book BEGIN "
+    "INSERT INTO book_fts(book_fts, rowid, title, author, isbn) "
+    "VALUES ('delete', old.id, old.title, old.author, old.isbn); END",
+    "CREATE TRIGGER book_fts_au AFTER UPDATE OF title, author, isbn ON book BEGIN "
+    "INSERT INTO book_fts(book_fts, rowid, title, author, isbn) "
+    "VALUES ('delete', old.id, old.title, old.author, old.isbn); "
+    "INSERT INTO book_fts(rowid, title, author, isbn) "
+    "VALUES (new.id, new.title, new.author, new.isbn); END",
+    "INSERT INTO book_fts(book_fts) VALUES ('rebuild')",
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute("""
+            ALTER TABLE book ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+                setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+                setweight(to_tsvector('simple', coalesce(author, '')), 'B') ||
+                setweight(to_tsvector('simple', coalesce(isbn, '')), 'C')
+            ) STORED
+        """)
+        # Build the GIN indexes without blocking writes to the catalog
+        with op.get_context().autocommit_block():
+            op.execute("CREATE INDEX CONCURRENTLY idx_book_search_vector ON book USING GIN (search_vector)")
+            op.execute("CREATE INDEX CONCURRENTLY idx_book_title_trgm ON book USING GIN (lower(title) gin_trgm_ops)")
+            op.execute("CREATE INDEX CONCURRENTLY idx_book_author_trgm ON book USING GIN (lower(author) gin_trgm_ops)")
+    elif dialect == 'sqlite':
+        for statement in SQLITE_FTS:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        with op.get_context().autocommit_block():
+            for index in ('idx_book_author_trgm', 'idx_book_title_trgm', 'idx_book_search_vector'):
+                op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index}")
+        op.drop_column('book', 'search_vector')
+    elif dialect == 'sqlite':
+        for trigger in ('book_fts_au', 'book_fts_ad', 'book_fts_ai'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS book_fts")
@@ -0,0 +1,70 @@
+"""catalog change tracking (updated_at and soft-delete tombstones)
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 18:52:40.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# SQLite batch mode rebuilds `book` as a new table, which drops the FTS5 sync
+# triggers from 0002; they are put back after each rebuild.
+SQLITE_FTS_TRIGGERS = (
+    "CREATE TRIGGER IF NOT EXISTS book_fts_ai AFTER INSERT ON book BEGIN "
+    "INSERT INTO book_fts(rowid, title, author, isbn) "
+    "VALUES (new.id, new.title, new.author, new.isbn); END",
+    "CREATE TRIGGER IF NOT EXISTS book_fts_ad AFTER DELETE ON book BEGIN "
+    "INSERT INTO book_fts(book_fts, rowid, title, author, isbn) "
+    "VALUES ('delete', old.id, old.title, old.author, old.isbn); END",
+    "CREATE TRIGGER IF NOT EXISTS book_fts_au AFTER UPDATE OF title, author, isbn ON book BEGIN "
+    "INSERT INTO book_fts(book_fts, rowid, title, author, isbn) "
+    "VALUES ('delete', old.id, old.title, old.author, old.isbn); "
+    "INSERT INTO book_fts(rowid, title, author, isbn) "
+    "VALUES (new.id, new.title, new.author, new.isbn); END",
+)
+
+
+def _restore_fts_triggers():
+    if op.get_bind().dialect.name == 'sqlite':
+        for statement in SQLITE_FTS_TRIGGERS:
+            op.execute(statement)
+
+
+def upgrade():
+    for table in ('category', 'book'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+            batch_op.add_column(sa.Column('deleted_at', sa.DateTime(), nullable=True))
+
+        # Existing rows count as last changed when they were created
+        op.execute(f"UPDATE {table} SET updated_at = coalesce(created_at, CURRENT_TIMESTAMP)")
+
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+    _restore_fts_triggers()
+
+    # Built without blocking catalog writes on PostgreSQL (see 0004)
+    with op.get_context().autocommit_block():
+        for table in ('category', 'book'):
+            op.create_index(f'idx_{table}_updated_at', table, ['updated_at', 'id'], unique=False,
+                            postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table in ('book', 'category'):
+            op.drop_index(f'idx_{table}_updated_at', table_name=table, postgresql_concurrently=True)
+
+    for table in ('book', 'category'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('deleted_at')
+            batch_op.drop_column('updated_at')
+    _restore_fts_triggers()
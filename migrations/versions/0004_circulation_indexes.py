@@ -0,0 +1,47 @@
+"""partial and composite indexes for the circulation tables
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 18:55:05.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+# Predicates must match how the queries spell them (`returned = false`)
+ACTIVE_LOAN = sa.column('returned') == sa.false()
+UNPAID_FINE = (sa.column('fine_amount') > 0) & (sa.column('fine_paid') == sa.false())
+
+INDEXES = (
+    ('idx_borrowed_book_user_active', 'borrowed_book', ['user_id', 'book_id'], ACTIVE_LOAN),
+    ('idx_borrowed_book_book_active', 'borrowed_book', ['book_id'], ACTIVE_LOAN),
+    ('idx_borrowed_book_due_active', 'borrowed_book', ['due_date'], ACTIVE_LOAN),
+    ('idx_borrowed_book_unpaid_fines', 'borrowed_book', ['user_id'], UNPAID_FINE),
+    ('idx_reserved_books_queue', 'reserved_books', ['book_id', 'status', 'reserved_at'], None),
+    ('idx_notification_logs_user', 'notification_logs', ['user_id'], None),
+)
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction; on PostgreSQL
+    # this builds each index without blocking reads or writes to the table.
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns, unique=False,
+                postgresql_where=where, sqlite_where=where,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
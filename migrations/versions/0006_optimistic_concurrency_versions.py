@@ -0,0 +1,50 @@
+"""version columns for optimistic concurrency on book and borrowed_book
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 19:06:18.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+# Dropping a column rebuilds the table on SQLite, which loses these (see 0003)
+SQLITE_FTS_TRIGGERS = (
+    "CREATE TRIGGER IF NOT EXISTS book_fts_ai AFTER INSERT ON book BEGIN "
+    "INSERT INTO book_fts(rowid, title, author, isbn) "
+    "VALUES (new.id, new.title, new.author, new.isbn); END",
+    "CREATE TRIGGER IF NOT EXISTS book_fts_ad AFTER DELETE ON book BEGIN "
+    "INSERT INTO book_fts(book_fts, rowid, title, author, isbn) "
+    "VALUES ('delete', old.id, old.title, old.author, old.isbn); END",
+    "CREATE TRIGGER IF NOT EXISTS book_fts_au AFTER UPDATE OF title, author, isbn ON book BEGIN "
+    "INSERT INTO book_fts(book_fts, rowid, title, author, isbn) "
+    "VALUES ('delete', old.id, old.title, old.author, old.isbn); "
+    "INSERT INTO book_fts(rowid, title, author, isbn) "
+    "VALUES (new.id, new.title, new.author, new.isbn); END",
+)
+
+
+def upgrade():
+    # A constant server default makes this a metadata-only change on
+    # PostgreSQL 11+, and every existing row starts at version 1
+    op.add_column('book', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('borrowed_book', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('borrowed_book', schema=None) as batch_op:
+        batch_op.drop_column('version')
+
+    with op.batch_alter_table('book', schema=None) as batch_op:
+        batch_op.drop_column('version')
+
+    if op.get_bind().dialect.name == 'sqlite':
+        for statement in SQLITE_FTS_TRIGGERS:
+            op.execute(statement)
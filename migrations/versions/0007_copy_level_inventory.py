@@ -0,0 +1,83 @@
+"""copy-level inventory: book_copy rows with barcodes, loans linked to their copy
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 19:12:46.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+# Predicate must match how the queries spell it (`returned = false`, see 0004)
+ACTIVE_LOAN = sa.column('returned') == sa.false()
+
+# Existing stock has no labels yet: each book gets copies_available shelved
+# copies numbered B<book>-1..n, and each active loan one on-loan copy
+# B<book>-L<loan>, so copies_available still equals the available copies.
+BACKFILL = (
+    "WITH RECURSIVE seq(n) AS ("
+    " SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < (SELECT MAX(copies_available) FROM book)"
+    ") "
+    "INSERT INTO book_copy (book_id, barcode, status, created_at, updated_at) "
+    "SELECT book.id, 'B' || book.id || '-' || seq.n, 'available', CURRENT_TIMESTAMP, CURRENT_TIMESTAMP "
+    "FROM book JOIN seq ON seq.n <= book.copies_available",
+
+    "INSERT INTO book_copy (book_id, barcode, status, created_at, updated_at) "
+    "SELECT book_id, 'B' || book_id || '-L' || id, 'on_loan', CURRENT_TIMESTAMP, CURRENT_TIMESTAMP "
+    "FROM borrowed_book WHERE returned = false",
+
+    "UPDATE borrowed_book SET copy_id = ("
+    " SELECT book_copy.id FROM book_copy"
+    " WHERE book_copy.barcode = 'B' || borrowed_book.book_id || '-L' || borrowed_book.id"
+    ") WHERE returned = false",
+)
+
+
+def upgrade():
+    op.create_table('book_copy',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('barcode', sa.String(length=64), nullable=False),
+    sa.Column('status', sa.String(length=20), server_default='available', nullable=False),
+    sa.Column('location', sa.String(length=100), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['book_id'], ['book.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_book_copy_barcode', 'book_copy', ['barcode'], unique=True)
+    op.create_index('idx_book_copy_book_status', 'book_copy', ['book_id', 'status'], unique=False)
+
+    # Nullable and without a default: no table rewrite on PostgreSQL
+    with op.batch_alter_table('borrowed_book', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('copy_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_borrowed_book_copy_id', 'book_copy', ['copy_id'], ['id'])
+
+    for statement in BACKFILL:
+        op.execute(statement)
+
+    # Built without blocking circulation on PostgreSQL (see 0004)
+    with op.get_context().autocommit_block():
+        op.create_index('idx_borrowed_book_copy_active', 'borrowed_book', ['copy_id'], unique=False,
+                        postgresql_where=ACTIVE_LOAN, sqlite_where=ACTIVE_LOAN,
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('idx_borrowed_book_copy_active', table_name='borrowed_book', postgresql_concurrently=True)
+
+    with op.batch_alter_table('borrowed_book', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_borrowed_book_copy_id', type_='foreignkey')
+        batch_op.drop_column('copy_id')
+
+    op.drop_index('idx_book_copy_book_status', table_name='book_copy')
+    op.drop_index('idx_book_copy_barcode', table_name='book_copy')
+    op.drop_table('book_copy')
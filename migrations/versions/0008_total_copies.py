@@ -0,0 +1,51 @@
+"""total_copies counter on book (copies in circulation)
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 19:24:10.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+# Dropping a column rebuilds the table on SQLite, which loses these (see 0003)
+SQLITE_FTS_TRIGGERS = (
+    "CREATE TRIGGER IF NOT EXISTS book_fts_ai AFTER INSERT ON book BEGIN "
+    "INSERT INTO book_fts(rowid, title, author, isbn) "
+    "VALUES (new.id, new.title, new.author, new.isbn); END",
+    "CREATE TRIGGER IF NOT EXISTS book_fts_ad AFTER DELETE ON book BEGIN "
+    "INSERT INTO book_fts(book_fts, rowid, title, author, isbn) "
+    "VALUES ('delete', old.id, old.title, old.author, old.isbn); END",
+    "CREATE TRIGGER IF NOT EXISTS book_fts_au AFTER UPDATE OF title, author, isbn ON book BEGIN "
+    "INSERT INTO book_fts(book_fts, rowid, title, author, isbn) "
+    "VALUES ('delete', old.id, old.title, old.author, old.isbn); "
+    "INSERT INTO book_fts(rowid, title, author, isbn) "
+    "VALUES (new.id, new.title, new.author, new.isbn); END",
+)
+
+
+def upgrade():
+    op.add_column('book', sa.Column('total_copies', sa.Integer(), server_default='0', nullable=False))
+    # Counted from the copies backfilled in 0007, i.e. copies_available plus the active loans
+    op.execute(
+        "UPDATE book SET total_copies = ("
+        " SELECT COUNT(*) FROM book_copy"
+        " WHERE book_copy.book_id = book.id AND book_copy.status IN ('available', 'on_loan')"
+        ")"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('book', schema=None) as batch_op:
+        batch_op.drop_column('total_copies')
+
+    if op.get_bind().dialect.name == 'sqlite':
+        for statement in SQLITE_FTS_TRIGGERS:
+            op.execute(statement)
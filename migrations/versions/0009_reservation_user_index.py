@@ -0,0 +1,28 @@
+"""index for a student's own reservations (waitlist positions)
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 19:30:02.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Built without blocking reservations on PostgreSQL (see 0004)
+    with op.get_context().autocommit_block():
+        op.create_index('idx_reserved_books_user', 'reserved_books', ['user_id', 'status'], unique=False,
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('idx_reserved_books_user', table_name='reserved_books', postgresql_concurrently=True)
@@ -0,0 +1,41 @@
+"""transactional outbox for notification emails
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 19:20:19.861593
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+# Only due pending messages are ever read by the drain
+OUTBOX_PENDING = sa.column('status') == 'pending'
+
+
+def upgrade():
+    op.create_table('notification_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('topic', sa.String(length=50), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('status', sa.String(length=20), server_default='pending', nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('available_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.String(length=255), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_notification_outbox_due', 'notification_outbox', ['available_at', 'id'], unique=False,
+                    postgresql_where=OUTBOX_PENDING, sqlite_where=OUTBOX_PENDING)
+
+
+def downgrade():
+    op.drop_index('idx_notification_outbox_due', table_name='notification_outbox')
+    op.drop_table('notification_outbox')
@@ -0,0 +1,37 @@
+"""pickup window for notified reservations (hold expiry)
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18 19:22:40.716493
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+# Predicate must match how the queries spell it (see NOTIFIED_HOLD)
+NOTIFIED_HOLD = sa.column('status') == 'notified'
+
+
+def upgrade():
+    op.add_column('reserved_books', sa.Column('notified_at', sa.DateTime(), nullable=True))
+    # Holds notified before this column existed get a full pickup window from now
+    op.execute("UPDATE reserved_books SET notified_at = CURRENT_TIMESTAMP WHERE status = 'notified'")
+    # Built without blocking reservations on PostgreSQL (see 0004)
+    with op.get_context().autocommit_block():
+        op.create_index('idx_reserved_books_notified', 'reserved_books', ['notified_at'], unique=False,
+                        postgresql_where=NOTIFIED_HOLD, sqlite_where=NOTIFIED_HOLD,
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('idx_reserved_books_notified', table_name='reserved_books', postgresql_concurrently=True)
+    with op.batch_alter_table('reserved_books', schema=None) as batch_op:
+        batch_op.drop_column('notified_at')
@@ -5,9 +5,9 @@ from extensions import db
 
 # 2. Import all model classes
 from models.user_model import User, UserOTP
-from models.book_model import Category, Book
-from models.transaction_model import BorrowedBook, PaymentRecord
+from models.book_model import Category, Book, BookCopy
+from models.transaction_model import BorrowedBook, PaymentRecord, UserCirculationSummary
 from models.reservation_model import ReservedBook
-from models.notification_model import NotificationLog
+from models.notification_model import NotificationLog, OutboxMessage
 
 # That's it! No new db = SQLAlchemy() here.
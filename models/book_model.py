@@ -4,20 +4,33 @@ from models import db
 class Category(db.Model):
     """Stores Book Categories"""
     __tablename__ = "category"
+    __table_args__ = (db.Index("idx_category_updated_at", "updated_at", "id"),)
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=True)  # ✅ Tombstone for the change feed
 
     # ✅ Relationship to Books
     books = db.relationship("Book", backref="category", lazy=True, cascade="all, delete")
 
+    @classmethod
+    def get_active(cls, category_id):
+        """Returns the category unless it is missing or soft-deleted."""
+        category = cls.query.get(category_id)
+        return category if category and category.deleted_at is None else None
+
     def __repr__(self):
         return f"<Category {self.name}>"
 
 class Book(db.Model):
     """Stores Library Books"""
     __tablename__ = "book"
-    __table_args__ = (db.Index("idx_isbn", "isbn"),)
+    __table_args__ = (
+        db.Index("idx_isbn", "isbn"),
+        db.Index("idx_book_updated_at", "updated_at", "id"),  # ✅ Change feed scans
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
@@ -25,10 +38,97 @@ class Book(db.Model):
     isbn = db.Column(db.String(20), unique=True, nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey("category.id"), nullable=False)
     copies_available = db.Column(db.Integer, default=1)
+    total_copies = db.Column(db.Integer, nullable=False, server_default="0")  # ✅ Copies in circulation (available + on loan)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=True)  # ✅ Tombstone for the change feed
+    version = db.Column(db.Integer, nullable=False, server_default="1")  # ✅ Optimistic concurrency (If-Match)
+
+    # ✅ ORM flushes check and bump the version; Core UPDATEs must bump it themselves
+    __mapper_args__ = {"version_id_col": version}
 
     # ✅ Relationship to Borrowed Books
     borrowed_books = db.relationship("BorrowedBook", backref="book", lazy=True, cascade="all, delete")
 
+    @classmethod
+    def get_active(cls, book_id):
+        """Returns the book unless it is missing or soft-deleted."""
+        book = cls.query.get(book_id)
+        return book if book and book.deleted_at is None else None
+
     def __repr__(self):
         return f"<Book {self.title} - {self.author} - {self.isbn}>"
+
+class BookCopy(db.Model):
+    """Physical Copies of a Book, Identified by Barcode"""
+    __tablename__ = "book_copy"
+    __table_args__ = (
+        db.Index("idx_book_copy_barcode", "barcode", unique=True),  # ✅ O(1) desk scans
+        db.Index("idx_book_copy_book_status", "book_id", "status"),  # ✅ Free copy lookup and the inventory GROUP BY
+    )
+
+    # ✅ Book.copies_available counts the copies in "available", Book.total_copies
+    # those in "available" or "on_loan"
+    STATUSES = ("available", "on_loan", "damaged", "lost", "withdrawn")
+
+    id = db.Column(db.Integer, primary_key=True)
+    book_id = db.Column(db.Integer, db.ForeignKey("book.id"), nullable=False)
+    barcode = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="available", server_default="available")
+    location = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    book = db.relationship("Book", backref=db.backref("copies", lazy="dynamic"))
+
+    def __repr__(self):
+        return f"<BookCopy {self.barcode} - Book: {self.book_id} - {self.status}>"
+
+# ─────────────────────────────────────────────────────────
+#  Full-Text Search Index (see services/search_service.py)
+# ─────────────────────────────────────────────────────────
+# PostgreSQL: a stored tsvector weighted title (A) > author (B) > isbn (C)
+# with a GIN index. SQLite: an external-content FTS5 table kept in sync by
+# triggers. Both use plain word tokens (no stemming) so results match.
+db.event.listen(Book.__table__, "after_create", db.DDL("""
+    ALTER TABLE book ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(author, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(isbn, '')), 'C')
+    ) STORED
+""").execute_if(dialect="postgresql"))
+db.event.listen(Book.__table__, "after_create", db.DDL(
+    "CREATE INDEX idx_book_search_vector ON book USING GIN (search_vector)"
+).execute_if(dialect="postgresql"))
+
+# Trigram indexes back typo-tolerant "did you mean" matching on PostgreSQL
+db.event.listen(Book.__table__, "before_create", db.DDL(
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm"
+).execute_if(dialect="postgresql"))
+db.event.listen(Book.__table__, "after_create", db.DDL(
+    "CREATE INDEX idx_book_title_trgm ON book USING GIN (lower(title) gin_trgm_ops)"
+).execute_if(dialect="postgresql"))
+db.event.listen(Book.__table__, "after_create", db.DDL(
+    "CREATE INDEX idx_book_author_trgm ON book USING GIN (lower(author) gin_trgm_ops)"
+).execute_if(dialect="postgresql"))
+
+SQLITE_FTS_DDL = (
+    "CREATE VIRTUAL TABLE book_fts USING fts5("
+    "title, author, isbn, content='book', content_rowid='id')",
+    "CREATE TRIGGER book_fts_ai AFTER INSERT ON book BEGIN "
+    "INSERT INTO book_fts(rowid, title, author, isbn) "
+    "VALUES (new.id, new.title, new.author, new.isbn); END",
+    "CREATE TRIGGER book_fts_ad AFTER DELETE ON book BEGIN "
+    "INSERT INTO book_fts(book_fts, rowid, title, author, isbn) "
+    "VALUES ('delete', old.id, old.title, old.author, old.isbn); END",
+    "CREATE TRIGGER book_fts_au AFTER UPDATE OF title, author, isbn ON book BEGIN "
+    "INSERT INTO book_fts(book_fts, rowid, title, author, isbn) "
+    "VALUES ('delete', old.id, old.title, old.author, old.isbn); "
+    "INSERT INTO book_fts(rowid, title, author, isbn) "
+    "VALUES (new.id, new.title, new.author, new.isbn); END",
+)
+for statement in SQLITE_FTS_DDL:
+    db.event.listen(Book.__table__, "after_create", db.DDL(statement).execute_if(dialect="sqlite"))
+db.event.listen(Book.__table__, "before_drop", db.DDL(
+    "DROP TABLE IF EXISTS book_fts"
+).execute_if(dialect="sqlite"))
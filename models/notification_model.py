@@ -4,6 +4,7 @@ from models import db
 class NotificationLog(db.Model):
     """Tracks Email Notifications"""
     __tablename__ = "notification_logs"
+    __table_args__ = (db.Index("idx_notification_logs_user", "user_id"),)
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
@@ -15,3 +16,25 @@ class NotificationLog(db.Model):
 
     def __repr__(self):
         return f"<NotificationLog User: {self.user_id}, Type: {self.notification_type}, Sent: {self.sent_at}>"
+
+class OutboxMessage(db.Model):
+    """Emails Queued in the Same Transaction as the Change That Triggers Them"""
+    __tablename__ = "notification_outbox"
+
+    id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(50), nullable=False)  # ✅ Picks the message builder (see OutboxService.TOPICS)
+    payload = db.Column(db.JSON, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="pending", server_default="pending")  # pending | sent | failed
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # ✅ Not before this (retry backoff)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.String(255), nullable=True)
+
+    def __repr__(self):
+        return f"<OutboxMessage {self.id} {self.topic} - {self.status} (attempts: {self.attempts})>"
+
+# ✅ The drain only ever reads due pending messages, so only those are indexed
+OUTBOX_PENDING = OutboxMessage.status == "pending"
+db.Index("idx_notification_outbox_due", OutboxMessage.available_at, OutboxMessage.id,
+         postgresql_where=OUTBOX_PENDING, sqlite_where=OUTBOX_PENDING)
@@ -4,15 +4,28 @@ from models import db
 class ReservedBook(db.Model):
     """Tracks Book Reservations"""
     __tablename__ = "reserved_books"
+    __table_args__ = (
+        db.Index("idx_reserved_books_queue", "book_id", "status", "reserved_at"),  # ✅ Waitlist order per book
+        db.Index("idx_reserved_books_user", "user_id", "status"),  # ✅ A student's own holds
+    )
+
+    # ✅ pending -> notified (a copy is waiting) -> fulfilled (borrowed) or expired (not collected in time)
+    STATUSES = ("pending", "notified", "fulfilled", "expired")
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     book_id = db.Column(db.Integer, db.ForeignKey("book.id"), nullable=False)
     reserved_at = db.Column(db.DateTime, default=datetime.utcnow)
     status = db.Column(db.String(20), default="pending")
+    notified_at = db.Column(db.DateTime, nullable=True)  # ✅ Start of the pickup window
 
     user = db.relationship("User", backref="reservations", lazy=True)
     book = db.relationship("Book", backref="reservations", lazy=True)
 
     def __repr__(self):
         return f"<ReservedBook User: {self.user_id}, Book: {self.book_id}, Status: {self.status}>"
+
+# ✅ The expiry job scans only holds waiting to be collected, oldest first
+NOTIFIED_HOLD = ReservedBook.status == "notified"
+db.Index("idx_reserved_books_notified", ReservedBook.notified_at,
+         postgresql_where=NOTIFIED_HOLD, sqlite_where=NOTIFIED_HOLD)
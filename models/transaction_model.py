@@ -8,12 +8,19 @@ class BorrowedBook(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     book_id = db.Column(db.Integer, db.ForeignKey('book.id'), nullable=False)
+    copy_id = db.Column(db.Integer, db.ForeignKey('book_copy.id'), nullable=True)  # ✅ The physical copy lent out
     borrow_date = db.Column(db.DateTime, default=db.func.current_timestamp())
     due_date = db.Column(db.DateTime, nullable=False)
     returned = db.Column(db.Boolean, default=False)
     return_date = db.Column(db.DateTime, nullable=True)
     fine_amount = db.Column(db.Float, default=0.0)
     fine_paid = db.Column(db.Boolean, default=False)
+    version = db.Column(db.Integer, nullable=False, server_default="1")  # ✅ Optimistic concurrency
+
+    # ✅ ORM flushes check and bump the version; Core UPDATEs must bump it themselves
+    __mapper_args__ = {"version_id_col": version}
+
+    copy = db.relationship("BookCopy", backref="loans")
 
     def calculate_fine(self):
         """Calculate fine for late return"""
@@ -26,6 +33,37 @@ class BorrowedBook(db.Model):
     def __repr__(self):
         return f"<BorrowedBook User: {self.user_id}, Book: {self.book_id}, Due: {self.due_date}, Returned: {self.returned}>"
 
+# ✅ Partial indexes for the hot circulation queries (migration 0004). Queries
+# must spell the predicates the same way (`returned == False`, not `.is_(False)`)
+# for the planner to match them.
+ACTIVE_LOAN = BorrowedBook.returned == db.false()
+UNPAID_FINE = (BorrowedBook.fine_amount > 0) & (BorrowedBook.fine_paid == db.false())
+db.Index("idx_borrowed_book_user_active", BorrowedBook.user_id, BorrowedBook.book_id,
+         postgresql_where=ACTIVE_LOAN, sqlite_where=ACTIVE_LOAN)
+db.Index("idx_borrowed_book_book_active", BorrowedBook.book_id,
+         postgresql_where=ACTIVE_LOAN, sqlite_where=ACTIVE_LOAN)
+db.Index("idx_borrowed_book_due_active", BorrowedBook.due_date,
+         postgresql_where=ACTIVE_LOAN, sqlite_where=ACTIVE_LOAN)
+db.Index("idx_borrowed_book_unpaid_fines", BorrowedBook.user_id,
+         postgresql_where=UNPAID_FINE, sqlite_where=UNPAID_FINE)
+db.Index("idx_borrowed_book_copy_active", BorrowedBook.copy_id,
+         postgresql_where=ACTIVE_LOAN, sqlite_where=ACTIVE_LOAN)
+
+class UserCirculationSummary(db.Model):
+    """Per-User Circulation Counters (kept in step with borrowed_book by CirculationService)"""
+    __tablename__ = "user_circulation_summary"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    active_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    unpaid_fine_total = db.Column(db.Float, nullable=False, default=0.0, server_default="0")
+    overdue_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    user = db.relationship("User", backref=db.backref("circulation_summary", uselist=False))
+
+    def __repr__(self):
+        return f"<UserCirculationSummary User: {self.user_id}, Active: {self.active_count}, Fines: {self.unpaid_fine_total}>"
+
 class PaymentRecord(db.Model):
     """Tracks Fine Payments"""
     __tablename__ = "payment_records"
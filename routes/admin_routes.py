@@ -1,18 +1,24 @@
 # routes/admin_routes.py
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from functools import wraps
 from sqlalchemy import func
-from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
 
 # Import the single db instance and necessary models
 from models import db
 from models.user_model import User
 from models.book_model import Book
-from models.transaction_model import BorrowedBook
+from models.transaction_model import BorrowedBook, UserCirculationSummary
 from models.reservation_model import ReservedBook
 from services.book_service import BookService
+from services.cache_service import CatalogCache, conditional_get
+from services.circulation_service import CirculationService
+from services.inventory_service import InventoryService
+from services.reservation_service import ReservationService
+from services.summary_service import SummaryService
 
 admin_bp = Blueprint("admin", __name__)
 
@@ -34,32 +40,29 @@ def admin_required(fn):
 def get_admin_stats():
     """Returns Total Users, Borrowed Books, and Returned Books"""
     total_users = db.session.query(User).count()
-    borrowed_books = db.session.query(BorrowedBook).filter_by(returned=False).count()
+    totals = SummaryService.totals()
     returned_books = db.session.query(BorrowedBook).filter_by(returned=True).count()
+    inventory = InventoryService.last_report()
 
     return jsonify({
         "total_users": total_users,
-        "borrowed_books": borrowed_books,
-        "returned_books": returned_books
+        "borrowed_books": totals["active_loans"],
+        "returned_books": returned_books,
+        "overdue_books": totals["overdue_loans"],
+        "unpaid_fines": totals["unpaid_fines"],
+        "inventory_drift": inventory["drifted"] if inventory else None,
     }), 200
 
-# ✅ Get All Books
+# ✅ Get All Books (Keyset Paginated: ?after=<id>&limit=<n>)
 @admin_bp.route("/books", methods=["GET"])
 @admin_required
+@conditional_get(lambda: [CatalogCache.version_key("list")])
 def get_books():
-    books = Book.query.all()
-    books_list = [
-        {
-            "id": book.id,
-            "title": book.title,
-            "author": book.author,
-            "isbn": book.isbn,
-            "category_id": book.category_id,
-            "copies_available": book.copies_available
-        }
-        for book in books
-    ]
-    return jsonify(books_list), 200
+    books, next_cursor = BookService.get_books_page(
+        after=request.args.get("after", type=int),
+        limit=request.args.get("limit", type=int),
+    )
+    return jsonify({"books": books, "next_cursor": next_cursor}), 200
 
 # ✅ Add a Book
 @admin_bp.route("/books/add", methods=["POST"])
@@ -83,33 +86,26 @@ def add_book():
 @admin_bp.route("/books/update/<int:book_id>", methods=["PUT"])
 @admin_required
 def update_book(book_id):
-    data = request.json
-    book = Book.query.get(book_id)
+    # ✅ Same optimistic concurrency rules as PUT /books/update/<id>
+    try:
+        expected_version = BookService.expected_version(request.if_match)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    if not book:
-        return jsonify({"error": "Book not found"}), 404
-
-    book.title = data.get("title", book.title)
-    book.author = data.get("author", book.author)
-    book.isbn = data.get("isbn", book.isbn)
-    book.category_id = data.get("category_id", book.category_id)
-    book.copies_available = data.get("copies_available", book.copies_available)
-
-    db.session.commit()
-    return jsonify({"message": "Book updated successfully"}), 200
+    return BookService.update_book(book_id, request.json, expected_version)
 
 # ✅ Delete a Book
 @admin_bp.route("/books/delete/<int:book_id>", methods=["DELETE"])
 @admin_required
 def delete_book(book_id):
-    book = Book.query.get(book_id)
+    book = Book.get_active(book_id)
 
     if not book:
         return jsonify({"error": "Book not found"}), 404
 
     ReservedBook.query.filter_by(book_id=book_id).delete()
 
-    db.session.delete(book)
+    book.deleted_at = datetime.utcnow()  # ✅ Soft delete (tombstone for the change feed)
     db.session.commit()
     return jsonify({"message": "Book deleted successfully"}), 200
 
@@ -117,18 +113,55 @@ def delete_book(book_id):
 @admin_bp.route("/students", methods=["GET"])
 @admin_required
 def get_students():
-    students = User.query.filter_by(role="user").all()
+    # ✅ Circulation counters come from the summary row, not a borrowed_book scan per student
+    students = (
+        db.session.query(User, UserCirculationSummary)
+        .outerjoin(UserCirculationSummary, UserCirculationSummary.user_id == User.id)
+        .filter(User.role == "user")
+        .all()
+    )
     students_list = [
         {
             "id": student.id,
             "name": student.name,
             "email": student.email,
-            "status": "Blocked" if student.is_blocked else "Active"
+            "status": "Blocked" if student.is_blocked else "Active",
+            "active_loans": summary.active_count if summary else 0,
+            "overdue_loans": summary.overdue_count if summary else 0,
+            "unpaid_fines": summary.unpaid_fine_total if summary else 0
         }
-        for student in students
+        for student, summary in students
     ]
     return jsonify(students_list), 200
 
+# ✅ Student Circulation Summary
+@admin_bp.route("/students/<int:student_id>/summary", methods=["GET"])
+@admin_required
+def get_student_summary(student_id):
+    student = User.query.get(student_id)
+    if not student or student.role != "user":
+        return jsonify({"error": "Student not found"}), 404
+    return jsonify(SummaryService.get(student.id)), 200
+
+# ✅ Reconcile Circulation Summaries (?dry_run=true only reports drift)
+@admin_bp.route("/circulation/reconcile", methods=["POST"])
+@admin_required
+def reconcile_summaries():
+    dry_run = request.args.get("dry_run", "false").lower() in ("true", "1", "yes")
+    return jsonify(SummaryService.reconcile(repair=not dry_run)), 200
+
+# ✅ Accrue Fines on Overdue Loans (normally run nightly by Celery beat)
+@admin_bp.route("/circulation/accrue-fines", methods=["POST"])
+@admin_required
+def accrue_fines():
+    return jsonify(CirculationService.accrue_fines()), 200
+
+# ✅ Expire Uncollected Holds and Notify the Next in Line (normally run by Celery beat)
+@admin_bp.route("/reservations/expire-holds", methods=["POST"])
+@admin_required
+def expire_holds():
+    return jsonify(ReservationService.expire_holds()), 200
+
 
 # ✅ Block/Unblock Student
 @admin_bp.route("/students/block/<int:student_id>", methods=["PUT"])
@@ -144,60 +177,125 @@ def block_unblock_student(student_id):
 
     return jsonify({"message": f"Student {'Blocked' if student.is_blocked else 'Unblocked'} successfully"}), 200
 
-# ✅ Issue a Book to Student
+# ✅ Issue a Book to Student (a scanned "barcode" lends that exact copy)
 @admin_bp.route("/books/issue", methods=["POST"])
 @admin_required
 def issue_book():
     data = request.json
     book_id = data.get("book_id")
     student_id = data.get("student_id")
+    barcode = data.get("barcode")
 
     student = User.query.get(student_id)
-    book = Book.query.get(book_id)
-
     if not student or student.role != "user":
         return jsonify({"error": "Student not found"}), 404
-    if not book or book.copies_available < 1:
-        return jsonify({"error": "Book not available"}), 400
-
-    due_date = datetime.utcnow() + timedelta(days=14)
-    new_borrow = BorrowedBook(
-        user_id=student.id,
-        book_id=book.id,
-        due_date=due_date,
-        returned=False
-    )
 
-    book.copies_available -= 1
-    db.session.add(new_borrow)
-    db.session.commit()
+    if barcode:
+        loan, error = CirculationService.checkout_copy(student.id, barcode)
+    else:
+        loan, error = CirculationService.checkout(student.id, book_id)
+    if error:
+        message, status = CirculationService.ERRORS[error]
+        return jsonify({"error": message}), status
 
-    return jsonify({"message": "Book issued successfully", "due_date": due_date.strftime("%Y-%m-%d")}), 200
+    return jsonify({"message": "Book issued successfully", "due_date": loan.due_date.strftime("%Y-%m-%d")}), 200
 
-# ✅ Accept Book Return
+# ✅ Accept Book Return (by book, or by the scanned copy's "barcode")
 @admin_bp.route("/books/return", methods=["POST"])
 @admin_required
 def accept_return():
     data = request.json
     book_id = data.get("book_id")
     student_id = data.get("student_id")
+    barcode = data.get("barcode")
+    if student_id is None or (book_id is None and not barcode):
+        return jsonify({"error": "student_id and either book_id or barcode are required"}), 400
 
-    borrow_record = BorrowedBook.query.filter_by(
-        user_id=student_id,
-        book_id=book_id,
-        returned=False
-    ).first()
-
-    if not borrow_record:
+    loan, error = CirculationService.return_loan(user_id=student_id, book_id=book_id, barcode=barcode)
+    if error:
         return jsonify({"error": "No active borrow record found"}), 400
 
-    book = Book.query.get(book_id)
-    book.copies_available += 1
-    borrow_record.returned = True
-    borrow_record.return_date = datetime.utcnow()
+    return jsonify({"message": "Book return accepted", "fine_amount": loan.fine_amount}), 200
 
-    db.session.commit()
-    return jsonify({"message": "Book return accepted"}), 200
+# ✅ Batch Issue / Return for the Circulation Desk ({"items": [{"student_id", "book_id"}, ...]})
+def _batch_items():
+    data = request.get_json(silent=True) or {}
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({"error": "items must be a non-empty list"}), 400)
+    limit = current_app.config["CIRCULATION_BATCH_MAX_ITEMS"]
+    if len(items) > limit:
+        return None, (jsonify({"error": f"At most {limit} items per batch"}), 400)
+    return items, None
+
+@admin_bp.route("/books/issue/batch", methods=["POST"])
+@admin_required
+def issue_books_batch():
+    items, error = _batch_items()
+    if error:
+        return error
+    return jsonify(CirculationService.checkout_batch(items)), 200
+
+@admin_bp.route("/books/return/batch", methods=["POST"])
+@admin_required
+def return_books_batch():
+    items, error = _batch_items()
+    if error:
+        return error
+    return jsonify(CirculationService.return_batch(items)), 200
+
+# ✅ Look Up a Copy by Barcode (unique index; includes its active loan)
+@admin_bp.route("/copies/<barcode>", methods=["GET"])
+@admin_required
+def get_copy(barcode):
+    copy = InventoryService.find(barcode)
+    if not copy:
+        return jsonify({"error": "Copy not found"}), 404
+    return jsonify(InventoryService.serialize(copy)), 200
+
+# ✅ Add Copies to a Book ({"count": n} generated barcodes and/or {"barcodes": [...]})
+@admin_bp.route("/books/<int:book_id>/copies", methods=["POST"])
+@admin_required
+def add_copies(book_id):
+    data = request.get_json(silent=True) or {}
+    count = data.get("count", 0)
+    barcodes = data.get("barcodes", [])
+    if not isinstance(count, int) or count < 0 or not isinstance(barcodes, list) \
+            or not all(isinstance(barcode, str) and barcode for barcode in barcodes):
+        return jsonify({"error": "count must be a non-negative integer and barcodes a list of strings"}), 400
+    if not count and not barcodes:
+        return jsonify({"error": "Nothing to add"}), 400
+    if len(set(barcodes)) != len(barcodes):
+        return jsonify({"error": "barcodes must be unique"}), 400
+
+    try:
+        added = InventoryService.add_copies(book_id, count, barcodes, data.get("location"))
+        if added is None:
+            db.session.rollback()
+            return jsonify({"error": "Book not found"}), 404
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "A copy with one of these barcodes already exists"}), 409
+    return jsonify({"message": f"{len(added)} copies added", "barcodes": added}), 201
+
+# ✅ Change a Copy's Shelf Status (available, damaged, lost, withdrawn) or Location
+@admin_bp.route("/copies/<barcode>", methods=["PUT"])
+@admin_required
+def update_copy(barcode):
+    data = request.get_json(silent=True) or {}
+    copy, reason = InventoryService.set_status(barcode, data.get("status"), data.get("location"))
+    if reason:
+        message, status = InventoryService.ERRORS[reason]
+        return jsonify({"error": message}), status
+    return jsonify(InventoryService.serialize(copy)), 200
+
+# ✅ Audit Copy Counters Against Copies and Active Loans (?dry_run=true only reports drift)
+@admin_bp.route("/inventory/check", methods=["POST"])
+@admin_required
+def check_inventory():
+    dry_run = request.args.get("dry_run", "false").lower() in ("true", "1", "yes")
+    return jsonify(InventoryService.check_consistency(repair=not dry_run)), 200
 
 # ✅ View Borrowed Books
 @admin_bp.route("/books/borrowed", methods=["GET"])
@@ -226,6 +324,14 @@ def manage_extension():
     book_id = data.get("book_id")
     student_id = data.get("student_id")
     action = data.get("action")
+    if student_id is None or book_id is None:
+        return jsonify({"error": "student_id and book_id are required"}), 400
+
+    if action == "accept":
+        loan, error = CirculationService.renew_loan(user_id=student_id, book_id=book_id)
+        if error:
+            return jsonify({"error": "No active borrow record found"}), 400
+        return jsonify({"message": "Extension approved", "new_due_date": loan.due_date.strftime("%Y-%m-%d")}), 200
 
     borrow_record = BorrowedBook.query.filter_by(
         user_id=student_id,
@@ -236,11 +342,7 @@ def manage_extension():
     if not borrow_record:
         return jsonify({"error": "No active borrow record found"}), 400
 
-    if action == "accept":
-        borrow_record.due_date += timedelta(days=7)
-        db.session.commit()
-        return jsonify({"message": "Extension approved", "new_due_date": borrow_record.due_date.strftime("%Y-%m-%d")}), 200
-    elif action == "reject":
+    if action == "reject":
         return jsonify({"message": "Extension request rejected"}), 200
     else:
         return jsonify({"error": "Invalid action"}), 400
@@ -250,12 +352,14 @@ def manage_extension():
 @admin_required
 def generate_reports():
     """Generate Admin Dashboard Reports"""
-    total_books = db.session.query(func.count(Book.id)).scalar()
+    total_books = db.session.query(func.count(Book.id)).filter(Book.deleted_at.is_(None)).scalar()
     total_students = db.session.query(func.count(User.id)).filter(User.role == "user").scalar()
-    borrowed_books = db.session.query(func.count(BorrowedBook.id)).filter(BorrowedBook.returned == False).scalar()
+    totals = SummaryService.totals()
 
     return jsonify({
         "total_books": total_books,
         "total_students": total_students,
-        "borrowed_books": borrowed_books
+        "borrowed_books": totals["active_loans"],
+        "overdue_books": totals["overdue_loans"],
+        "unpaid_fines": totals["unpaid_fines"]
     }), 200
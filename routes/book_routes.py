@@ -1,17 +1,23 @@
 # routes/book_routes.py
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from functools import wraps
 from datetime import datetime
 import traceback
+import json
 
 # Import the single db instance and relevant models
 from models import db
 from models.book_model import Book, Category
 from models.user_model import User
-from models.transaction_model import BorrowedBook
 from models.reservation_model import ReservedBook
+from services.book_service import BookService
+from services.cache_service import CatalogCache, conditional_get
+from services.circulation_service import CirculationService
+from services.idempotency_service import idempotent
+from services.import_service import ImportService
+from services.typeahead_service import TypeaheadService
 
 book_bp = Blueprint("books", __name__)
 
@@ -38,15 +44,36 @@ def add_category():
         return jsonify({"error": "Category name is required"}), 400
 
     existing_category = Category.query.filter_by(name=name).first()
-    if existing_category:
+    if existing_category and existing_category.deleted_at is None:
         return jsonify({"error": "Category already exists"}), 400
 
-    new_category = Category(name=name)
-    db.session.add(new_category)
+    # ✅ Re-adding a deleted category revives its tombstone
+    if existing_category:
+        existing_category.deleted_at = None
+        new_category = existing_category
+    else:
+        new_category = Category(name=name)
+        db.session.add(new_category)
     db.session.commit()
 
     return jsonify({"message": "Category added successfully", "id": new_category.id}), 201
 
+# ✅ Delete Category (Admin Only, soft delete so feed clients see the removal)
+@book_bp.route("/category/delete/<int:category_id>", methods=["DELETE"])
+@admin_required
+def delete_category(category_id):
+    category = Category.get_active(category_id)
+    if not category:
+        return jsonify({"error": "Category not found"}), 404
+
+    if Book.query.filter_by(category_id=category_id, deleted_at=None).first():
+        return jsonify({"error": "Category still has books"}), 400
+
+    category.deleted_at = datetime.utcnow()
+    db.session.commit()
+
+    return jsonify({"message": "Category deleted successfully"}), 200
+
 # ✅ Add Book (Admin Only)
 @book_bp.route("/add", methods=["POST"])
 @admin_required
@@ -57,26 +84,26 @@ def add_book():
         author = data.get("author")
         isbn = data.get("isbn")
         category_id = int(data.get("category_id"))
-        copies_available = int(data.get("copies_available", 1))
+        copies_available = BookService.parse_copies(data.get("copies_available", 1))
 
         if not title or not author or not isbn or not category_id:
             return jsonify({"error": "All fields (title, author, isbn, category_id) are required"}), 400
 
-        category = Category.query.get(category_id)
+        category = Category.get_active(category_id)
         if not category:
             return jsonify({"error": "Category not found"}), 404
 
         existing_book = Book.query.filter_by(isbn=isbn).first()
-        if existing_book:
+        if existing_book and existing_book.deleted_at is None:
             return jsonify({"error": "Book with this ISBN already exists"}), 400
 
-        new_book = Book(
-            title=title,
-            author=author,
-            isbn=isbn,
-            category_id=category_id,
-            copies_available=copies_available
-        )
+        # ✅ Re-adding a deleted ISBN revives its row (the change feed reports an update)
+        new_book = existing_book or Book(isbn=isbn)
+        new_book.title = title
+        new_book.author = author
+        new_book.category_id = category_id
+        new_book.copies_available = copies_available
+        new_book.deleted_at = None
         db.session.add(new_book)
         db.session.commit()
 
@@ -89,77 +116,131 @@ def add_book():
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
-# ✅ View All Books
+# ✅ Bulk Import Books (Admin Only, CSV or JSONL upload, streamed)
+@book_bp.route("/import", methods=["POST"])
+@admin_required
+def import_books():
+    upload = request.files.get("file")
+    if upload:
+        stream, filename, mimetype = upload.stream, upload.filename, upload.mimetype
+    else:
+        stream, filename, mimetype = request.stream, None, request.mimetype
+
+    fmt = request.args.get("format") or ImportService.detect_format(filename, mimetype)
+    if fmt not in ImportService.FORMATS:
+        return jsonify({"error": "Unsupported format (use csv or jsonl)"}), 400
+
+    report = ImportService.import_books(ImportService.read_rows(stream, fmt))
+    return jsonify(report), 200
+
+# ✅ View All Books (Keyset Paginated: ?after=<id>&limit=<n>)
 @book_bp.route("/", methods=["GET"])
+@conditional_get(lambda: [CatalogCache.version_key("list")])
 def get_books():
-    books = Book.query.all()
-    books_list = [
-        {
-            "id": book.id,
-            "title": book.title,
-            "author": book.author,
-            "isbn": book.isbn,
-            "category_id": book.category_id,
-            "category_name": book.category.name if book.category else None,
-            "copies_available": book.copies_available,
-        }
-        for book in books
-    ]
-    return jsonify(books_list), 200
-
-# ✅ Get Books by Category
+    books, next_cursor = BookService.get_books_page(
+        after=request.args.get("after", type=int),
+        limit=request.args.get("limit", type=int),
+    )
+    return jsonify({"books": books, "next_cursor": next_cursor}), 200
+
+# ✅ View a Single Book (ETag is the book version: answers If-None-Match, and goes back as If-Match on update)
+@book_bp.route("/<int:book_id>", methods=["GET"])
+def get_book(book_id):
+    response, status = BookService.get_book_by_id(book_id)
+    if status != 200:
+        return response, status
+    return response.make_conditional(request)
+
+# ✅ Search Books (Ranked: ?q=<text>&page=<n>&limit=<n>&category_id=<id>&available=<bool>&facets=<bool>)
+@book_bp.route("/search", methods=["GET"])
+def search_books():
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "Search query is required"}), 400
+
+    def flag(name):
+        value = request.args.get(name)
+        return None if value is None else value.lower() in ("true", "1", "yes")
+
+    return BookService.search_books(
+        query,
+        page=request.args.get("page", 1, type=int),
+        limit=request.args.get("limit", type=int),
+        category_id=request.args.get("category_id", type=int),
+        available=flag("available"),
+        facets=bool(flag("facets")),
+    )
+
+# ✅ Typeahead Suggestions (?q=<prefix>&limit=<n>, served from memory)
+@book_bp.route("/suggest", methods=["GET"])
+def suggest_books():
+    query = request.args.get("q", "")
+    suggestions = TypeaheadService.suggest(query, request.args.get("limit", type=int)) if query.strip() else []
+    return jsonify({"query": query, "suggestions": suggestions}), 200
+
+# ✅ Catalog Cache Hit/Miss Counters (Admin Only)
+@book_bp.route("/cache/stats", methods=["GET"])
+@admin_required
+def cache_stats():
+    return jsonify(CatalogCache.stats()), 200
+
+# ✅ Export Full Catalog (Streamed as NDJSON)
+@book_bp.route("/export", methods=["GET"])
+@jwt_required()
+def export_books():
+    def generate():
+        for book in BookService.iter_books():
+            yield json.dumps(book) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+# ✅ Catalog Change Feed (?since=<next_since>&limit=<n>)
+@book_bp.route("/changes", methods=["GET"])
+@jwt_required()
+def get_changes():
+    return BookService.get_changes(
+        since=request.args.get("since") or None,
+        limit=request.args.get("limit", type=int),
+    )
+
+# ✅ Get Books by Category (Keyset Paginated)
 @book_bp.route("/category/<int:category_id>", methods=["GET"])
+@conditional_get(lambda category_id: [CatalogCache.version_key("category", category_id)])
 def get_books_by_category(category_id):
-    category = Category.query.get(category_id)
+    category = Category.get_active(category_id)
     if not category:
         return jsonify({"error": "Category not found"}), 404
 
-    books = Book.query.filter_by(category_id=category_id).all()
-    books_list = [
-        {
-            "id": book.id,
-            "title": book.title,
-            "author": book.author,
-            "isbn": book.isbn,
-            "copies_available": book.copies_available,
-        }
-        for book in books
-    ]
-    return jsonify({"category": category.name, "books": books_list}), 200
+    books, next_cursor = BookService.get_books_page(
+        after=request.args.get("after", type=int),
+        limit=request.args.get("limit", type=int),
+        category_id=category_id,
+    )
+    return jsonify({"category": category.name, "books": books, "next_cursor": next_cursor}), 200
 
 # ✅ Update a Book (Admin Only)
 @book_bp.route("/update/<int:book_id>", methods=["PUT"])
 @admin_required
 def update_book(book_id):
-    book = Book.query.get(book_id)
-    if not book:
-        return jsonify({"error": "Book not found"}), 404
-
-    data = request.json
-    book.title = data.get("title", book.title)
-    book.author = data.get("author", book.author)
-    book.isbn = data.get("isbn", book.isbn)
-    book.copies_available = data.get("copies_available", book.copies_available)
-
-    new_category_id = data.get("category_id", book.category_id)
-    if new_category_id and not Category.query.get(new_category_id):
-        return jsonify({"error": "Category not found"}), 404
-    book.category_id = new_category_id
-
-    db.session.commit()
+    # ✅ If-Match: "<version>" makes the edit fail with 409 if the book changed since it was read
+    try:
+        expected_version = BookService.expected_version(request.if_match)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    return jsonify({"message": "Book updated successfully"}), 200
+    return BookService.update_book(book_id, request.json, expected_version)
 
 # ✅ Delete a Book (Admin Only)
 @book_bp.route("/delete/<int:book_id>", methods=["DELETE"])
 @admin_required
 def delete_book(book_id):
-    book = Book.query.get(book_id)
+    book = Book.get_active(book_id)
     if not book:
         return jsonify({"error": "Book not found"}), 404
 
+    # ✅ Soft delete: keep a tombstone so feed clients can drop their copy
     ReservedBook.query.filter_by(book_id=book_id).delete()
-    db.session.delete(book)
+    book.deleted_at = datetime.utcnow()
     db.session.commit()
 
     return jsonify({"message": "Book deleted successfully"}), 200
@@ -167,53 +248,33 @@ def delete_book(book_id):
 # ✅ Borrow Book
 @book_bp.route("/borrow", methods=["POST"])
 @jwt_required()
+@idempotent
 def borrow_book():
     data = request.json
     user_id = get_jwt_identity()
     book_id = data.get("book_id")
 
-    book = Book.query.get(book_id)
-    if not book:
-        return jsonify({"error": "Book not found"}), 404
-    if book.copies_available < 1:
-        return jsonify({"error": "No copies available"}), 400
-
-    borrowed_book = BorrowedBook(
-        user_id=user_id,
-        book_id=book_id,
-        due_date=datetime.utcnow(),
-        returned=False
-    )
-    book.copies_available -= 1
+    # Same rules as the student route: blocks, fines, the borrow limit, duplicates and stock
+    loan, reason = CirculationService.borrow(user_id, book_id)
+    if reason:
+        message, status = CirculationService.ERRORS[reason]
+        return jsonify({"error": message}), status
 
-    db.session.add(borrowed_book)
-    db.session.commit()
-
-    return jsonify({"message": "Book borrowed successfully"}), 200
+    return jsonify({"message": "Book borrowed successfully", "due_date": loan.due_date.strftime("%Y-%m-%d")}), 200
 
 # ✅ Return Book
 @book_bp.route("/return", methods=["POST"])
 @jwt_required()
+@idempotent
 def return_book():
     data = request.json
     user_id = get_jwt_identity()
     book_id = data.get("book_id")
+    if book_id is None:
+        return jsonify({"error": "book_id is required"}), 400
 
-    borrowed_book = BorrowedBook.query.filter_by(
-        user_id=user_id,
-        book_id=book_id,
-        returned=False
-    ).first()
-
-    if not borrowed_book:
+    loan, error = CirculationService.return_loan(user_id=user_id, book_id=book_id)
+    if error:
         return jsonify({"error": "Borrowed book not found"}), 404
 
-    borrowed_book.returned = True
-    borrowed_book.return_date = datetime.utcnow()
-
-    book = Book.query.get(book_id)
-    if book:
-        book.copies_available += 1
-
-    db.session.commit()
-    return jsonify({"message": "Book returned successfully"}), 200
+    return jsonify({"message": "Book returned successfully", "fine_amount": loan.fine_amount}), 200
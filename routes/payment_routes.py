@@ -5,12 +5,14 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 
 # Import PaymentService (handles db logic inside)
 from services.payment_service import PaymentService
+from services.idempotency_service import idempotent
 
 payment_bp = Blueprint("payment", __name__)
 
 # ✅ Generate Razorpay Order
 @payment_bp.route("/create-payment", methods=["POST"])
 @jwt_required()
+@idempotent
 def create_payment():
     user_id = get_jwt_identity()
     data = request.json
@@ -19,11 +21,12 @@ def create_payment():
     if not amount or amount <= 0:
         return jsonify({"error": "Invalid payment amount"}), 400
 
-    return jsonify(PaymentService.create_payment(user_id, amount))
+    return PaymentService.create_payment(user_id, amount)
 
 # ✅ Confirm Payment
 @payment_bp.route("/confirm-payment", methods=["POST"])
 @jwt_required()
+@idempotent
 def confirm_payment():
     user_id = get_jwt_identity()
     data = request.json
@@ -34,6 +37,6 @@ def confirm_payment():
     if not transaction_id or not razorpay_payment_id or not amount:
         return jsonify({"error": "Missing required payment details"}), 400
 
-    return jsonify(PaymentService.confirm_payment(
+    return PaymentService.confirm_payment(
         user_id, transaction_id, razorpay_payment_id, amount
-    ))
+    )
@@ -1,6 +1,6 @@
 # routes/reservation_routes.py
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 # Import the ReservationService (handles all db logic)
@@ -17,7 +17,8 @@ def reserve_book(book_id):
     if not book_id or book_id <= 0:
         return jsonify({"error": "Invalid book ID"}), 400
 
-    return jsonify(ReservationService.reserve_book(user_id, book_id))
+    # ✅ The service already returns (response, status)
+    return ReservationService.reserve_book(user_id, book_id)
 
 # ✅ Cancel a Reservation
 @reservation_bp.route("/cancel/<int:book_id>", methods=["DELETE"])
@@ -28,4 +29,21 @@ def cancel_reservation(book_id):
     if not book_id or book_id <= 0:
         return jsonify({"error": "Invalid book ID"}), 400
 
-    return jsonify(ReservationService.cancel_reservation(user_id, book_id))
+    return ReservationService.cancel_reservation(user_id, book_id)
+
+# ✅ My Place in a Book's Waitlist (position, queue length, estimated availability)
+@reservation_bp.route("/position/<int:book_id>", methods=["GET"])
+@jwt_required()
+def reservation_position(book_id):
+    user_id = get_jwt_identity()
+    holds = ReservationService.holds(user_id, book_id=book_id)
+    if not holds:
+        return jsonify({"error": "No active reservation found"}), 404
+    return jsonify(holds[0]), 200
+
+# ✅ All My Holds with Positions (one statement for every queue)
+@reservation_bp.route("/mine", methods=["GET"])
+@jwt_required()
+def my_reservations():
+    user_id = get_jwt_identity()
+    return jsonify({"reservations": ReservationService.holds(user_id)}), 200
@@ -1,6 +1,6 @@
 # services/admin_service.py
 
-from datetime import datetime, timedelta
+from datetime import datetime
 from sqlalchemy.exc import SQLAlchemyError
 from flask import jsonify
 
@@ -10,8 +10,9 @@ from models import db
 # Import your models
 from models.user_model import User
 from models.book_model import Book
-from models.transaction_model import BorrowedBook
+from models.transaction_model import BorrowedBook, ACTIVE_LOAN
 from models.reservation_model import ReservedBook
+from services.circulation_service import CirculationService
 
 class AdminService:
     """Service class handling admin operations."""
@@ -42,51 +43,41 @@ class AdminService:
     def issue_book(book_id, student_id):
         """Issues a book to a student."""
         student = User.query.get(student_id)
-        book = Book.query.get(book_id)
-
         if not student or student.role != "user":
             return jsonify({"error": "Student not found"}), 404
-        if not book or book.copies_available < 1:
-            return jsonify({"error": "Book not available"}), 400
-
-        due_date = datetime.utcnow() + timedelta(days=14)  # 2-week borrow period
-        new_borrow = BorrowedBook(
-            user_id=student.id,
-            book_id=book.id,
-            due_date=due_date,
-            returned=False
-        )
 
-        book.copies_available -= 1
-        db.session.add(new_borrow)
-        db.session.commit()
+        loan, error = CirculationService.checkout(student.id, book_id)
+        if error:
+            return jsonify({"error": "Book not available"}), 400
 
         return jsonify({"message": "Book issued successfully",
-                        "due_date": due_date.strftime("%Y-%m-%d")}), 200
+                        "due_date": loan.due_date.strftime("%Y-%m-%d")}), 200
 
     @staticmethod
     def accept_return(book_id, student_id):
         """Accepts a book return from a student."""
-        borrow_record = BorrowedBook.query.filter_by(
-            user_id=student_id,
-            book_id=book_id,
-            returned=False
-        ).first()
-
-        if not borrow_record:
+        if student_id is None or book_id is None:
+            return jsonify({"error": "student_id and book_id are required"}), 400
+        loan, error = CirculationService.return_loan(user_id=student_id, book_id=book_id)
+        if error:
             return jsonify({"error": "No active borrow record found"}), 400
 
-        book = Book.query.get(book_id)
-        book.copies_available += 1
-        borrow_record.returned = True
-        borrow_record.return_date = datetime.utcnow()
-
-        db.session.commit()
-        return jsonify({"message": "Book return accepted"}), 200
+        return jsonify({"message": "Book return accepted", "fine_amount": loan.fine_amount}), 200
 
     @staticmethod
     def approve_extension(book_id, student_id, action):
         """Approves or rejects a book extension request."""
+        if student_id is None or book_id is None:
+            return jsonify({"error": "student_id and book_id are required"}), 400
+        if action == "accept":
+            loan, error = CirculationService.renew_loan(user_id=student_id, book_id=book_id)
+            if error:
+                return jsonify({"error": "No active borrow record found"}), 400
+            return jsonify({
+                "message": "Extension approved",
+                "new_due_date": loan.due_date.strftime("%Y-%m-%d")
+            }), 200
+
         borrow_record = BorrowedBook.query.filter_by(
             user_id=student_id,
             book_id=book_id,
@@ -96,14 +87,7 @@ class AdminService:
         if not borrow_record:
             return jsonify({"error": "No active borrow record found"}), 400
 
-        if action == "accept":
-            borrow_record.due_date += timedelta(days=7)
-            db.session.commit()
-            return jsonify({
-                "message": "Extension approved",
-                "new_due_date": borrow_record.due_date.strftime("%Y-%m-%d")
-            }), 200
-        elif action == "reject":
+        if action == "reject":
             return jsonify({"message": "Extension request rejected"}), 200
         else:
             return jsonify({"error": "Invalid action"}), 400
@@ -111,15 +95,15 @@ class AdminService:
     @staticmethod
     def delete_book(book_id):
         """Deletes a book and removes associated reservations."""
-        book = Book.query.get(book_id)
+        book = Book.get_active(book_id)
         if not book:
             return jsonify({"error": "Book not found"}), 404
 
         try:
-            # Delete all reservations before deleting the book
+            # Delete all reservations, then tombstone the book for the change feed
             ReservedBook.query.filter_by(book_id=book_id).delete()
 
-            db.session.delete(book)
+            book.deleted_at = datetime.utcnow()
             db.session.commit()
             return jsonify({"message": "Book deleted successfully"}), 200
         except SQLAlchemyError as e:
@@ -130,9 +114,9 @@ class AdminService:
     def generate_reports():
         """Generates reports for the library system."""
         try:
-            total_books = db.session.query(db.func.count(Book.id)).scalar()
+            total_books = db.session.query(db.func.count(Book.id)).filter(Book.deleted_at.is_(None)).scalar()
             total_students = db.session.query(db.func.count(User.id)).filter(User.role == "user").scalar()
-            borrowed_books = db.session.query(db.func.count(BorrowedBook.id)).filter(BorrowedBook.returned.is_(False)).scalar()
+            borrowed_books = db.session.query(db.func.count(BorrowedBook.id)).filter(ACTIVE_LOAN).scalar()
 
             return jsonify({
                 "total_books": total_books,
@@ -1,34 +1,62 @@
 # services/book_service.py
 
+from datetime import datetime
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm.exc import StaleDataError
 from flask import jsonify
 
 # Import the single db instance
 from models import db
 from models.book_model import Book, Category
+from models.transaction_model import BorrowedBook, ACTIVE_LOAN
+from services.cache_service import CatalogCache
+from services.catalog_service import CatalogService
+from services.reservation_service import ReservationService
+from services.search_service import SearchService
 
 class BookService:
     """Service class handling book-related operations."""
 
+    @staticmethod
+    def parse_copies(value):
+        """
+        Coerces a stock count from JSON (an int or a numeric string) to a
+        non-negative int; raises ValueError for anything else.
+        """
+        if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+            raise ValueError("copies_available must be a non-negative integer")
+        try:
+            count = int(value)
+        except (TypeError, ValueError):
+            raise ValueError("copies_available must be a non-negative integer")
+        if count < 0:
+            raise ValueError("copies_available must be a non-negative integer")
+        return count
+
     @staticmethod
     def add_book(title, author, isbn, category_id, copies_available):
         """Adds a new book to the library."""
+        try:
+            copies_available = BookService.parse_copies(copies_available)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
         existing_book = Book.query.filter_by(isbn=isbn).first()
-        if existing_book:
+        if existing_book and existing_book.deleted_at is None:
             return {"error": "Book with this ISBN already exists"}, 400
 
-        category = Category.query.get(category_id)
+        category = Category.get_active(category_id)
         if not category:
             return {"error": "Category not found"}, 404
 
         try:
-            new_book = Book(
-                title=title,
-                author=author,
-                isbn=isbn,
-                category_id=category_id,
-                copies_available=copies_available
-            )
+            # Re-adding a deleted ISBN revives its tombstone
+            new_book = existing_book or Book(isbn=isbn)
+            new_book.title = title
+            new_book.author = author
+            new_book.category_id = category_id
+            new_book.copies_available = copies_available
+            new_book.deleted_at = None
             db.session.add(new_book)
             db.session.commit()
 
@@ -41,66 +69,167 @@ class BookService:
 
 
     @staticmethod
-    def get_books():
-        """Fetches all books in the library."""
-        books = Book.query.all()
-        return jsonify([
-            {
-                "id": book.id,
-                "title": book.title,
-                "author": book.author,
-                "isbn": book.isbn,
-                "category_id": book.category_id,
-                "copies_available": book.copies_available
-            }
-            for book in books
-        ]), 200
+    def get_books_page(after=None, limit=None, category_id=None):
+        """
+        Fetches one keyset page of serialized books ordered by id.
+        Returns (books, next_cursor); next_cursor is None on the last page.
+        Pages are served from the catalog cache when possible.
+        """
+        limit = CatalogService.page_size(limit)
+        if category_id is None:
+            name, version_keys = f"list:{after}:{limit}", [CatalogCache.version_key("list")]
+        else:
+            name = f"category:{category_id}:{after}:{limit}"
+            version_keys = [CatalogCache.version_key("category", category_id)]
+
+        books, next_cursor = CatalogCache.get_or_load(
+            name, version_keys, lambda: CatalogService.get_page(after, limit, category_id)
+        )
+        return books, next_cursor
 
     @staticmethod
-    def get_book_by_id(book_id):
-        """Fetches details of a single book by ID."""
-        book = Book.query.get(book_id)
-        if not book:
-            return jsonify({"error": "Book not found"}), 404
+    def iter_books(batch_size=None):
+        """Yields every serialized book in id order, one keyset batch at a time."""
+        return CatalogService.iter_all(batch_size)
+
+    @staticmethod
+    def get_books(after=None, limit=None):
+        """Fetches one page of books in the library."""
+        books, next_cursor = BookService.get_books_page(after, limit)
+        return jsonify({"books": books, "next_cursor": next_cursor}), 200
+
+    @staticmethod
+    def get_changes(since=None, limit=None):
+        """
+        Returns books and categories created, changed or deleted since the
+        `since` watermark. Deleted rows come back with "deleted": true.
+        """
+        try:
+            books, categories, next_since, has_more = CatalogService.get_changes(since, limit)
+        except ValueError:
+            return jsonify({"error": "Invalid since token"}), 400
 
         return jsonify({
-            "id": book.id,
-            "title": book.title,
-            "author": book.author,
-            "isbn": book.isbn,
-            "category_id": book.category_id,
-            "copies_available": book.copies_available
+            "books": books,
+            "categories": categories,
+            "next_since": next_since,
+            "has_more": has_more,
         }), 200
 
     @staticmethod
-    def update_book(book_id, title, author, isbn, category_id, copies_available):
-        """Updates a book's details in the library."""
-        book = Book.query.get(book_id)
+    def get_book_by_id(book_id):
+        """
+        Fetches details of a single book by ID. The response carries the
+        book's version as a strong ETag, ready to be sent back as If-Match.
+        """
+        book = CatalogCache.get_or_load(
+            f"book:{book_id}",
+            [CatalogCache.version_key("book", book_id)],
+            lambda: CatalogService.get_book(book_id),
+        )
         if not book:
             return jsonify({"error": "Book not found"}), 404
 
-        book.title = title
-        book.author = author
-        book.isbn = isbn
+        response = jsonify(book)
+        response.set_etag(str(book["version"]))
+        return response, 200
+
+    @staticmethod
+    def update_book(book_id, data, expected_version=None):
+        """
+        Applies an admin's edits to a book. `expected_version` is the version
+        the client read (from If-Match): if the book changed since, including
+        a checkout or return, nothing is written and 409 is returned. The
+        flush itself is versioned too, so a change landing between our read
+        and the write is also a conflict rather than a lost update.
+
+        Stock is best edited as `total_copies` (copies owned and in
+        circulation): copies_available is then derived as the total minus
+        the copies currently on loan, instead of being overwritten. Copies
+        the edit puts on the shelf go to the waitlist in the same commit.
+        """
+        book = Book.get_active(book_id)
+        if not book:
+            return jsonify({"error": "Book not found"}), 404
+        if expected_version is not None and book.version != expected_version:
+            return BookService._conflict(book.version)
+
+        category_id = data.get("category_id", book.category_id)
+        if category_id != book.category_id and not Category.get_active(category_id):
+            return jsonify({"error": "Category not found"}), 404
+
+        copies_available = book.copies_available
+        if "copies_available" in data:
+            try:
+                copies_available = BookService.parse_copies(data["copies_available"])
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+        if "total_copies" in data:
+            on_loan = BorrowedBook.query.filter(BorrowedBook.book_id == book_id, ACTIVE_LOAN).count()
+            try:
+                total = BookService.parse_copies(data["total_copies"])
+            except ValueError:
+                total = None
+            if total is None or total < on_loan:
+                return jsonify({"error": f"total_copies must be an integer of at least {on_loan} (copies on loan)"}), 400
+            copies_available = total - on_loan
+
+        added = (copies_available or 0) - (book.copies_available or 0)
+        book.title = data.get("title", book.title)
+        book.author = data.get("author", book.author)
+        book.isbn = data.get("isbn", book.isbn)
         book.category_id = category_id
         book.copies_available = copies_available
 
         try:
+            if added > 0:
+                db.session.flush()
+                ReservationService.promote({book_id: added})
             db.session.commit()
-            return jsonify({"message": "Book updated successfully"}), 200
+        except StaleDataError:
+            db.session.rollback()
+            return BookService._conflict(db.session.get(Book, book_id).version)
         except SQLAlchemyError as e:
             db.session.rollback()
             return jsonify({"error": f"Database error: {str(e)}"}), 500
 
+        response = jsonify({"message": "Book updated successfully", "version": book.version})
+        response.set_etag(str(book.version))
+        return response, 200
+
+    @staticmethod
+    def _conflict(current_version):
+        """409 telling the client to re-read the book before retrying."""
+        response = jsonify({
+            "error": "Book was changed by someone else; reload it and try again",
+            "version": current_version,
+        })
+        response.set_etag(str(current_version))
+        return response, 409
+
+    @staticmethod
+    def expected_version(if_match):
+        """
+        Reads the book version from an If-Match header ("3" or W/"3").
+        Returns None when the header is absent or `*`; raises ValueError when
+        it is not a version.
+        """
+        if not if_match or if_match.star_tag:
+            return None
+        tags = list(if_match.as_set(include_weak=True))
+        if len(tags) != 1 or not tags[0].isdigit():
+            raise ValueError("If-Match must carry a single book version")
+        return int(tags[0])
+
     @staticmethod
     def delete_book(book_id):
-        """Deletes a book from the library."""
-        book = Book.query.get(book_id)
+        """Soft-deletes a book, leaving a tombstone for the change feed."""
+        book = Book.get_active(book_id)
         if not book:
             return jsonify({"error": "Book not found"}), 404
 
         try:
-            db.session.delete(book)
+            book.deleted_at = datetime.utcnow()
             db.session.commit()
             return jsonify({"message": "Book deleted successfully"}), 200
         except SQLAlchemyError as e:
@@ -108,21 +237,19 @@ class BookService:
             return jsonify({"error": f"Database error: {str(e)}"}), 500
 
     @staticmethod
-    def search_books(query):
-        """Search books by title, author, or ISBN."""
-        books = Book.query.filter(
-            (Book.title.ilike(f"%{query}%")) |
-            (Book.author.ilike(f"%{query}%")) |
-            (Book.isbn.ilike(f"%{query}%"))
-        ).all()
-
-        return jsonify([
-            {
-                "id": book.id,
-                "title": book.title,
-                "author": book.author,
-                "isbn": book.isbn,
-                "copies_available": book.copies_available
-            }
-            for book in books
-        ]), 200
+    def search_books(query, page=1, limit=None, category_id=None, available=None, facets=False):
+        """Ranked search over title, author, and ISBN, optionally with facet counts."""
+        books, has_more = SearchService.search(query, page, limit, category_id, available)
+        response = {"query": query, "books": books, "page": page, "has_more": has_more}
+        if facets:
+            response["facets"] = SearchService.facets(query)
+
+        # Offer typo-tolerant suggestions instead of an empty first page
+        if not books and page == 1:
+            suggestions = SearchService.suggest(query)
+            response.update({
+                "did_you_mean": suggestions[0] if suggestions else None,
+                "suggestions": suggestions,
+            })
+
+        return jsonify(response), 200
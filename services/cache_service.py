@@ -0,0 +1,251 @@
+# services/cache_service.py
+
+import json
+import logging
+import time
+import uuid
+from functools import wraps
+from flask import current_app, has_app_context, make_response, request
+from redis.exceptions import RedisError
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from models.book_model import Book, Category
+from models.transaction_model import BorrowedBook
+
+class CatalogCache:
+    """
+    Redis cache for catalog reads with versioned keys.
+
+    Every book, every category, the catalog listing as a whole, the set of
+    book titles and every user's loans own a version counter. Cached entries embed the versions they were built from,
+    so bumping a counter makes the old entries unreachable (they simply
+    expire) and readers never see data older than the last committed write.
+    Versions are bumped automatically after commit for every Book, Category
+    or BorrowedBook touched by the session (see the listeners below); code
+    that changes those tables with Core statements must call the matching
+    `mark_*` helper. The same counters back the ETags of `conditional_get`.
+
+    Redis errors never fail a request: the cache is bypassed for
+    CACHE_RETRY_AFTER seconds and reads go straight to the database.
+    """
+
+    PREFIX = "catalog"
+    _down_until = 0.0
+
+    # ─────────────────────────────────────────────────────────
+    #  Redis Access
+    # ─────────────────────────────────────────────────────────
+    @staticmethod
+    def _client():
+        """Returns the Redis client, or None when caching is off or Redis is down."""
+        if not has_app_context() or not current_app.config.get("CATALOG_CACHE_ENABLED", False):
+            return None
+        if time.monotonic() < CatalogCache._down_until:
+            return None
+        return current_app.extensions.get("redis")
+
+    @staticmethod
+    def _failed(error):
+        """Logs a Redis error and bypasses the cache for a while."""
+        logging.warning(f"⚠ Catalog cache unavailable, bypassing Redis: {error}")
+        CatalogCache._down_until = time.monotonic() + current_app.config.get("CACHE_RETRY_AFTER", 30)
+
+    @staticmethod
+    def version_key(scope, scope_id=None):
+        """Key of the version counter for a book, a category or the whole list."""
+        if scope_id is None:
+            return f"{CatalogCache.PREFIX}:ver:{scope}"
+        return f"{CatalogCache.PREFIX}:ver:{scope}:{scope_id}"
+
+    # ─────────────────────────────────────────────────────────
+    #  Reads
+    # ─────────────────────────────────────────────────────────
+    @staticmethod
+    def get_or_load(name, version_keys, loader):
+        """
+        Returns the cached value for `name` at the current versions of
+        `version_keys`, or calls `loader()` and caches its JSON result.
+        """
+        client = CatalogCache._client()
+        if client is None:
+            return loader()
+
+        try:
+            versions = client.mget(version_keys)
+            key = f"{CatalogCache.PREFIX}:{name}:" + ":".join(v or "0" for v in versions)
+            cached = client.get(key)
+            if cached is not None:
+                client.incr(f"{CatalogCache.PREFIX}:stats:hits")
+                return json.loads(cached)
+        except RedisError as e:
+            CatalogCache._failed(e)
+            return loader()
+
+        value = loader()
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.set(key, json.dumps(value), ex=current_app.config["CATALOG_CACHE_TTL"])
+            pipe.incr(f"{CatalogCache.PREFIX}:stats:misses")
+            pipe.execute()
+        except RedisError as e:
+            CatalogCache._failed(e)
+        return value
+
+    @staticmethod
+    def stats():
+        """Returns the hit/miss counters shared by all workers."""
+        client = CatalogCache._client()
+        if client is None:
+            return {"enabled": False, "hits": 0, "misses": 0, "hit_ratio": None}
+
+        try:
+            hits, misses = client.mget(
+                f"{CatalogCache.PREFIX}:stats:hits", f"{CatalogCache.PREFIX}:stats:misses"
+            )
+        except RedisError as e:
+            CatalogCache._failed(e)
+            return {"enabled": False, "hits": 0, "misses": 0, "hit_ratio": None}
+
+        hits, misses = int(hits or 0), int(misses or 0)
+        total = hits + misses
+        return {
+            "enabled": True,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / total, 4) if total else None,
+        }
+
+    @staticmethod
+    def versions(version_keys):
+        """Returns the current values of `version_keys`, or None when Redis is unavailable."""
+        client = CatalogCache._client()
+        if client is None:
+            return None
+
+        try:
+            return [version or "0" for version in client.mget(version_keys)]
+        except RedisError as e:
+            CatalogCache._failed(e)
+            return None
+
+    # ─────────────────────────────────────────────────────────
+    #  Invalidation
+    # ─────────────────────────────────────────────────────────
+    @staticmethod
+    def etag(version_keys):
+        """
+        Returns an ETag for the current versions of `version_keys`, or None
+        when Redis is unavailable. A random epoch is folded in so counters
+        that restart from zero (e.g. after a Redis flush) never reuse a tag.
+        """
+        client = CatalogCache._client()
+        if client is None:
+            return None
+
+        epoch_key = f"{CatalogCache.PREFIX}:epoch"
+        try:
+            epoch, *versions = client.mget([epoch_key, *version_keys])
+            if epoch is None:
+                client.set(epoch_key, uuid.uuid4().hex[:12], nx=True)
+                epoch = client.get(epoch_key)
+        except RedisError as e:
+            CatalogCache._failed(e)
+            return None
+        return f"{epoch}-" + "-".join(v or "0" for v in versions)
+
+    @staticmethod
+    def mark_book_changed(session, book_id, *category_ids, text_changed=False):
+        """
+        Queues a book (and the categories it was listed under) for a version
+        bump on commit. `text_changed` also invalidates views that embed book
+        titles or authors, such as a student's borrowed list.
+        """
+        changes = session.info.setdefault("catalog_changes", set())
+        changes.update({("book", book_id), ("list", None)})
+        changes.update(("category", category_id) for category_id in category_ids if category_id)
+        if text_changed:
+            changes.add(("titles", None))
+
+    @staticmethod
+    def mark_category_changed(session, category_id):
+        """Queues a category for a version bump on commit."""
+        session.info.setdefault("catalog_changes", set()).update({("category", category_id), ("list", None)})
+
+    @staticmethod
+    def mark_loans_changed(session, user_id):
+        """Queues a user's loan list for a version bump on commit."""
+        session.info.setdefault("catalog_changes", set()).add(("loans", user_id))
+
+    @staticmethod
+    def bump(changes):
+        """Bumps the version of every (scope, id) in `changes`."""
+        client = CatalogCache._client()
+        if client is None or not changes:
+            return
+
+        try:
+            pipe = client.pipeline(transaction=False)
+            for scope, scope_id in changes:
+                pipe.incr(CatalogCache.version_key(scope, scope_id))
+            pipe.execute()
+        except RedisError as e:
+            CatalogCache._failed(e)
+
+
+def conditional_get(version_keys):
+    """
+    Answers `If-None-Match` with 304 Not Modified before the view runs.
+    `version_keys(*args, **kwargs)` receives the view arguments and returns
+    the version counters the response depends on; the ETag changes whenever
+    any of them is bumped. Without Redis the view simply runs as usual.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            tag = CatalogCache.etag(version_keys(*args, **kwargs))
+            if tag and request.if_none_match.contains_weak(tag):
+                response = make_response("", 304)
+                response.set_etag(tag, weak=True)
+                return response
+
+            response = make_response(fn(*args, **kwargs))
+            if tag and response.status_code == 200:
+                response.set_etag(tag, weak=True)
+            return response
+        return wrapper
+    return decorator
+
+
+# ─────────────────────────────────────────────────────────
+#  Session Hooks: collect catalog changes, bump after commit
+# ─────────────────────────────────────────────────────────
+@event.listens_for(Session, "after_flush")
+def _collect_catalog_changes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        if isinstance(obj, Book):
+            state = inspect(obj)
+            text_changed = obj not in session.new and (
+                obj in session.deleted
+                or any(state.attrs[name].history.has_changes() for name in ("title", "author", "isbn"))
+            )
+            CatalogCache.mark_book_changed(
+                session, obj.id, obj.category_id, *(state.attrs.category_id.history.deleted or ()),
+                text_changed=text_changed,
+            )
+        elif isinstance(obj, Category):
+            CatalogCache.mark_category_changed(session, obj.id)
+        elif isinstance(obj, BorrowedBook):
+            CatalogCache.mark_loans_changed(session, obj.user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_catalog_versions(session):
+    CatalogCache.bump(session.info.pop("catalog_changes", None))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_catalog_changes(session):
+    session.info.pop("catalog_changes", None)
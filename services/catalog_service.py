@@ -0,0 +1,171 @@
+# services/catalog_service.py
+
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import tuple_
+
+# Import the single db instance
+from models import db
+from models.book_model import Book, Category
+
+class CatalogService:
+    """
+    Shared query and serializer layer for catalog listings.
+    Every listing selects the same flat projection with the category name
+    joined in, so serializing N books costs one statement instead of N + 1.
+    Soft-deleted (tombstoned) books are hidden everywhere except the change feed.
+    """
+
+    COLUMNS = (
+        Book.id,
+        Book.title,
+        Book.author,
+        Book.isbn,
+        Book.category_id,
+        Book.copies_available,
+        Book.total_copies,
+        Book.version,
+        Category.name.label("category_name"),
+    )
+
+    @staticmethod
+    def query(include_deleted=False):
+        """Returns the projected catalog query (no ORM entities are loaded)."""
+        query = db.session.query(*CatalogService.COLUMNS).outerjoin(
+            Category, Category.id == Book.category_id
+        )
+        if not include_deleted:
+            query = query.filter(Book.deleted_at.is_(None))
+        return query
+
+    @staticmethod
+    def serialize(row):
+        """Converts a catalog row into its JSON representation."""
+        return {
+            "id": row.id,
+            "title": row.title,
+            "author": row.author,
+            "isbn": row.isbn,
+            "category_id": row.category_id,
+            "category_name": row.category_name,
+            "copies_available": row.copies_available,
+            "total_copies": row.total_copies,
+            "version": row.version,  # send back in If-Match when updating
+        }
+
+    @staticmethod
+    def page_size(limit=None):
+        """Clamps a requested page size to the configured bounds."""
+        if not limit:
+            return current_app.config["CATALOG_PAGE_SIZE"]
+        return max(1, min(limit, current_app.config["CATALOG_MAX_PAGE_SIZE"]))
+
+    @staticmethod
+    def get_page(after=None, limit=None, category_id=None):
+        """
+        Fetches one keyset page of serialized books ordered by id.
+        Returns (books, next_cursor); next_cursor is None on the last page.
+        """
+        limit = CatalogService.page_size(limit)
+        query = CatalogService.query()
+        if category_id is not None:
+            query = query.filter(Book.category_id == category_id)
+        if after is not None:
+            query = query.filter(Book.id > after)
+
+        # Fetch one extra row to know whether another page exists
+        rows = query.order_by(Book.id).limit(limit + 1).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1].id
+        return [CatalogService.serialize(row) for row in rows], next_cursor
+
+    @staticmethod
+    def iter_all(batch_size=None):
+        """Yields every serialized book in id order, one keyset batch at a time."""
+        batch_size = batch_size or current_app.config["CATALOG_EXPORT_BATCH_SIZE"]
+        after = None
+        while True:
+            query = CatalogService.query()
+            if after is not None:
+                query = query.filter(Book.id > after)
+            rows = query.order_by(Book.id).limit(batch_size).all()
+            if not rows:
+                return
+            for row in rows:
+                yield CatalogService.serialize(row)
+            after = rows[-1].id
+
+    @staticmethod
+    def get_book(book_id):
+        """Fetches a single serialized book, or None if it does not exist."""
+        row = CatalogService.query().filter(Book.id == book_id).first()
+        return CatalogService.serialize(row) if row else None
+
+    # ─────────────────────────────────────────────────────────
+    #  Change Feed
+    # ─────────────────────────────────────────────────────────
+    @staticmethod
+    def encode_watermark(updated_at, row_id):
+        """Builds the opaque `since` token for a (updated_at, id) position."""
+        return f"{updated_at.isoformat()}_{row_id}"
+
+    @staticmethod
+    def decode_watermark(token):
+        """Parses a `since` token into (updated_at, id); raises ValueError if malformed."""
+        timestamp, _, row_id = token.rpartition("_")
+        return datetime.fromisoformat(timestamp), int(row_id)
+
+    @staticmethod
+    def get_changes(since=None, limit=None):
+        """
+        Returns the books and categories created, changed or deleted after the
+        `since` watermark, ordered by (updated_at, id) over idx_book_updated_at.
+        Rows newer than CHANGE_FEED_LAG_SECONDS are held back so a transaction
+        still committing with an older timestamp is not skipped by a client
+        that has already moved past it.
+        Returns (books, categories, next_since, has_more).
+        """
+        limit = CatalogService.page_size(limit)
+        horizon = datetime.utcnow() - timedelta(seconds=current_app.config["CHANGE_FEED_LAG_SECONDS"])
+        since_at, since_id = CatalogService.decode_watermark(since) if since else (None, None)
+
+        query = CatalogService.query(include_deleted=True).add_columns(Book.updated_at, Book.deleted_at)
+        query = query.filter(Book.updated_at <= horizon)
+        if since_at is not None:
+            query = query.filter(tuple_(Book.updated_at, Book.id) > tuple_(since_at, since_id))
+
+        rows = query.order_by(Book.updated_at, Book.id).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        books = []
+        for row in rows:
+            book = CatalogService.serialize(row)
+            book["updated_at"] = row.updated_at.isoformat()
+            book["deleted"] = row.deleted_at is not None
+            books.append(book)
+
+        # Categories are few, so every category changed in the window is sent on each page
+        categories = Category.query.filter(Category.updated_at <= horizon)
+        if since_at is not None:
+            categories = categories.filter(Category.updated_at > since_at)
+        if has_more:
+            categories = categories.filter(Category.updated_at <= rows[-1].updated_at)
+        categories = [
+            {
+                "id": category.id,
+                "name": category.name,
+                "updated_at": category.updated_at.isoformat(),
+                "deleted": category.deleted_at is not None,
+            }
+            for category in categories.order_by(Category.updated_at, Category.id)
+        ]
+
+        # Once caught up, resume from the horizon so unchanged polls stay cheap
+        if has_more:
+            next_since = CatalogService.encode_watermark(rows[-1].updated_at, rows[-1].id)
+        else:
+            next_since = CatalogService.encode_watermark(horizon, 0)
+        return books, categories, next_since, has_more
@@ -0,0 +1,648 @@
+# services/circulation_service.py
+
+import logging
+import time
+from collections import Counter, defaultdict, deque
+from datetime import datetime, timedelta
+from sqlalchemy import Integer, case, cast, exists, func, insert, literal, select, tuple_, update
+from sqlalchemy.exc import SQLAlchemyError
+from flask import current_app
+
+# Import the single db instance
+from models import db
+from database import values_table
+from models.user_model import User
+from models.book_model import Book, BookCopy
+from models.transaction_model import BorrowedBook, UserCirculationSummary, ACTIVE_LOAN, UNPAID_FINE
+from services.cache_service import CatalogCache
+from services.inventory_service import AVAILABLE
+from services.reservation_service import ReservationService
+from services.summary_service import SummaryService
+
+class CirculationService:
+    """
+    The single circulation engine: every route and service that lends,
+    takes back or renews a book delegates here, so loan periods and fine
+    rules live in one place.
+
+    A checkout claims its copy with one conditional
+    `UPDATE book SET copies_available = copies_available - 1
+    WHERE id = :id AND copies_available > 0 RETURNING ...`, then marks a
+    concrete copy (the scanned barcode, or the first available) as on loan
+    and inserts the loan against it, all in one transaction. The database
+    decides who gets the last copy, so concurrent borrowers can never push
+    the count below zero, and the book row lock taken first keeps two desks
+    from lending the same copy (see InventoryService).
+    Every UPDATE here also bumps the row's `version`, so an admin edit made
+    from an older read of the book or loan fails with a conflict instead of
+    overwriting it (see BookService.update_book).
+    Self-service borrows first run every eligibility rule in one SELECT, so
+    a borrow costs one read plus that write. Fines and the borrow limit are
+    read from the user's summary row (SummaryService), which every operation
+    here updates in its own transaction.
+
+    Returns, renewals and fine payments are set-based: one
+    `UPDATE borrowed_book ... WHERE returned = false RETURNING ...` closes
+    (or extends) every matching loan and computes its fine in SQL, and one
+    more UPDATE puts all the returned copies back on the shelf. A loan that
+    is returned twice at the same moment is only closed once.
+
+    Desk batches (checkout_batch/return_batch) keep the statement count
+    constant: one availability read, one `UPDATE book ... FROM (VALUES ...)`
+    for every counter claimed, one UPDATE picking the copies and one
+    multi-row INSERT for the loans, all in one transaction, with a result
+    per item.
+
+    Fines on books still out are accrued nightly by `accrue_fines`, one
+    set-based UPDATE per chunk of overdue loans, and settled once the book
+    comes back (the return assesses the final fine).
+    """
+
+    LOAN_DAYS = 14  # Standard loan period
+    RENEWAL_DAYS = 7  # Days added per extension
+    FINE_PER_DAY = 5  # ₹5 per day late fine
+    MAX_ACTIVE_LOANS = 3  # Borrow limit per student
+
+    # Reason codes returned by check_eligibility/checkout -> (message, HTTP status)
+    ERRORS = {
+        "user_not_found": ("User not found", 404),
+        "student_not_found": ("Student not found", 404),
+        "invalid_item": ("Each item needs an integer student_id and book_id", 400),
+        "blocked": ("Your account is blocked", 403),
+        "unpaid_fines": ("You have unpaid fines. Pay them before borrowing another book.", 403),
+        "fines_on_loan": ("You have fines on overdue books you still hold. Return them, then pay the fines "
+                          "before borrowing another book.", 403),
+        "borrow_limit": (f"Borrow limit reached (Max: {MAX_ACTIVE_LOANS} books)", 400),
+        "already_borrowed": ("You have already borrowed this book", 400),
+        "book_not_found": ("Book not found", 404),
+        "unavailable": ("Book not available", 400),
+        "loan_not_found": ("No active borrow record found", 400),
+        "copy_not_found": ("No copy with this barcode", 404),
+    }
+
+    @staticmethod
+    def borrow(user_id, book_id):
+        """
+        Self-service borrow: one eligibility read, then the atomic checkout.
+        Returns (loan, None) or (None, reason code).
+        """
+        reason = CirculationService.check_eligibility(user_id, book_id)
+        if reason:
+            return None, reason
+        return CirculationService.checkout(user_id, book_id)
+
+    @staticmethod
+    def check_eligibility(user_id, book_id):
+        """
+        Checks every borrow rule in a single SELECT and returns the first
+        failing reason code (in ERRORS order), or None when the user may
+        borrow. Availability is re-checked atomically by the checkout.
+        """
+        summary = UserCirculationSummary
+        reason = case(
+            (~exists().where(User.id == user_id), "user_not_found"),
+            (exists().where(User.id == user_id, User.is_blocked.is_(True)), "blocked"),
+            # Fines still accruing on a book out can only be settled once it is back
+            (exists().where(summary.user_id == user_id, summary.unpaid_fine_total > 0), case(
+                (CirculationService._fines_on_loan(user_id), "fines_on_loan"),
+                else_="unpaid_fines",
+            )),
+            (exists().where(summary.user_id == user_id, summary.active_count >= CirculationService.MAX_ACTIVE_LOANS),
+             "borrow_limit"),
+            (exists().where(BorrowedBook.user_id == user_id, ACTIVE_LOAN, BorrowedBook.book_id == book_id),
+             "already_borrowed"),
+            (~exists().where(Book.id == book_id, Book.deleted_at.is_(None)), "book_not_found"),
+            (~exists().where(Book.id == book_id, Book.copies_available > 0), "unavailable"),
+            else_=None,
+        )
+        return db.session.execute(select(reason)).scalar()
+
+    @staticmethod
+    def checkout(user_id, book_id, due_date=None, barcode=None):
+        """
+        Lends one copy of a book (the scanned `barcode`, or any available
+        one) to a user, fulfils their hold on it if any, and commits. Returns (loan, None), or
+        (None, "unavailable") when the book is missing, deleted or has no
+        copy left, or the scanned copy is not on the shelf.
+        """
+        due_date = due_date or datetime.utcnow() + timedelta(days=CirculationService.LOAN_DAYS)
+        try:
+            copy_id = CirculationService.claim_copy(book_id, barcode)
+            if copy_id is None:
+                db.session.rollback()
+                return None, "unavailable"
+
+            loan = BorrowedBook(
+                user_id=user_id,
+                book_id=book_id,
+                copy_id=copy_id,
+                due_date=due_date,
+                returned=False,
+                fine_paid=False,
+            )
+            db.session.add(loan)
+            SummaryService.apply({user_id: 1})
+            ReservationService.fulfill([(user_id, book_id)])
+            db.session.commit()
+            return loan, None
+        except SQLAlchemyError:
+            db.session.rollback()
+            raise
+
+    @staticmethod
+    def checkout_copy(user_id, barcode, due_date=None):
+        """Desk checkout of a scanned copy: the barcode resolves to its book via the unique index."""
+        book_id = db.session.execute(select(BookCopy.book_id).where(BookCopy.barcode == barcode)).scalar()
+        if book_id is None:
+            return None, "copy_not_found"
+        return CirculationService.checkout(user_id, book_id, due_date, barcode=barcode)
+
+    @staticmethod
+    def claim_copy(book_id, barcode=None):
+        """
+        Takes one copy of a book (the one with `barcode`, or the first
+        available) inside the current transaction and returns its id. The
+        counter UPDATE locks the book row before the copy is picked. Returns
+        None when no copy can be had; the caller rolls back.
+        """
+        claimed = db.session.execute(
+            update(Book)
+            .where(Book.id == book_id, Book.copies_available > 0, Book.deleted_at.is_(None))
+            .values(copies_available=Book.copies_available - 1, version=Book.version + 1)
+            .returning(Book.category_id)
+        ).first()
+        if claimed is None:
+            return None
+
+        if barcode is not None:
+            which = BookCopy.barcode == barcode
+        else:
+            which = BookCopy.id == (
+                select(BookCopy.id).where(BookCopy.book_id == book_id, AVAILABLE)
+                .order_by(BookCopy.id).limit(1).scalar_subquery()
+            )
+        copy_id = db.session.execute(
+            update(BookCopy)
+            .where(which, BookCopy.book_id == book_id, AVAILABLE)
+            .values(status="on_loan", updated_at=datetime.utcnow())
+            .returning(BookCopy.id)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        if copy_id is None:
+            return None
+
+        # Core UPDATEs bypass the session listeners, so queue the cache bump by hand
+        CatalogCache.mark_book_changed(db.session, book_id, claimed.category_id)
+        return copy_id
+
+    @staticmethod
+    def return_loan(loan_id=None, user_id=None, book_id=None, now=None, barcode=None):
+        """
+        Returns one active loan, picked by id, by the scanned copy's barcode
+        or as the user's earliest-due loan of a book. Returns (row, None) or
+        (None, "loan_not_found"); the row has id, user_id, book_id, copy_id
+        and the assessed fine_amount.
+        """
+        returned = CirculationService.return_loans(
+            *CirculationService._one_loan(loan_id, user_id, book_id, barcode), now=now
+        )
+        if not returned:
+            return None, "loan_not_found"
+        return returned[0], None
+
+    @staticmethod
+    def return_loans(*criteria, now=None):
+        """
+        Closes every active loan matching `criteria`, assesses late fines,
+        restores the copies, notifies as many reservations of each returned
+        book as copies came back and commits. The reservation emails are queued in the outbox in
+        the same transaction, so a return never waits on SMTP. Returns the
+        returned (id, user_id, book_id, copy_id, fine_amount) rows.
+        """
+        now = now or datetime.utcnow()
+        try:
+            returned = db.session.execute(
+                update(BorrowedBook)
+                .where(ACTIVE_LOAN, *criteria)
+                .values(
+                    returned=True,
+                    return_date=now,
+                    fine_amount=CirculationService.fine_expression(now),
+                    fine_paid=False,
+                    version=BorrowedBook.version + 1,
+                )
+                .returning(BorrowedBook.id, BorrowedBook.user_id, BorrowedBook.book_id, BorrowedBook.copy_id,
+                           BorrowedBook.fine_amount)
+                .execution_options(synchronize_session=False)
+            ).all()
+            if returned:
+                CirculationService.release_copies(
+                    Counter(loan.book_id for loan in returned),
+                    [loan.copy_id for loan in returned if loan.copy_id is not None],
+                )
+            deltas = Counter()
+            for loan in returned:
+                deltas[loan.user_id] -= 1
+                CatalogCache.mark_loans_changed(db.session, loan.user_id)
+            SummaryService.apply(deltas, now)
+            ReservationService.promote(Counter(loan.book_id for loan in returned), now)
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            raise
+        return returned
+
+    @staticmethod
+    def release_copies(counts, copy_ids=()):
+        """
+        Puts copies back on the shelf inside the current transaction: one
+        UPDATE for the counters (`counts` maps book id -> number of copies
+        returned), then one for the returned `copy_ids`.
+        """
+        returns = values_table("returns", {"book_id": Integer, "copies": Integer}, counts.items())
+        released = db.session.execute(
+            update(Book)
+            .where(Book.id == returns.c.book_id)
+            .values(
+                copies_available=func.coalesce(Book.copies_available, 0) + returns.c.copies,
+                version=Book.version + 1,
+            )
+            .returning(Book.id, Book.category_id)
+            .execution_options(synchronize_session=False)
+        )
+        for book_id, category_id in released:
+            CatalogCache.mark_book_changed(db.session, book_id, category_id)
+        if copy_ids:
+            db.session.execute(
+                update(BookCopy)
+                .where(BookCopy.id.in_(copy_ids), BookCopy.status == "on_loan")
+                .values(status="available", updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+
+    @staticmethod
+    def claim_copies(counts):
+        """
+        Takes several copies of several books inside the current transaction;
+        `counts` maps book id -> copies wanted. One UPDATE takes the counters
+        (a book is only touched when all of its copies are still there) and
+        one more marks each book's first available copies as on loan.
+        Returns {book_id: [copy ids]} for the books whose copies were claimed.
+        """
+        claims = values_table("claims", {"book_id": Integer, "copies": Integer}, counts.items())
+        claimed = db.session.execute(
+            update(Book)
+            .where(Book.id == claims.c.book_id, Book.copies_available >= claims.c.copies, Book.deleted_at.is_(None))
+            .values(copies_available=Book.copies_available - claims.c.copies, version=Book.version + 1)
+            .returning(Book.id, Book.category_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        if not claimed:
+            return {}
+        for book_id, category_id in claimed:
+            CatalogCache.mark_book_changed(db.session, book_id, category_id)
+
+        ranked = (
+            select(
+                BookCopy.id,
+                BookCopy.book_id,
+                func.row_number().over(partition_by=BookCopy.book_id, order_by=BookCopy.id).label("rank"),
+            )
+            .where(BookCopy.book_id.in_([book_id for book_id, _ in claimed]), AVAILABLE)
+            .subquery()
+        )
+        picked = (
+            select(ranked.c.id)
+            .join(claims, claims.c.book_id == ranked.c.book_id)
+            .where(ranked.c.rank <= claims.c.copies)
+        )
+        copies = {book_id: [] for book_id, _ in claimed}
+        for copy_id, book_id in db.session.execute(
+            update(BookCopy)
+            .where(BookCopy.id.in_(picked))
+            .values(status="on_loan", updated_at=datetime.utcnow())
+            .returning(BookCopy.id, BookCopy.book_id)
+            .execution_options(synchronize_session=False)
+        ):
+            copies[book_id].append(copy_id)
+
+        # A counter ahead of its copies (see InventoryService.check_consistency) cannot be lent from
+        short = {book_id: ids for book_id, ids in copies.items() if len(ids) < counts[book_id]}
+        if short:
+            logging.warning(f"⚠ Counter ahead of copies for books {sorted(short)}; run the inventory check")
+            CirculationService.release_copies(
+                {book_id: counts[book_id] for book_id in short},
+                [copy_id for ids in short.values() for copy_id in ids],
+            )
+        return {book_id: ids for book_id, ids in copies.items() if book_id not in short}
+
+    @staticmethod
+    def renew_loan(loan_id=None, user_id=None, book_id=None, days=None):
+        """
+        Extends one active loan (picked like return_loan) and commits.
+        Returns (row, None) with the new due_date, or (None, "loan_not_found").
+        """
+        renewed = CirculationService.renew_loans(*CirculationService._one_loan(loan_id, user_id, book_id), days=days)
+        if not renewed:
+            return None, "loan_not_found"
+        return renewed[0], None
+
+    @staticmethod
+    def renew_loans(*criteria, days=None):
+        """
+        Pushes back the due date of every active loan matching `criteria` in
+        one UPDATE and commits. Returns the (id, user_id, book_id, due_date) rows.
+        """
+        days = days or CirculationService.RENEWAL_DAYS
+        try:
+            renewed = db.session.execute(
+                update(BorrowedBook)
+                .where(ACTIVE_LOAN, *criteria)
+                .values(
+                    due_date=CirculationService._plus_days(BorrowedBook.due_date, days),
+                    version=BorrowedBook.version + 1,
+                )
+                .returning(BorrowedBook.id, BorrowedBook.user_id, BorrowedBook.book_id, BorrowedBook.due_date)
+                .execution_options(synchronize_session=False)
+            ).all()
+            for user_id in {loan.user_id for loan in renewed}:
+                CatalogCache.mark_loans_changed(db.session, user_id)
+            SummaryService.apply({loan.user_id: 0 for loan in renewed})  # recounts overdue loans
+            db.session.commit()
+            return renewed
+        except SQLAlchemyError:
+            db.session.rollback()
+            raise
+
+    @staticmethod
+    def settle_fines(user_id):
+        """
+        Marks every unpaid fine of a user's returned loans as paid inside the
+        current transaction (the caller commits). Fines accrued on books still
+        out keep growing until the return, so they are settled afterwards.
+        Returns the settled amounts.
+        """
+        settled = db.session.execute(
+            update(BorrowedBook)
+            .where(BorrowedBook.user_id == user_id, BorrowedBook.returned == db.true(), UNPAID_FINE)
+            .values(fine_paid=True, version=BorrowedBook.version + 1)
+            .returning(BorrowedBook.fine_amount)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        if settled:
+            CatalogCache.mark_loans_changed(db.session, user_id)
+            SummaryService.apply({user_id: 0})
+        return settled
+
+    @staticmethod
+    def has_fines_on_loan(user_id):
+        """Whether the user owes fines on books still out, which settle_fines cannot clear yet."""
+        return db.session.execute(select(CirculationService._fines_on_loan(user_id))).scalar()
+
+    @staticmethod
+    def _fines_on_loan(user_id):
+        """EXISTS an active loan of the user with a fine accrued on it."""
+        return exists().where(BorrowedBook.user_id == user_id, ACTIVE_LOAN, UNPAID_FINE)
+
+    @staticmethod
+    def accrue_fines(as_of=None, chunk_size=None):
+        """
+        Brings the fine of every overdue active loan up to date as of midnight
+        UTC of `as_of`'s day, chunk_size loans (by id) per UPDATE and commit.
+        Loans whose fine is already current are not touched, so running it
+        again the same day is a no-op. Returns {"as_of", "chunks", "touched",
+        "users", "elapsed_ms"}.
+        """
+        started = time.perf_counter()
+        as_of = datetime.combine((as_of or datetime.utcnow()).date(), datetime.min.time())
+        chunk_size = chunk_size or current_app.config["FINE_ACCRUAL_CHUNK_SIZE"]
+        fine = CirculationService.fine_expression(as_of)
+        overdue = (ACTIVE_LOAN, BorrowedBook.due_date < as_of)
+
+        report = {"as_of": as_of.isoformat(), "chunks": 0, "touched": 0}
+        users, last_id = set(), 0
+        while True:
+            chunk = (
+                select(BorrowedBook.id).where(*overdue, BorrowedBook.id > last_id)
+                .order_by(BorrowedBook.id).limit(chunk_size).subquery()
+            )
+            upper = db.session.execute(select(func.max(chunk.c.id))).scalar()
+            if upper is None:
+                break
+            try:
+                accrued = db.session.execute(
+                    update(BorrowedBook)
+                    .where(*overdue, BorrowedBook.id > last_id, BorrowedBook.id <= upper,
+                           func.coalesce(BorrowedBook.fine_amount, 0) != fine)
+                    .values(fine_amount=fine, version=BorrowedBook.version + 1)
+                    .returning(BorrowedBook.user_id)
+                    .execution_options(synchronize_session=False)
+                ).scalars().all()
+                for user_id in set(accrued):
+                    CatalogCache.mark_loans_changed(db.session, user_id)
+                SummaryService.apply(dict.fromkeys(accrued, 0))  # recounts the users' unpaid fines
+                db.session.commit()
+            except SQLAlchemyError:
+                db.session.rollback()
+                raise
+            report["chunks"] += 1
+            report["touched"] += len(accrued)
+            users.update(accrued)
+            last_id = upper
+
+        report["users"] = len(users)
+        report["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        logging.info(f"✅ Fine accrual as of {report['as_of']}: {report['touched']} loans in {report['chunks']} chunks")
+        return report
+
+    @staticmethod
+    def fine_expression(now):
+        """SQL expression for a loan's fine if it were returned at `now`: FINE_PER_DAY per whole day late."""
+        return case(
+            (BorrowedBook.due_date < now, CirculationService._days_late(now) * CirculationService.FINE_PER_DAY),
+            else_=0,
+        )
+
+    @staticmethod
+    def _days_late(now):
+        """Whole days between a loan's due date and `now`, computed by the database."""
+        if db.engine.dialect.name == "postgresql":
+            elapsed = literal(now, BorrowedBook.due_date.type) - BorrowedBook.due_date
+            return func.floor(func.extract("epoch", elapsed) / 86400)
+        return cast(func.julianday(literal(now, BorrowedBook.due_date.type)) - func.julianday(BorrowedBook.due_date), Integer)
+
+    @staticmethod
+    def _plus_days(column, days):
+        """SQL expression for a timestamp column shifted by `days`."""
+        if db.engine.dialect.name == "postgresql":
+            return column + timedelta(days=days)
+        # SQLite keeps milliseconds in %f; carry over the stored microsecond digits
+        shifted = func.strftime("%Y-%m-%d %H:%M:%f", column, f"+{int(days)} days")
+        return shifted.concat(func.substr(column, 24))
+
+    @staticmethod
+    def _one_loan(loan_id, user_id, book_id, barcode=None):
+        """
+        Criteria selecting one active loan: by id, or the earliest-due one for
+        the user (and book or copy). Raises ValueError without an id, book or
+        copy, rather than picking whichever loan of the user (or of the whole
+        library) falls due first.
+        """
+        if loan_id is None and book_id is None and barcode is None:
+            raise ValueError("A loan must be picked by id, book or copy")
+        criteria = [ACTIVE_LOAN]
+        if user_id is not None:
+            criteria.append(BorrowedBook.user_id == user_id)
+        if loan_id is not None:
+            return [BorrowedBook.id == loan_id, *criteria]
+        if book_id is not None:
+            criteria.append(BorrowedBook.book_id == book_id)
+        if barcode is not None:
+            criteria.append(BorrowedBook.copy_id == select(BookCopy.id).where(BookCopy.barcode == barcode).scalar_subquery())
+        earliest = (
+            select(BorrowedBook.id).where(*criteria)
+            .order_by(BorrowedBook.due_date, BorrowedBook.id).limit(1)
+            .scalar_subquery()
+        )
+        return (BorrowedBook.id == earliest,)
+
+    # ─────────────────────────────────────────────────────────
+    #  Desk Batches
+    # ─────────────────────────────────────────────────────────
+    @staticmethod
+    def checkout_batch(items, due_date=None):
+        """
+        Issues books for a list of {"student_id", "book_id"} items in one
+        transaction. Items are served in order, so when a book runs out the
+        later requests for it fail. Returns {"processed", "succeeded",
+        "failed", "results"} with one result per item.
+        """
+        now = datetime.utcnow()
+        due_date = due_date or now + timedelta(days=CirculationService.LOAN_DAYS)
+        pairs = [CirculationService._parse_item(item) for item in items]
+        results = [CirculationService._batch_result(item, pair) for item, pair in zip(items, pairs)]
+        valid = [(result, pair) for result, pair in zip(results, pairs) if pair]
+
+        try:
+            student_ids = {student_id for _, (student_id, _) in valid}
+            students = {
+                student_id for (student_id,) in db.session.query(User.id)
+                .filter(User.id.in_(student_ids), User.role == "user")
+            } if student_ids else set()
+            book_ids = {book_id for _, (_, book_id) in valid}
+            stock = dict(
+                db.session.query(Book.id, func.coalesce(Book.copies_available, 0))
+                .filter(Book.id.in_(book_ids), Book.deleted_at.is_(None))
+            ) if book_ids else {}
+
+            granted = []
+            for result, (student_id, book_id) in valid:
+                if student_id not in students:
+                    CirculationService._fail(result, "student_not_found")
+                elif book_id not in stock:
+                    CirculationService._fail(result, "book_not_found")
+                elif stock[book_id] < 1:
+                    CirculationService._fail(result, "unavailable")
+                else:
+                    stock[book_id] -= 1
+                    granted.append((result, student_id, book_id))
+
+            # A concurrent checkout may have taken copies since the read above
+            claimed = CirculationService.claim_copies(
+                Counter(book_id for _, _, book_id in granted)
+            ) if granted else {}
+            loans = [(result, student_id, book_id) for result, student_id, book_id in granted if book_id in claimed]
+            for result, _, book_id in granted:
+                if book_id not in claimed:
+                    CirculationService._fail(result, "unavailable")
+
+            if loans:
+                # RETURNING order is not guaranteed, so match the new ids back by (student, book)
+                inserted = defaultdict(deque)
+                for loan_id, student_id, book_id in db.session.execute(
+                    insert(BorrowedBook).returning(BorrowedBook.id, BorrowedBook.user_id, BorrowedBook.book_id),
+                    [
+                        {"user_id": student_id, "book_id": book_id, "copy_id": claimed[book_id].pop(),
+                         "borrow_date": now, "due_date": due_date,
+                         "returned": False, "fine_paid": False, "fine_amount": 0.0}
+                        for _, student_id, book_id in loans
+                    ],
+                ):
+                    inserted[(student_id, book_id)].append(loan_id)
+                for result, student_id, book_id in loans:
+                    result.update(status="issued", loan_id=inserted[(student_id, book_id)].popleft(),
+                                  due_date=due_date.strftime("%Y-%m-%d"))
+                issued = Counter(student_id for _, student_id, _ in loans)
+                for student_id in issued:
+                    CatalogCache.mark_loans_changed(db.session, student_id)
+                SummaryService.apply(issued, now)
+                ReservationService.fulfill(sorted({(student_id, book_id) for _, student_id, book_id in loans}))
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            raise
+        return CirculationService._batch_report(results)
+
+    @staticmethod
+    def return_batch(items, now=None):
+        """
+        Takes back books for a list of {"student_id", "book_id"} items in one
+        transaction; each item closes that student's earliest-due loan of the
+        book. Returns the same report shape as checkout_batch.
+        """
+        pairs = [CirculationService._parse_item(item) for item in items]
+        results = [CirculationService._batch_result(item, pair) for item, pair in zip(items, pairs)]
+        valid = [(result, pair) for result, pair in zip(results, pairs) if pair]
+
+        queues = defaultdict(deque)
+        if valid:
+            for loan_id, student_id, book_id in db.session.execute(
+                select(BorrowedBook.id, BorrowedBook.user_id, BorrowedBook.book_id)
+                .where(ACTIVE_LOAN, tuple_(BorrowedBook.user_id, BorrowedBook.book_id).in_({pair for _, pair in valid}))
+                .order_by(BorrowedBook.due_date, BorrowedBook.id)
+            ):
+                queues[(student_id, book_id)].append(loan_id)
+
+        chosen = {}
+        for result, pair in valid:
+            if queues[pair]:
+                chosen[queues[pair].popleft()] = result
+            else:
+                CirculationService._fail(result, "loan_not_found")
+
+        returned = CirculationService.return_loans(BorrowedBook.id.in_(list(chosen)), now=now) if chosen else []
+        for loan in returned:
+            chosen.pop(loan.id).update(status="returned", loan_id=loan.id, fine_amount=loan.fine_amount)
+        for result in chosen.values():  # returned by someone else in the meantime
+            CirculationService._fail(result, "loan_not_found")
+        return CirculationService._batch_report(results)
+
+    @staticmethod
+    def _parse_item(item):
+        """(student_id, book_id) from one batch item, or None when it is malformed."""
+        try:
+            return int(item["student_id"]), int(item["book_id"])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _batch_result(item, pair):
+        """Starts the per-item result; malformed items fail straight away."""
+        result = {"student_id": pair[0], "book_id": pair[1]} if pair else {
+            "student_id": item.get("student_id") if isinstance(item, dict) else None,
+            "book_id": item.get("book_id") if isinstance(item, dict) else None,
+        }
+        if not pair:
+            CirculationService._fail(result, "invalid_item")
+        return result
+
+    @staticmethod
+    def _fail(result, reason):
+        """Marks a batch item as failed with its reason code and message."""
+        result.update(status="failed", reason=reason, error=CirculationService.ERRORS[reason][0])
+
+    @staticmethod
+    def _batch_report(results):
+        """Summarizes the per-item results of a batch."""
+        failed = sum(result["status"] == "failed" for result in results)
+        return {"processed": len(results), "succeeded": len(results) - failed, "failed": failed, "results": results}
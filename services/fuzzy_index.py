@@ -0,0 +1,159 @@
+# services/fuzzy_index.py
+
+import heapq
+import threading
+import time
+
+class SymSpellIndex:
+    """
+    In-memory symmetric-delete spelling dictionary (SymSpell).
+    Every word is indexed under all of its deletions up to `max_distance`, so a
+    lookup only has to generate the deletions of the misspelled term and
+    verify the few candidates that share one, instead of scanning the
+    vocabulary. Deletions are taken from the first `prefix_length` characters
+    to keep memory bounded on long words.
+    """
+
+    def __init__(self, max_distance=2, prefix_length=7):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.words = {}      # word -> frequency
+        self.deletes = {}    # deletion -> [words]
+
+    def add(self, word, count=1):
+        """Adds a word occurrence to the dictionary."""
+        if word in self.words:
+            self.words[word] += count
+            return
+        self.words[word] = count
+        for variant in self._deletions(word[:self.prefix_length]):
+            self.deletes.setdefault(variant, []).append(word)
+
+    def lookup(self, term, limit=5):
+        """Returns up to `limit` (word, distance, frequency) sorted by distance, then frequency."""
+        if term in self.words:
+            return [(term, 0, self.words[term])]
+
+        candidates = set()
+        for variant in self._deletions(term[:self.prefix_length]):
+            candidates.update(self.deletes.get(variant, ()))
+
+        matches = []
+        for word in candidates:
+            if abs(len(word) - len(term)) > self.max_distance:
+                continue
+            distance = osa_distance(term, word, self.max_distance)
+            if distance <= self.max_distance:
+                matches.append((word, distance, self.words[word]))
+
+        matches.sort(key=lambda match: (match[1], -match[2], match[0]))
+        return matches[:limit]
+
+    def suggest(self, tokens, limit=5, per_token=3, max_tokens=8):
+        """
+        Returns up to `limit` corrected queries (lists of words), best first.
+        Each of the first `max_tokens` tokens contributes its `per_token`
+        closest words; combinations are ranked by total edit distance, then
+        by how common their words are. Tokens with no close word, and any
+        past `max_tokens`, are kept as typed.
+
+        Combinations are enumerated best-first from a heap instead of sorting
+        the whole per_token ** len(tokens) product: each token's words are
+        already sorted, so moving one token to its next word never improves
+        the score, and only about `limit` * len(tokens) combinations are
+        ever scored.
+        """
+        options = []
+        for position, token in enumerate(tokens):
+            matches = self.lookup(token, limit=per_token) if position < max_tokens else []
+            options.append(matches or [(token, 0, 0)])
+
+        def score(picks):
+            chosen = [options[i][j] for i, j in enumerate(picks)]
+            return sum(m[1] for m in chosen), -sum(m[2] for m in chosen)
+
+        first = (0,) * len(options)
+        heap, seen = [(score(first), first)], {first}
+        suggestions = []
+        while heap and len(suggestions) < limit:
+            _, picks = heapq.heappop(heap)
+            words = [options[i][j][0] for i, j in enumerate(picks)]
+            if words != tokens:
+                suggestions.append(words)
+            for i, j in enumerate(picks):
+                following = picks[:i] + (j + 1,) + picks[i + 1:]
+                if j + 1 < len(options[i]) and following not in seen:
+                    seen.add(following)
+                    heapq.heappush(heap, (score(following), following))
+        return suggestions
+
+    def _deletions(self, word):
+        """All strings reachable from `word` by up to max_distance deletions (including itself)."""
+        result = {word}
+        frontier = {word}
+        for _ in range(self.max_distance):
+            frontier = {
+                variant[:i] + variant[i + 1:]
+                for variant in frontier if len(variant) > 1
+                for i in range(len(variant))
+            }
+            result |= frontier
+        return result
+
+
+def osa_distance(source, target, max_distance):
+    """
+    Optimal string alignment distance (Levenshtein plus adjacent transpositions).
+    Stops early and returns max_distance + 1 once every path exceeds the bound.
+    """
+    if source == target:
+        return 0
+
+    previous_previous = None
+    previous = list(range(len(target) + 1))
+    for i in range(1, len(source) + 1):
+        current = [i] + [0] * len(target)
+        for j in range(1, len(target) + 1):
+            cost = 0 if source[i - 1] == target[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (i > 1 and j > 1 and previous_previous is not None
+                    and source[i - 1] == target[j - 2] and source[i - 2] == target[j - 1]):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+
+class CatalogSpellIndex:
+    """
+    Process-wide SymSpell dictionary built from catalog titles and authors.
+    Built lazily on first use and rebuilt once it is older than `ttl` seconds.
+    """
+
+    _index = None
+    _built_at = 0.0
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, ttl, loader):
+        """
+        Returns the current index, (re)building it with `loader` when stale.
+        `loader` must yield the normalized words to index, one per occurrence.
+        """
+        if cls._index is not None and time.monotonic() - cls._built_at < ttl:
+            return cls._index
+
+        with cls._lock:
+            if cls._index is None or time.monotonic() - cls._built_at >= ttl:
+                index = SymSpellIndex()
+                for word in loader():
+                    index.add(word)
+                cls._index, cls._built_at = index, time.monotonic()
+        return cls._index
+
+    @classmethod
+    def reset(cls):
+        """Drops the cached index so the next lookup rebuilds it."""
+        with cls._lock:
+            cls._index, cls._built_at = None, 0.0
@@ -0,0 +1,165 @@
+# services/idempotency_service.py
+
+import hashlib
+import json
+import logging
+import time
+import uuid
+from functools import wraps
+from flask import current_app, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from redis.exceptions import RedisError
+
+class IdempotencyService:
+    """
+    `Idempotency-Key` support for state-changing POSTs, backed by Redis.
+
+    The first request with a key claims it with `SET NX` (for at most
+    IDEMPOTENCY_LOCK_TTL seconds), runs the view and stores its response for
+    IDEMPOTENCY_TTL seconds. Retries with the same key get that response
+    back, marked `Idempotent-Replayed: true`, without reaching the view or
+    the database. A retry that arrives while the first request is still
+    running gets 409 and a Retry-After, and reusing a key for a different
+    request gets 422. Keys are scoped to the caller and the endpoint.
+
+    Server errors (5xx) and exceptions release the key so the retry runs
+    again. Requests without the header, and every request while Redis is
+    unavailable, run as usual.
+    """
+
+    PREFIX = "idempotency"
+    HEADER = "Idempotency-Key"
+    MAX_KEY_LENGTH = 255
+    _down_until = 0.0
+
+    @staticmethod
+    def _client():
+        """Returns the Redis client, or None when idempotency is off or Redis is down."""
+        if not current_app.config.get("IDEMPOTENCY_ENABLED", False):
+            return None
+        if time.monotonic() < IdempotencyService._down_until:
+            return None
+        return current_app.extensions.get("redis")
+
+    @staticmethod
+    def _failed(error):
+        """Logs a Redis error and bypasses idempotency for a while."""
+        logging.warning(f"⚠ Idempotency store unavailable, running requests without it: {error}")
+        IdempotencyService._down_until = time.monotonic() + current_app.config.get("CACHE_RETRY_AFTER", 30)
+
+    @staticmethod
+    def storage_key(key):
+        """Redis key for an idempotency key of the current caller and endpoint."""
+        return f"{IdempotencyService.PREFIX}:{get_jwt_identity()}:{request.endpoint}:{key}"
+
+    @staticmethod
+    def fingerprint():
+        """Hash of what makes a request distinct: method, path and body."""
+        digest = hashlib.sha256(f"{request.method} {request.path}\n".encode())
+        digest.update(request.get_data())
+        return digest.hexdigest()
+
+    @staticmethod
+    def claim(client, storage_key, fingerprint):
+        """
+        Claims a key for this request. Returns (token, None) when it is ours
+        to run, or (None, stored entry) when another request got there first.
+        """
+        token = uuid.uuid4().hex
+        entry = json.dumps({"state": "running", "token": token, "fingerprint": fingerprint})
+        if client.set(storage_key, entry, nx=True, ex=current_app.config["IDEMPOTENCY_LOCK_TTL"]):
+            return token, None
+        stored = client.get(storage_key)
+        if stored is None:
+            # The other request failed and released the key in between; try once more
+            if client.set(storage_key, entry, nx=True, ex=current_app.config["IDEMPOTENCY_LOCK_TTL"]):
+                return token, None
+            stored = client.get(storage_key)
+        return None, json.loads(stored) if stored else {"state": "running"}
+
+    @staticmethod
+    def save(client, storage_key, token, fingerprint, response):
+        """Stores a finished response, unless our claim expired and someone else took the key."""
+        pipe = client.pipeline()
+        try:
+            pipe.watch(storage_key)
+            current = pipe.get(storage_key)
+            if current is not None and json.loads(current).get("token") != token:
+                return
+            pipe.multi()
+            pipe.set(storage_key, json.dumps({
+                "state": "done",
+                "fingerprint": fingerprint,
+                "status": response.status_code,
+                "mimetype": response.mimetype,
+                "body": response.get_data(as_text=True),
+            }), ex=current_app.config["IDEMPOTENCY_TTL"])
+            pipe.execute()
+        finally:
+            pipe.reset()
+
+    @staticmethod
+    def release(client, storage_key, token):
+        """Frees a key we claimed so a retry runs the request again."""
+        stored = client.get(storage_key)
+        if stored is not None and json.loads(stored).get("token") == token:
+            client.delete(storage_key)
+
+    @staticmethod
+    def replay(entry, fingerprint):
+        """Builds the answer for a retry from the stored entry."""
+        if entry.get("fingerprint") not in (None, fingerprint):
+            return jsonify({"error": "Idempotency-Key was already used for a different request"}), 422
+        if entry.get("state") != "done":
+            response = make_response(jsonify({"error": "A request with this Idempotency-Key is still in progress"}), 409)
+            response.headers["Retry-After"] = "1"
+            return response
+
+        response = current_app.response_class(entry["body"], status=entry["status"], mimetype=entry["mimetype"])
+        response.headers["Idempotent-Replayed"] = "true"
+        return response
+
+
+def idempotent(fn):
+    """
+    Makes a POST view safe to retry with an `Idempotency-Key` header (see
+    IdempotencyService). Goes below `@jwt_required()`, since keys are scoped
+    to the caller.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IdempotencyService.HEADER)
+        client = IdempotencyService._client() if key else None
+        if client is None:
+            return fn(*args, **kwargs)
+        if len(key) > IdempotencyService.MAX_KEY_LENGTH:
+            return jsonify({"error": f"Idempotency-Key must be at most {IdempotencyService.MAX_KEY_LENGTH} characters"}), 400
+
+        storage_key = IdempotencyService.storage_key(key)
+        fingerprint = IdempotencyService.fingerprint()
+        try:
+            token, entry = IdempotencyService.claim(client, storage_key, fingerprint)
+        except RedisError as e:
+            IdempotencyService._failed(e)
+            return fn(*args, **kwargs)
+        if entry is not None:
+            return IdempotencyService.replay(entry, fingerprint)
+
+        try:
+            response = make_response(fn(*args, **kwargs))
+        except Exception:
+            try:
+                IdempotencyService.release(client, storage_key, token)
+            except RedisError as e:
+                IdempotencyService._failed(e)
+            raise
+
+        try:
+            if response.status_code >= 500 or response.is_streamed:
+                IdempotencyService.release(client, storage_key, token)
+            else:
+                IdempotencyService.save(client, storage_key, token, fingerprint, response)
+        except RedisError as e:
+            IdempotencyService._failed(e)
+        return response
+    return wrapper
@@ -0,0 +1,253 @@
+# services/import_service.py
+
+import codecs
+import csv
+import itertools
+import json
+from flask import current_app
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+
+# Import the single db instance
+from models import db
+from models.book_model import Book, Category
+from services.book_service import BookService
+from services.cache_service import CatalogCache
+from services.inventory_service import InventoryService
+from services.reservation_service import ReservationService
+
+class ImportService:
+    """
+    Bulk catalog import from CSV or JSON Lines.
+
+    The input is streamed and handled IMPORT_CHUNK_SIZE rows at a time: each
+    chunk resolves its categories and ISBN duplicates with one IN query apiece,
+    inserts its new books with a single multi-row INSERT and commits on its
+    own. Bad rows are skipped and reported by line number; the rest of the
+    file still goes in. Each imported book gets copies_available shelved
+    copies with generated barcodes, inserted in bulk with the chunk.
+
+    Each row needs title, author, isbn and either a category name (created if
+    missing) or an existing category_id; copies_available defaults to 1.
+    """
+
+    FORMATS = ("csv", "jsonl")
+
+    @staticmethod
+    def detect_format(filename=None, mimetype=None):
+        """Guesses the input format from a file name or MIME type."""
+        name = (filename or "").lower()
+        if name.endswith((".jsonl", ".ndjson")) or mimetype in ("application/x-ndjson", "application/jsonl"):
+            return "jsonl"
+        return "csv"
+
+    @staticmethod
+    def read_rows(stream, fmt):
+        """Yields (line_number, row) pairs from a binary stream without loading it whole."""
+        lines = codecs.getreader("utf-8-sig")(stream)
+        if fmt == "csv":
+            reader = csv.DictReader(lines)
+            for row in reader:
+                yield reader.line_num, row
+            return
+
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else None
+
+    @staticmethod
+    def import_books(rows, chunk_size=None):
+        """
+        Imports (line_number, row) pairs and returns the import report:
+        {"processed", "imported", "failed", "categories_created", "errors"}.
+        """
+        chunk_size = chunk_size or current_app.config["IMPORT_CHUNK_SIZE"]
+        report = {"processed": 0, "imported": 0, "failed": 0, "categories_created": 0, "errors": []}
+
+        rows = iter(rows)
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                break
+            report["processed"] += len(chunk)
+
+            cleaned = []
+            for line, row in chunk:
+                try:
+                    cleaned.append((line, ImportService._clean(row)))
+                except ValueError as e:
+                    ImportService._reject(report, line, row, str(e))
+
+            # A concurrent writer may claim an ISBN or category name (or revive a
+            # tombstone) between our lookup and write; re-resolving the chunk once sorts that out.
+            for attempt in range(2):
+                try:
+                    result = ImportService._import_chunk(cleaned)
+                    db.session.commit()
+                    break
+                except (IntegrityError, StaleDataError) as e:
+                    db.session.rollback()
+                    if attempt:
+                        result = {"imported": 0, "categories_created": 0, "errors": [
+                            (line, row, f"Database error: {getattr(e, 'orig', e)}") for line, row in cleaned
+                        ]}
+
+            report["imported"] += result["imported"]
+            report["categories_created"] += result["categories_created"]
+            for line, row, error in result["errors"]:
+                ImportService._reject(report, line, row, error)
+
+        report["errors"].sort(key=lambda error: error["line"])
+        return report
+
+    @staticmethod
+    def _reject(report, line, row, error):
+        """Records a skipped row in the report."""
+        report["failed"] += 1
+        isbn = row.get("isbn") if isinstance(row, dict) else None
+        report["errors"].append({"line": line, "isbn": isbn, "error": error})
+
+    @staticmethod
+    def _clean(row):
+        """Validates and normalizes one input row; raises ValueError for bad rows."""
+        if row is None:
+            raise ValueError("Malformed row")
+
+        title = str(row.get("title") or "").strip()
+        author = str(row.get("author") or "").strip()
+        isbn = str(row.get("isbn") or "").strip()
+        category = str(row.get("category") or "").strip()
+        category_id = row.get("category_id")
+
+        if not title or not author or not isbn or not (category or category_id):
+            raise ValueError("All fields (title, author, isbn, category or category_id) are required")
+        if len(title) > 255 or len(author) > 255 or len(isbn) > 20 or len(category) > 100:
+            raise ValueError("Field too long")
+
+        try:
+            category_id = int(category_id) if category_id not in (None, "") else None
+        except (TypeError, ValueError):
+            raise ValueError("Invalid data format")
+        # Same stock rules as the add and update endpoints
+        copies_available = row.get("copies_available")
+        copies_available = BookService.parse_copies(copies_available) if copies_available not in (None, "") else 1
+
+        return {
+            "title": title,
+            "author": author,
+            "isbn": isbn,
+            "category": category,
+            "category_id": category_id,
+            "copies_available": copies_available,
+        }
+
+    @staticmethod
+    def _import_chunk(rows):
+        """Resolves and writes one chunk of cleaned rows inside the current transaction."""
+        result = {"imported": 0, "categories_created": 0, "errors": []}
+        if not rows:
+            return result
+
+        names = {row["category"] for _, row in rows if row["category"]}
+        category_ids, result["categories_created"] = ImportService._resolve_categories(names)
+
+        requested_ids = {row["category_id"] for _, row in rows if not row["category"]}
+        valid_ids = {
+            category_id for (category_id,) in db.session.query(Category.id).filter(
+                Category.id.in_(requested_ids), Category.deleted_at.is_(None)
+            )
+        } if requested_ids else set()
+
+        existing = {
+            isbn: (book_id, deleted_at, version)
+            for book_id, isbn, deleted_at, version in db.session.query(Book.id, Book.isbn, Book.deleted_at, Book.version)
+            .filter(Book.isbn.in_({row["isbn"] for _, row in rows}))
+        }
+
+        new_books, revived_books, seen = [], [], {}
+        for line, row in rows:
+            if row["category"]:
+                category_id = category_ids[row["category"]]
+            elif row["category_id"] in valid_ids:
+                category_id = row["category_id"]
+            else:
+                result["errors"].append((line, row, "Category not found"))
+                continue
+
+            if row["isbn"] in seen:
+                result["errors"].append((line, row, f"Duplicate ISBN (first seen on line {seen[row['isbn']]})"))
+                continue
+            seen[row["isbn"]] = line
+
+            values = {
+                "title": row["title"],
+                "author": row["author"],
+                "isbn": row["isbn"],
+                "category_id": category_id,
+                "copies_available": row["copies_available"],
+            }
+            if row["isbn"] not in existing:
+                new_books.append(values)
+            elif existing[row["isbn"]][1] is not None:
+                # Re-importing a deleted ISBN revives its tombstone (checked against the version we read)
+                book_id, _, version = existing[row["isbn"]]
+                revived_books.append({**values, "id": book_id, "deleted_at": None, "version": version})
+            else:
+                result["errors"].append((line, row, "Book with this ISBN already exists"))
+
+        shelves = {}
+        if new_books:
+            inserted = db.session.execute(
+                insert(Book).returning(Book.id, Book.category_id, Book.copies_available), new_books
+            )
+            for book_id, category_id, copies in inserted:
+                CatalogCache.mark_book_changed(db.session, book_id, category_id)
+                shelves[book_id] = copies
+        if revived_books:
+            db.session.execute(update(Book), revived_books)
+            for book in revived_books:
+                CatalogCache.mark_book_changed(db.session, book["id"], book["category_id"], text_changed=True)
+                shelves[book["id"]] = book["copies_available"]
+        # Bulk writes skip the mapper listeners, so shelve the copies here
+        InventoryService.match_copies(db.session, shelves)
+        # A revived ISBN may still have students waiting for it
+        ReservationService.promote(shelves)
+
+        result["imported"] = len(new_books) + len(revived_books)
+        return result
+
+    @staticmethod
+    def _resolve_categories(names):
+        """Maps category names to ids, creating or reviving missing ones in bulk."""
+        if not names:
+            return {}, 0
+
+        found = {
+            name: (category_id, deleted_at)
+            for category_id, name, deleted_at in db.session.query(Category.id, Category.name, Category.deleted_at)
+            .filter(Category.name.in_(names))
+        }
+        missing = names - found.keys()
+        if missing:
+            db.session.execute(insert(Category), [{"name": name} for name in sorted(missing)])
+        revived = [category_id for category_id, deleted_at in found.values() if deleted_at is not None]
+        if revived:
+            db.session.execute(update(Category), [{"id": category_id, "deleted_at": None} for category_id in revived])
+
+        category_ids = {name: category_id for name, (category_id, _) in found.items()}
+        if missing:
+            category_ids.update(
+                (name, category_id) for category_id, name in
+                db.session.query(Category.id, Category.name).filter(Category.name.in_(missing))
+            )
+        for name in missing:
+            CatalogCache.mark_category_changed(db.session, category_ids[name])
+        for category_id in revived:
+            CatalogCache.mark_category_changed(db.session, category_id)
+        return category_ids, len(missing)
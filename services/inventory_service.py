@@ -0,0 +1,375 @@
+# services/inventory_service.py
+
+import json
+import logging
+from datetime import datetime
+from flask import current_app
+from redis.exceptions import RedisError
+from sqlalchemy import event, exists, func, insert, inspect, or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm.attributes import set_committed_value
+
+# Import the single db instance
+from models import db
+from models.book_model import Book, BookCopy
+from models.transaction_model import BorrowedBook, ACTIVE_LOAN
+from services.cache_service import CatalogCache
+from services.reservation_service import ReservationService
+
+AVAILABLE = BookCopy.status == "available"
+CIRCULATING = BookCopy.status.in_(("available", "on_loan"))
+
+
+class InventoryService:
+    """
+    Copy-level inventory. Every physical copy is a `book_copy` row with a
+    unique barcode, and the book's counters are derived from them:
+    `copies_available` counts its copies in "available" and `total_copies`
+    those in circulation ("available" or "on_loan"), so copies_available is
+    always total_copies minus the active loans. Both move in the same
+    transaction as every copy status change.
+
+    Anything that moves a copy in or out of "available" locks the book row
+    first (through its counter UPDATE) and only then touches the copy, as
+    CirculationService does, so desks racing for a book's last copy or
+    scanning the same barcode serialize on the book and never deadlock.
+
+    Creating a book or changing copies_available through the ORM adds or
+    withdraws copies to match (see the mapper listeners below); bulk writes
+    call `match_copies` themselves. `check_consistency` (the drift auditor)
+    recomputes every counter from copy states and active loans with one
+    grouped query and repairs drift in batches.
+    """
+
+    # Statuses an admin may set by hand; "on_loan" only comes from circulation
+    MANUAL_STATUSES = ("available", "damaged", "lost", "withdrawn")
+    DRIFT_SAMPLE = 50  # Drifted book ids listed in a consistency report
+    METRIC_KEY = "metrics:inventory_drift"  # Last consistency report, for dashboards
+
+    # Reason codes -> (message, HTTP status)
+    ERRORS = {
+        "copy_not_found": ("Copy not found", 404),
+        "invalid_status": (f"status must be one of: {', '.join(MANUAL_STATUSES)}", 400),
+        "on_loan": ("Copy is on loan; return it first", 409),
+        "changed": ("Copy was changed by someone else; reload it and try again", 409),
+    }
+
+    @staticmethod
+    def barcode(book_id, sequence):
+        """Generated barcode for a book's n-th copy (until real labels are scanned in)."""
+        return f"B{book_id}-{sequence}"
+
+    @staticmethod
+    def find(barcode):
+        """Returns the copy with this barcode (unique index lookup), or None."""
+        return BookCopy.query.filter_by(barcode=barcode).first()
+
+    @staticmethod
+    def serialize(copy):
+        """Converts a copy, with its active loan if any, into a JSON-friendly dictionary."""
+        loan = None
+        if copy.status == "on_loan":
+            loan = BorrowedBook.query.filter(BorrowedBook.copy_id == copy.id, ACTIVE_LOAN).first()
+        return {
+            "id": copy.id,
+            "barcode": copy.barcode,
+            "book_id": copy.book_id,
+            "status": copy.status,
+            "location": copy.location,
+            "loan": {
+                "id": loan.id,
+                "student_id": loan.user_id,
+                "due_date": loan.due_date.strftime("%Y-%m-%d"),
+            } if loan else None,
+        }
+
+    @staticmethod
+    def add_copies(book_id, count=0, barcodes=(), location=None):
+        """
+        Shelves `count` copies with generated barcodes plus one per given
+        barcode, raises both counters to match and offers the copies to the
+        waitlist, inside the current transaction (the caller commits).
+        Returns the new barcodes, or None when the book does not exist.
+        """
+        rows = InventoryService._new_rows(db.session, {book_id: count}, location=location)
+        now = datetime.utcnow()
+        rows += [
+            {"book_id": book_id, "barcode": barcode, "status": "available", "location": location,
+             "created_at": now, "updated_at": now}
+            for barcode in barcodes
+        ]
+        book = db.session.execute(
+            update(Book)
+            .where(Book.id == book_id, Book.deleted_at.is_(None))
+            .values(
+                copies_available=func.coalesce(Book.copies_available, 0) + len(rows),
+                total_copies=Book.total_copies + len(rows),
+                version=Book.version + 1,
+            )
+            .returning(Book.category_id)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if book is None:
+            return None
+        if rows:
+            db.session.execute(insert(BookCopy), rows)
+            ReservationService.promote({book_id: len(rows)})
+        CatalogCache.mark_book_changed(db.session, book_id, book.category_id)
+        return [row["barcode"] for row in rows]
+
+    @staticmethod
+    def set_status(barcode, status=None, location=None):
+        """
+        Moves a copy between shelf states (available, damaged, lost,
+        withdrawn) and/or changes its location, adjusting the book's counters
+        in the same transaction, and commits. A copy back on the shelf goes
+        to the next student waiting for the book. Returns (copy, None) or
+        (None, reason code).
+        """
+        if status is not None and status not in InventoryService.MANUAL_STATUSES:
+            return None, "invalid_status"
+        copy = InventoryService.find(barcode)
+        if copy is None:
+            return None, "copy_not_found"
+        if status is None:
+            status = copy.status
+        elif copy.status == "on_loan":
+            return None, "on_loan"
+
+        # "on_loan" is never set here, so a copy enters or leaves circulation exactly when its availability changes
+        delta = (status == "available") - (copy.status == "available")
+        try:
+            if delta:
+                # Book row first, like circulation
+                category_id = db.session.execute(
+                    update(Book)
+                    .where(Book.id == copy.book_id)
+                    .values(copies_available=func.coalesce(Book.copies_available, 0) + delta,
+                            total_copies=Book.total_copies + delta, version=Book.version + 1)
+                    .returning(Book.category_id)
+                    .execution_options(synchronize_session=False)
+                ).scalar()
+                CatalogCache.mark_book_changed(db.session, copy.book_id, category_id)
+            moved = db.session.execute(
+                update(BookCopy)
+                .where(BookCopy.id == copy.id, BookCopy.status == copy.status)
+                .values(status=status, location=copy.location if location is None else location,
+                        updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if not moved:  # lent out or edited since we read it
+                db.session.rollback()
+                return None, "changed"
+            if delta > 0:
+                ReservationService.promote({copy.book_id: delta})
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            raise
+        db.session.refresh(copy)
+        return copy, None
+
+    @staticmethod
+    def match_copies(executor, targets):
+        """
+        Adds or withdraws available copies so each book in `targets`
+        ({book_id: wanted available copies}) has exactly that many, then
+        recounts their total_copies. copies_available is not touched: the
+        caller has already set it. `executor` is the session or, inside flush
+        listeners, the connection. Returns {book_id: total_copies}.
+        """
+        if not targets:
+            return {}
+        targets = {book_id: int(wanted or 0) for book_id, wanted in targets.items()}
+        available = dict(executor.execute(
+            select(BookCopy.book_id, func.count())
+            .where(BookCopy.book_id.in_(targets), AVAILABLE)
+            .group_by(BookCopy.book_id)
+        ).all())
+
+        missing = {book_id: wanted - available.get(book_id, 0) for book_id, wanted in targets.items()}
+        rows = InventoryService._new_rows(executor, missing)
+        if rows:
+            executor.execute(insert(BookCopy), rows)
+
+        for book_id, wanted in targets.items():
+            surplus = available.get(book_id, 0) - wanted
+            if surplus > 0:
+                newest = (
+                    select(BookCopy.id).where(BookCopy.book_id == book_id, AVAILABLE)
+                    .order_by(BookCopy.id.desc()).limit(surplus)
+                )
+                executor.execute(
+                    update(BookCopy).where(BookCopy.id.in_(newest))
+                    .values(status="withdrawn", updated_at=datetime.utcnow())
+                    .execution_options(synchronize_session=False)
+                )
+
+        # No version bump: this runs inside the caller's (versioned) write of the same row
+        return dict(executor.execute(
+            update(Book)
+            .where(Book.id.in_(targets))
+            .values(total_copies=InventoryService._count(CIRCULATING))
+            .returning(Book.id, Book.total_copies)
+            .execution_options(synchronize_session=False)
+        ).all())
+
+    @staticmethod
+    def check_consistency(repair=True, batch_size=None):
+        """
+        The drift auditor. One grouped query compares every book's counters
+        with its copies and active loans: copies_available must equal both
+        total_copies minus the active loans and the copies in "available",
+        and total_copies the copies in circulation. With `repair`, drifted
+        books are fixed `batch_size` (INVENTORY_REPAIR_BATCH_SIZE) at a time,
+        each batch under the book row locks in its own transaction: on-loan
+        copies with no active loan go back on the shelf and both counters are
+        recounted from the copies. Logs and records the report as a metric,
+        and returns it.
+        """
+        batch_size = batch_size or current_app.config["INVENTORY_REPAIR_BATCH_SIZE"]
+        copies = (
+            select(
+                BookCopy.book_id,
+                func.count().filter(AVAILABLE).label("available"),
+                func.count().filter(CIRCULATING).label("circulating"),
+            )
+            .group_by(BookCopy.book_id)
+            .subquery()
+        )
+        loans = (
+            select(BorrowedBook.book_id, func.count().label("active"))
+            .where(ACTIVE_LOAN)
+            .group_by(BorrowedBook.book_id)
+            .subquery()
+        )
+        counter = func.coalesce(Book.copies_available, 0)
+        drifted = db.session.execute(
+            select(Book.id, Book.category_id)
+            .outerjoin(copies, copies.c.book_id == Book.id)
+            .outerjoin(loans, loans.c.book_id == Book.id)
+            .where(or_(
+                counter != Book.total_copies - func.coalesce(loans.c.active, 0),
+                counter != func.coalesce(copies.c.available, 0),
+                Book.total_copies != func.coalesce(copies.c.circulating, 0),
+            ))
+            .order_by(Book.id)
+        ).all()
+
+        batches = 0
+        if repair:
+            for start in range(0, len(drifted), batch_size):
+                InventoryService._repair(drifted[start:start + batch_size])
+                batches += 1
+
+        report = {
+            "drifted": len(drifted),
+            "repaired": repair,
+            "batches": batches,
+            "book_ids": [book_id for book_id, _ in drifted[:InventoryService.DRIFT_SAMPLE]],
+            "checked_at": datetime.utcnow().isoformat(timespec="seconds"),
+        }
+        InventoryService._record(report)
+        return report
+
+    @staticmethod
+    def last_report():
+        """The last recorded consistency report, or None (never run, or Redis unavailable)."""
+        client = CatalogCache._client()
+        if client is None:
+            return None
+        try:
+            stored = client.get(InventoryService.METRIC_KEY)
+        except RedisError as e:
+            CatalogCache._failed(e)
+            return None
+        return json.loads(stored) if stored else None
+
+    @staticmethod
+    def _repair(books):
+        """Repairs one batch of drifted (book_id, category_id) rows and commits."""
+        book_ids = [book_id for book_id, _ in books]
+        try:
+            # Lock first, then count, so a checkout committing in between is included
+            db.session.execute(select(Book.id).where(Book.id.in_(book_ids)).with_for_update())
+            lent = exists().where(BorrowedBook.copy_id == BookCopy.id, ACTIVE_LOAN)
+            db.session.execute(
+                update(BookCopy)
+                .where(BookCopy.book_id.in_(book_ids), BookCopy.status == "on_loan", ~lent)
+                .values(status="available", updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            db.session.execute(
+                update(Book)
+                .where(Book.id.in_(book_ids))
+                .values(
+                    copies_available=InventoryService._count(AVAILABLE),
+                    total_copies=InventoryService._count(CIRCULATING),
+                    version=Book.version + 1,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            for book_id, category_id in books:
+                CatalogCache.mark_book_changed(db.session, book_id, category_id)
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            raise
+
+    @staticmethod
+    def _record(report):
+        """Logs the drift metric and keeps the report in Redis for the admin dashboard."""
+        log = logging.warning if report["drifted"] else logging.info
+        log(f"{'⚠' if report['drifted'] else '✅'} Inventory check: inventory_drift_books={report['drifted']} "
+            f"repaired={report['repaired']} batches={report['batches']}")
+        client = CatalogCache._client()
+        if client is None:
+            return
+        try:
+            client.set(InventoryService.METRIC_KEY, json.dumps(report))
+        except RedisError as e:
+            CatalogCache._failed(e)
+
+    @staticmethod
+    def _count(condition):
+        """Correlated count of the current book's copies matching `condition`."""
+        return (
+            select(func.count())
+            .where(BookCopy.book_id == Book.id, condition)
+            .scalar_subquery()
+        )
+
+    @staticmethod
+    def _new_rows(executor, counts, location=None):
+        """Insert rows for {book_id: n} new available copies, numbered after each book's existing copies."""
+        counts = {book_id: count for book_id, count in counts.items() if count > 0}
+        if not counts:
+            return []
+        existing = dict(executor.execute(
+            select(BookCopy.book_id, func.count())
+            .where(BookCopy.book_id.in_(counts))
+            .group_by(BookCopy.book_id)
+        ).all())
+        now = datetime.utcnow()
+        return [
+            {"book_id": book_id, "barcode": InventoryService.barcode(book_id, existing.get(book_id, 0) + sequence),
+             "status": "available", "location": location, "created_at": now, "updated_at": now}
+            for book_id, count in counts.items()
+            for sequence in range(1, count + 1)
+        ]
+
+
+# ─────────────────────────────────────────────────────────
+#  ORM writes to copies_available keep the copies in step
+# ─────────────────────────────────────────────────────────
+@event.listens_for(Book, "after_insert")
+def _shelve_new_copies(mapper, connection, book):
+    totals = InventoryService.match_copies(connection, {book.id: book.copies_available})
+    set_committed_value(book, "total_copies", totals[book.id])
+
+
+@event.listens_for(Book, "after_update")
+def _match_edited_copies(mapper, connection, book):
+    if inspect(book).attrs.copies_available.history.has_changes():
+        totals = InventoryService.match_copies(connection, {book.id: book.copies_available})
+        set_committed_value(book, "total_copies", totals[book.id])
@@ -6,7 +6,7 @@ from flask import jsonify
 # Import the single db instance
 from models import db
 from extensions import mail  # If your mail is defined in extensions.py
-from models.transaction_model import BorrowedBook
+from models.transaction_model import BorrowedBook, ACTIVE_LOAN, UNPAID_FINE
 from models.notification_model import NotificationLog
 from models.user_model import User
 
@@ -33,7 +33,7 @@ class NotificationService:
         try:
             borrowed_books = BorrowedBook.query.filter(
                 BorrowedBook.due_date <= reminder_date,
-                BorrowedBook.returned.is_(False)
+                ACTIVE_LOAN
             ).all()
 
             reminders_sent = 0
@@ -68,10 +68,7 @@ class NotificationService:
     def send_fine_reminders():
         """Sends reminders for unpaid fines."""
         try:
-            overdue_fines = BorrowedBook.query.filter(
-                BorrowedBook.fine_amount > 0,
-                BorrowedBook.fine_paid.is_(False)
-            ).all()
+            overdue_fines = BorrowedBook.query.filter(UNPAID_FINE).all()
 
             reminders_sent = 0
 
@@ -0,0 +1,134 @@
+# services/outbox_service.py
+
+import logging
+from datetime import datetime, timedelta
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+# Import the single db instance
+from models import db
+from extensions import mail
+from models.notification_model import NotificationLog, OutboxMessage, OUTBOX_PENDING
+
+
+class OutboxService:
+    """
+    Transactional outbox for emails. Code that should send a mail calls
+    `enqueue` inside its own transaction, so the message exists exactly when
+    the change that caused it commits, and the request never waits on SMTP.
+
+    `drain` (a Celery beat task every OUTBOX_POLL_INTERVAL seconds) sends due
+    messages OUTBOX_BATCH_SIZE at a time over one SMTP connection per batch.
+    Each batch is claimed with `FOR UPDATE SKIP LOCKED`, so several workers
+    can drain in parallel without sending a message twice. A failed message
+    is retried with exponential backoff (OUTBOX_RETRY_BASE_SECONDS doubling
+    per attempt) and marked failed after OUTBOX_MAX_ATTEMPTS.
+    """
+
+    @staticmethod
+    def _reservation_available(payload):
+        """The "your reserved book is available" email."""
+        message = Message("Book Available!", recipients=[payload["email"]])
+        message.body = f"The book '{payload['title']}' is now available for borrowing!"
+        return message
+
+    # Topic -> builder of the flask_mail Message for a payload
+    TOPICS = {
+        "reservation_available": _reservation_available,
+    }
+
+    @staticmethod
+    def enqueue(topic, payloads):
+        """
+        Queues one message per payload (a JSON-able dict, with "user_id" and
+        "email") inside the current transaction; the caller commits. One
+        multi-row INSERT however many there are.
+        """
+        if topic not in OutboxService.TOPICS:
+            raise ValueError(f"Unknown outbox topic: {topic}")
+        if not payloads:
+            return 0
+        now = datetime.utcnow()
+        db.session.execute(insert(OutboxMessage), [
+            {"topic": topic, "payload": payload, "status": "pending", "attempts": 0,
+             "available_at": now, "created_at": now}
+            for payload in payloads
+        ])
+        return len(payloads)
+
+    @staticmethod
+    def drain(batch_size=None, max_batches=None, now=None):
+        """
+        Sends due messages batch by batch until none are left (or
+        `max_batches` ran), committing after each batch. Returns
+        {"batches", "sent", "retried", "failed"}.
+        """
+        batch_size = batch_size or current_app.config["OUTBOX_BATCH_SIZE"]
+        report = {"batches": 0, "sent": 0, "retried": 0, "failed": 0}
+        while max_batches is None or report["batches"] < max_batches:
+            as_of = now or datetime.utcnow()
+            try:
+                batch = db.session.execute(
+                    select(OutboxMessage)
+                    .where(OUTBOX_PENDING, OutboxMessage.available_at <= as_of)
+                    .order_by(OutboxMessage.available_at, OutboxMessage.id)
+                    .limit(batch_size)
+                    .with_for_update(skip_locked=True)
+                ).scalars().all()
+                if not batch:
+                    db.session.rollback()
+                    break
+                OutboxService._send_batch(batch, as_of, report)
+                db.session.commit()
+            except SQLAlchemyError:
+                db.session.rollback()
+                raise
+            report["batches"] += 1
+
+        if report["batches"]:
+            logging.info(f"✅ Outbox drained: {report['sent']} sent, {report['retried']} retried, "
+                         f"{report['failed']} failed in {report['batches']} batches")
+        return report
+
+    @staticmethod
+    def _send_batch(batch, now, report):
+        """Sends one claimed batch over a single SMTP connection and records each outcome."""
+        unsent = list(batch)
+        try:
+            with mail.connect() as connection:
+                while unsent:
+                    message = unsent[0]
+                    try:
+                        email = OutboxService.TOPICS[message.topic](message.payload)
+                        connection.send(email)
+                    except Exception as e:
+                        OutboxService._retry(message, e, now, report)
+                    else:
+                        message.status, message.sent_at, message.last_error = "sent", now, None
+                        message.attempts += 1
+                        db.session.add(NotificationLog(
+                            user_id=message.payload["user_id"],
+                            message=email.body[:255],
+                            notification_type=message.topic,
+                        ))
+                        report["sent"] += 1
+                    unsent.pop(0)
+        except Exception as e:  # SMTP unreachable: everything not yet sent waits for the next attempt
+            for message in unsent:
+                OutboxService._retry(message, e, now, report)
+
+    @staticmethod
+    def _retry(message, error, now, report):
+        """Backs a failed message off exponentially, or gives up after OUTBOX_MAX_ATTEMPTS."""
+        message.attempts += 1
+        message.last_error = str(error)[:255]
+        if message.attempts >= current_app.config["OUTBOX_MAX_ATTEMPTS"]:
+            message.status = "failed"
+            report["failed"] += 1
+            logging.error(f"❌ Outbox message {message.id} ({message.topic}) failed for good: {error}")
+            return
+        delay = current_app.config["OUTBOX_RETRY_BASE_SECONDS"] * 2 ** (message.attempts - 1)
+        message.available_at = now + timedelta(seconds=delay)
+        report["retried"] += 1
@@ -2,13 +2,13 @@
 
 import razorpay
 import os
-from datetime import datetime
 from sqlalchemy.exc import SQLAlchemyError
 from flask import jsonify
 
 # Import the single db instance
 from models import db
-from models.transaction_model import BorrowedBook, PaymentRecord
+from models.transaction_model import PaymentRecord
+from services.circulation_service import CirculationService
 
 # Load Razorpay API Key from environment variables
 razorpay_client = razorpay.Client(auth=(
@@ -53,18 +53,9 @@ class PaymentService:
                 return jsonify({"error": "Transaction already processed"}), 400
 
             # Mark any pending fines as paid
-            pending_fines = BorrowedBook.query.filter(
-                BorrowedBook.user_id == user_id,
-                BorrowedBook.fine_amount > 0,
-                BorrowedBook.fine_paid.is_(False)
-            ).all()
-
-            if not pending_fines:
+            if not CirculationService.settle_fines(user_id):
                 return jsonify({"message": "No pending fines to pay."}), 200
 
-            for fine in pending_fines:
-                fine.fine_paid = True
-
             # Store a new payment record
             payment_record = PaymentRecord(
                 user_id=user_id,
@@ -1,25 +1,46 @@
 # services/reservation_service.py
 
-from datetime import datetime
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import Integer, and_, exists, func, select, tuple_, update
 from sqlalchemy.exc import SQLAlchemyError
-from flask_mail import Message
-from flask import jsonify
+from flask import current_app, jsonify
 
 # Import the single db instance
 from models import db
-from extensions import mail
+from database import values_table
+from models.user_model import User
 from models.book_model import Book
-from models.transaction_model import BorrowedBook
-from models.reservation_model import ReservedBook
+from models.transaction_model import BorrowedBook, ACTIVE_LOAN
+from models.reservation_model import ReservedBook, NOTIFIED_HOLD
+from services.outbox_service import OutboxService
+
+PENDING = ReservedBook.status == "pending"
+QUEUE_ORDER = (ReservedBook.reserved_at, ReservedBook.id)  # First come, first served; id breaks ties
+
 
 class ReservationService:
-    """Service to handle book reservations."""
+    """
+    Service to handle book reservations.
+
+    Each book's waitlist is its pending reservations in QUEUE_ORDER, read
+    from the (book_id, status, reserved_at) queue index. `holds` reports a
+    student's place in those queues with window functions, so one
+    statement answers "where am I" for one or all of their holds, together
+    with an estimated date a copy frees up for them.
+
+    A notified student has HOLD_PICKUP_HOURS to borrow the book (which
+    fulfils the hold). `expire_holds` expires the holds nobody collected
+    and `promote`s the next students in line, as many as there are copies
+    on the shelf that no other notified hold is waiting for.
+    """
 
     @staticmethod
     def reserve_book(user_id, book_id):
         """Allows a student to reserve a book if no copies are available."""
         try:
-            book = Book.query.get(book_id)
+            book = Book.get_active(book_id)
             if not book:
                 return jsonify({"error": "Book not found"}), 404
 
@@ -48,15 +69,20 @@ class ReservationService:
     def cancel_reservation(user_id, book_id):
         """Allows a student to cancel their reservation."""
         try:
-            reservation = ReservedBook.query.filter_by(
-                user_id=user_id,
-                book_id=book_id,
-                status="pending"
+            reservation = ReservedBook.query.filter(
+                ReservedBook.user_id == user_id,
+                ReservedBook.book_id == book_id,
+                ReservedBook.status.in_(("pending", "notified")),
             ).first()
             if not reservation:
                 return jsonify({"error": "No active reservation found"}), 404
 
+            was_notified = reservation.status == "notified"
             db.session.delete(reservation)
+            if was_notified:
+                # The copy waiting for this student goes to the next one in line
+                db.session.flush()
+                ReservationService.promote({book_id: 1})
             db.session.commit()
 
             return jsonify({"message": "Reservation canceled successfully"}), 200
@@ -66,37 +92,216 @@ class ReservationService:
             return jsonify({"error": f"Database error: {str(e)}"}), 500
 
     @staticmethod
-    def notify_reservation(book_id):
+    def fulfill(pairs):
         """
-        Notifies the first student in the queue when a book is returned.
-        Returns the user_id if someone was notified, or None if no reservations.
+        Closes the open holds (pending or notified) of (user_id, book_id)
+        pairs that were just lent, inside the caller's transaction, so a
+        collected hold neither expires nor keeps its place in the queue.
         """
-        try:
-            reservation = ReservedBook.query.filter_by(
-                book_id=book_id,
-                status="pending"
-            ).order_by(ReservedBook.reserved_at).first()
+        if not pairs:
+            return
+        db.session.execute(
+            update(ReservedBook)
+            .where(
+                tuple_(ReservedBook.user_id, ReservedBook.book_id).in_(pairs),
+                ReservedBook.status.in_(("pending", "notified")),
+            )
+            .values(status="fulfilled")
+            .execution_options(synchronize_session=False)
+        )
 
-            if reservation:
-                reservation.status = "notified"
+    @staticmethod
+    def promote(counts, now=None):
+        """
+        Notifies the first n pending reservations of each book
+        ({book_id: n copies just freed}) with one UPDATE, and queues their
+        emails with one outbox INSERT, inside the caller's transaction. n is
+        capped at the book's copies_available minus its holds already
+        notified, so nobody is told about a copy that is not there. Returns
+        the notified (id, user_id, book_id) rows.
+
+        Called wherever copies reach the shelf: returns, cancelled or expired
+        holds, stock raised by an admin, copies added or found, and imports.
+        Books nobody is waiting for cost only the first SELECT.
+
+        The rows are claimed by the UPDATE itself, and it re-checks PENDING,
+        so two workers freeing copies of the same book at once notify
+        different students, never one student twice.
+        """
+        if not counts:
+            return []
+        now = now or datetime.utcnow()
+        promised = select(func.count()).where(ReservedBook.book_id == Book.id, NOTIFIED_HOLD).scalar_subquery()
+        waiting = exists().where(ReservedBook.book_id == Book.id, PENDING)
+        free = dict(db.session.execute(
+            select(Book.id, func.coalesce(Book.copies_available, 0) - promised)
+            .where(Book.id.in_(counts), Book.deleted_at.is_(None), waiting)
+        ).all())
+        wanted = {book_id: min(n, free.get(book_id, 0)) for book_id, n in counts.items()}
+        wanted = {book_id: n for book_id, n in wanted.items() if n > 0}
+        if not wanted:
+            return []
+
+        claims = values_table("claims", {"book_id": Integer, "copies": Integer}, wanted.items())
+        ranked = (
+            select(
+                ReservedBook.id,
+                ReservedBook.book_id,
+                func.row_number().over(partition_by=ReservedBook.book_id, order_by=QUEUE_ORDER).label("rank"),
+            )
+            .where(PENDING, ReservedBook.book_id.in_(wanted))
+            .subquery()
+        )
+        picked = (
+            select(ranked.c.id)
+            .join(claims, claims.c.book_id == ranked.c.book_id)
+            .where(ranked.c.rank <= claims.c.copies)
+        )
+        notified = db.session.execute(
+            update(ReservedBook)
+            .where(ReservedBook.id.in_(picked), PENDING)
+            .values(status="notified", notified_at=now)
+            .returning(ReservedBook.id, ReservedBook.user_id, ReservedBook.book_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        if notified:
+            recipients = db.session.execute(
+                select(ReservedBook.id, ReservedBook.user_id, User.email, Book.title)
+                .join(User, User.id == ReservedBook.user_id)
+                .join(Book, Book.id == ReservedBook.book_id)
+                .where(ReservedBook.id.in_([row.id for row in notified]))
+            ).all()
+            OutboxService.enqueue("reservation_available", [
+                {"reservation_id": row.id, "user_id": row.user_id, "email": row.email, "title": row.title}
+                for row in recipients
+            ])
+        return notified
+
+    @staticmethod
+    def expire_holds(now=None, batch_size=None, max_batches=None):
+        """
+        Expires notified holds not collected within HOLD_PICKUP_HOURS and
+        promotes the next reservation for each, in batches of `batch_size`
+        (HOLD_EXPIRY_BATCH_SIZE) holds, oldest first, one transaction each.
+        Each batch claims its holds with `FOR UPDATE SKIP LOCKED`, so
+        several workers can run this at once: they take disjoint batches and
+        nobody is expired or notified twice. Returns {"expired", "promoted",
+        "batches"}.
+        """
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(hours=current_app.config["HOLD_PICKUP_HOURS"])
+        batch_size = batch_size or current_app.config["HOLD_EXPIRY_BATCH_SIZE"]
+        report = {"expired": 0, "promoted": 0, "batches": 0}
+
+        while max_batches is None or report["batches"] < max_batches:
+            claim = (
+                select(ReservedBook.id)
+                .where(NOTIFIED_HOLD, ReservedBook.notified_at < cutoff)
+                .order_by(ReservedBook.notified_at)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            try:
+                expired = db.session.execute(
+                    update(ReservedBook)
+                    .where(ReservedBook.id.in_(claim), NOTIFIED_HOLD)
+                    .values(status="expired")
+                    .returning(ReservedBook.book_id)
+                    .execution_options(synchronize_session=False)
+                ).scalars().all()
+                promoted = ReservationService.promote(Counter(expired), now)
                 db.session.commit()
+            except SQLAlchemyError:
+                db.session.rollback()
+                raise
+            if not expired:
+                break
+            report["expired"] += len(expired)
+            report["promoted"] += len(promoted)
+            report["batches"] += 1
+            if len(expired) < batch_size:
+                break
+
+        if report["expired"]:
+            logging.info(f"✅ Expired {report['expired']} uncollected holds, notified {report['promoted']} "
+                         f"next in line ({report['batches']} batches)")
+        return report
 
-                # Send an email notification
-                user_email = reservation.user.email
-                msg = Message("Book Available!", recipients=[user_email])
-                msg.body = f"The book '{reservation.book.title}' is now available for borrowing!"
+    @staticmethod
+    def holds(user_id, book_id=None, now=None):
+        """
+        A student's pending holds (or their hold on one book) with their
+        position, queue length and estimated availability, in one statement.
 
-                try:
-                    mail.send(msg)
-                except Exception as e:
-                    print(f"❌ Email sending failed: {e}")
-                    return jsonify({"error": "Email notification failed, but reservation updated"}), 500
+        Positions are `row_number()` over each waitlist; only the queues of
+        books the student is waiting for are read. The estimate assumes
+        loans come back on their due dates: the n-th hold gets a copy now
+        while copies_available covers it, and otherwise when the
+        (n - copies_available)-th earliest-due active loan is returned. It is
+        None when the queue is longer than the copies out.
+        """
+        now = now or datetime.utcnow()
+        mine = select(ReservedBook.book_id).where(ReservedBook.user_id == user_id, PENDING)
+        if book_id is not None:
+            mine = mine.where(ReservedBook.book_id == book_id)
 
-                # Return the user who was notified
-                return reservation.user_id
+        queue = (
+            select(
+                ReservedBook.id,
+                ReservedBook.user_id,
+                ReservedBook.book_id,
+                ReservedBook.reserved_at,
+                func.row_number().over(partition_by=ReservedBook.book_id, order_by=QUEUE_ORDER).label("position"),
+                func.count().over(partition_by=ReservedBook.book_id).label("queue_length"),
+            )
+            .where(PENDING, ReservedBook.book_id.in_(mine))
+            .subquery()
+        )
+        returns = (
+            select(
+                BorrowedBook.book_id,
+                BorrowedBook.due_date,
+                func.row_number().over(
+                    partition_by=BorrowedBook.book_id, order_by=(BorrowedBook.due_date, BorrowedBook.id)
+                ).label("rank"),
+            )
+            .where(ACTIVE_LOAN, BorrowedBook.book_id.in_(mine))
+            .subquery()
+        )
+        available = func.coalesce(Book.copies_available, 0)
+        rows = db.session.execute(
+            select(
+                queue.c.id, queue.c.book_id, Book.title, queue.c.reserved_at,
+                queue.c.position, queue.c.queue_length, available.label("copies_available"),
+                returns.c.due_date,
+            )
+            .join(Book, Book.id == queue.c.book_id)
+            .outerjoin(returns, and_(
+                returns.c.book_id == queue.c.book_id,
+                returns.c.rank == queue.c.position - available,
+            ))
+            .where(queue.c.user_id == user_id)
+            .order_by(queue.c.reserved_at, queue.c.id)
+        ).all()
 
-            return None  # No reservations
+        return [
+            {
+                "reservation_id": row.id,
+                "book_id": row.book_id,
+                "title": row.title,
+                "reserved_at": row.reserved_at.strftime("%Y-%m-%d %H:%M:%S"),
+                "position": row.position,
+                "queue_length": row.queue_length,
+                "estimated_available": ReservationService._eta(row, now),
+            }
+            for row in rows
+        ]
 
-        except SQLAlchemyError as e:
-            db.session.rollback()
-            return jsonify({"error": f"Database error: {str(e)}"}), 500
+    @staticmethod
+    def _eta(row, now):
+        """Estimated availability date ("%Y-%m-%d") for one `holds` row, or None when unknown."""
+        if row.position <= row.copies_available:
+            return now.strftime("%Y-%m-%d")
+        if row.due_date is None:
+            return None
+        return max(row.due_date, now).strftime("%Y-%m-%d")  # overdue loans may come back any day
@@ -0,0 +1,244 @@
+# services/search_service.py
+
+import re
+from sqlalchemy import case, column, func, literal, literal_column, null, select, table, tuple_, union_all
+from flask import current_app
+
+# Import the single db instance
+from models import db
+from models.book_model import Book, Category
+from services.cache_service import CatalogCache
+from services.catalog_service import CatalogService
+from services.fuzzy_index import CatalogSpellIndex
+
+# Lookup table for the SQLite FTS5 index (created in models/book_model.py)
+book_fts = table("book_fts", column("rowid"))
+
+class SearchService:
+    """
+    Ranked catalog search.
+    PostgreSQL uses the weighted `book.search_vector` GIN index, SQLite uses the
+    `book_fts` FTS5 table, and any other database falls back to ilike.
+    Every query term is prefix-matched and all terms must match.
+    `facets` counts the hits per category, author and availability, and
+    when nothing matches, `suggest` offers typo-tolerant alternatives.
+    """
+
+    # Relative field weights: title > author > isbn
+    FTS5_WEIGHTS = (10.0, 4.0, 1.0)
+
+    # A book counts as available while at least one copy is on the shelf
+    AVAILABLE = func.coalesce(Book.copies_available, 0) > 0
+
+    @staticmethod
+    def tokenize(query):
+        """Splits a search string into lowercase word tokens."""
+        return re.findall(r"\w+", (query or "").lower())
+
+    @staticmethod
+    def search(query, page=1, limit=None, category_id=None, available=None):
+        """
+        Returns (books, has_more) for one page of ranked results.
+        Pages are 1-based; the page size follows the catalog page bounds.
+        `category_id` and `available` narrow the hits to one facet value.
+        """
+        tokens = SearchService.tokenize(query)
+        if not tokens:
+            return [], False
+
+        limit = CatalogService.page_size(limit)
+        page = max(1, page or 1)
+
+        rows, ranking = SearchService._match(query, tokens)
+        if category_id is not None:
+            rows = rows.filter(Book.category_id == category_id)
+        if available is not None:
+            rows = rows.filter(SearchService.AVAILABLE if available else ~SearchService.AVAILABLE)
+
+        rows = rows.order_by(*ranking).offset((page - 1) * limit).limit(limit + 1).all()
+        return [CatalogService.serialize(row) for row in rows[:limit]], len(rows) > limit
+
+    @staticmethod
+    def _match(query, tokens):
+        """Returns (matching catalog query, ranking order) for the current database."""
+        dialect = db.engine.dialect.name
+        if dialect == "postgresql":
+            return SearchService._postgres_query(tokens)
+        if dialect == "sqlite":
+            return SearchService._sqlite_query(tokens)
+        return SearchService.ilike_query(query), (Book.id,)
+
+    @staticmethod
+    def _postgres_query(tokens):
+        """tsvector @@ tsquery over the GIN index, ranked by ts_rank."""
+        tsquery = func.to_tsquery("simple", " & ".join(f"{token}:*" for token in tokens))
+        vector = literal_column("book.search_vector")
+        rank = func.ts_rank(vector, tsquery)
+        return CatalogService.query().filter(vector.op("@@")(tsquery)), (rank.desc(), Book.id)
+
+    @staticmethod
+    def _sqlite_query(tokens):
+        """FTS5 MATCH ranked by weighted bm25 (lower is better)."""
+        match = " AND ".join(f'"{token}"*' for token in tokens)
+        fts = literal_column("book_fts")
+        rank = func.bm25(fts, *SearchService.FTS5_WEIGHTS)
+        return (
+            CatalogService.query()
+            .join(book_fts, book_fts.c.rowid == Book.id)
+            .filter(fts.op("MATCH")(match))
+        ), (rank, Book.id)
+
+    @staticmethod
+    def ilike_query(query):
+        """The unindexed substring search over title, author and isbn."""
+        pattern = f"%{query}%"
+        return CatalogService.query().filter(
+            (Book.title.ilike(pattern)) |
+            (Book.author.ilike(pattern)) |
+            (Book.isbn.ilike(pattern))
+        )
+
+    # ─────────────────────────────────────────────────────────
+    #  Facets
+    # ─────────────────────────────────────────────────────────
+    @staticmethod
+    def facets(query):
+        """
+        Counts the hits of `query` per category, per author and by
+        availability in one aggregate statement. Counts cover every hit,
+        ignoring the category/availability filters, so the UI can offer all
+        values. Results are cached until the catalog changes.
+        """
+        tokens = SearchService.tokenize(query)
+        if not tokens:
+            return SearchService._facet_result([])
+
+        return CatalogCache.get_or_load(
+            f"facets:{' '.join(tokens)}",
+            [CatalogCache.version_key("list")],
+            lambda: SearchService._facet_result(SearchService._facet_rows(query, tokens)),
+        )
+
+    @staticmethod
+    def _facet_rows(query, tokens):
+        """Runs the facet aggregate: GROUPING SETS on PostgreSQL, UNION ALL elsewhere."""
+        matches, _ = SearchService._match(query, tokens)
+        hits = matches.with_entities(
+            Book.category_id.label("category_id"),
+            Category.name.label("category_name"),
+            Book.author.label("author"),
+            SearchService.AVAILABLE.label("available"),
+        ).cte("hits")
+        limit = current_app.config["SEARCH_FACET_LIMIT"]
+
+        if db.engine.dialect.name == "postgresql":
+            grouping = func.grouping(hits.c.category_id, hits.c.author, hits.c.available)
+            facet = case(
+                (grouping == 0b011, "category"),
+                (grouping == 0b101, "author"),
+                (grouping == 0b110, "availability"),
+                else_="total",
+            )
+            ranked = (
+                select(
+                    facet.label("facet"),
+                    hits.c.category_id, hits.c.category_name, hits.c.author, hits.c.available,
+                    func.count().label("count"),
+                    func.row_number().over(partition_by=grouping, order_by=func.count().desc()).label("position"),
+                )
+                .group_by(func.grouping_sets(
+                    tuple_(hits.c.category_id, hits.c.category_name),
+                    hits.c.author,
+                    hits.c.available,
+                    tuple_(),
+                ))
+                .subquery()
+            )
+            statement = select(ranked).where(ranked.c.position <= limit)
+        else:
+            def facet(name, *columns, top=True):
+                values = {column.name: column for column in columns}
+                part = select(
+                    literal(name).label("facet"),
+                    values.get("category_id", null()).label("category_id"),
+                    values.get("category_name", null()).label("category_name"),
+                    values.get("author", null()).label("author"),
+                    values.get("available", null()).label("available"),
+                    func.count().label("count"),
+                ).select_from(hits)
+                if columns:
+                    part = part.group_by(*columns)
+                if top:
+                    part = part.order_by(func.count().desc()).limit(limit)
+                return select(part.subquery())
+
+            statement = union_all(
+                facet("category", hits.c.category_id, hits.c.category_name),
+                facet("author", hits.c.author),
+                facet("availability", hits.c.available),
+                facet("total", top=False),
+            )
+
+        return db.session.execute(statement).all()
+
+    @staticmethod
+    def _facet_result(rows):
+        """Shapes aggregate rows into the facets payload."""
+        result = {"total": 0, "category": [], "author": [], "availability": {"available": 0, "borrowed": 0}}
+        for row in rows:
+            if row.facet == "category":
+                result["category"].append({"id": row.category_id, "name": row.category_name, "count": row.count})
+            elif row.facet == "author":
+                result["author"].append({"name": row.author, "count": row.count})
+            elif row.facet == "availability":
+                result["availability"]["available" if row.available else "borrowed"] = row.count
+            else:
+                result["total"] = row.count
+
+        for values in (result["category"], result["author"]):
+            values.sort(key=lambda value: (-value["count"], value.get("name") or ""))
+        return result
+
+    @staticmethod
+    def suggest(query, limit=None):
+        """
+        Typo-tolerant "did you mean" lookup for a query with no exact hits.
+        Returns a ranked list of suggested query strings (best first); it is
+        empty when nothing in the catalog is close.
+        """
+        tokens = SearchService.tokenize(query)
+        if not tokens:
+            return []
+
+        limit = limit or current_app.config["SEARCH_SUGGESTION_LIMIT"]
+        if db.engine.dialect.name == "postgresql":
+            return SearchService._trigram_suggest(" ".join(tokens), limit)
+
+        index = CatalogSpellIndex.get(current_app.config["FUZZY_INDEX_TTL"], SearchService._catalog_words)
+        return [" ".join(words) for words in
+                index.suggest(tokens, limit, max_tokens=current_app.config["SEARCH_SUGGEST_MAX_TOKENS"])]
+
+    @staticmethod
+    def _trigram_suggest(text, limit):
+        """Closest titles and authors by pg_trgm word similarity (GIN trigram indexes)."""
+        suggestions = []
+        for field in (func.lower(Book.title), func.lower(Book.author)):
+            score = func.word_similarity(text, field)
+            suggestions += (
+                db.session.query(field.label("text"), func.max(score).label("score"))
+                .filter(db.literal(text).op("<%")(field), Book.deleted_at.is_(None))
+                .group_by(field)
+                .order_by(func.max(score).desc())
+                .limit(limit)
+                .all()
+            )
+
+        suggestions.sort(key=lambda row: row.score, reverse=True)
+        return [row.text for row in suggestions[:limit]]
+
+    @staticmethod
+    def _catalog_words():
+        """Streams every title and author word for the in-memory spelling index."""
+        for title, author in db.session.query(Book.title, Book.author).filter(Book.deleted_at.is_(None)).yield_per(5000):
+            yield from SearchService.tokenize(title)
+            yield from SearchService.tokenize(author)
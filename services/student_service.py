@@ -1,53 +1,28 @@
 # services/student_service.py
 
-from datetime import datetime, timedelta
 from sqlalchemy.exc import SQLAlchemyError
 from flask import jsonify
 
 # Import the single db instance
 from models import db
-from models.book_model import Book
 from models.transaction_model import BorrowedBook
-from services.reservation_service import ReservationService
+from services.circulation_service import CirculationService
 
 class StudentService:
     """Service class handling student-related book borrowing and returning operations."""
-    FINE_PER_DAY = 5  # ₹5 per day late fine
 
     @staticmethod
     def borrow_book(user_id, book_id):
         """Allows a student to borrow a book if available."""
         try:
-            book = Book.query.get(book_id)
-            if not book:
-                return jsonify({"error": "Book not found"}), 404
+            loan, reason = CirculationService.borrow(user_id, book_id)
+            if reason:
+                message, status = CirculationService.ERRORS[reason]
+                return jsonify({"error": message}), status
 
-            if book.copies_available < 1:
-                return jsonify({"error": "Book is not available for borrowing"}), 400
-
-            # Check if student already borrowed this book
-            existing_borrow = BorrowedBook.query.filter_by(
-                user_id=user_id,
-                book_id=book_id,
-                returned=False
-            ).first()
-            if existing_borrow:
-                return jsonify({"error": "You have already borrowed this book"}), 400
-
-            due_date = datetime.utcnow() + timedelta(days=14)
-            borrow_entry = BorrowedBook(
-                user_id=user_id,
-                book_id=book_id,
-                due_date=due_date,
-                returned=False
-            )
-            book.copies_available -= 1
-
-            db.session.add(borrow_entry)
-            db.session.commit()
             return jsonify({
                 "message": "Book borrowed successfully",
-                "due_date": due_date.strftime('%Y-%m-%d')
+                "due_date": loan.due_date.strftime('%Y-%m-%d')
             }), 201
 
         except SQLAlchemyError as e:
@@ -85,27 +60,12 @@ class StudentService:
     def return_book(borrow_id):
         """Handles the return of a borrowed book and notifies reserved users."""
         try:
-            borrow_entry = BorrowedBook.query.get(borrow_id)
-            if not borrow_entry:
+            # The first reserved user (if any) is notified once the return commits
+            loan, reason = CirculationService.return_loan(loan_id=borrow_id)
+            if reason:
                 return jsonify({"error": "Borrow record not found"}), 404
 
-            book = Book.query.get(borrow_entry.book_id)
-            if not book:
-                return jsonify({"error": "Book details not found"}), 404
-
-            borrow_entry.returned = True
-            borrow_entry.return_date = datetime.utcnow()
-            book.copies_available += 1
-
-            db.session.commit()
-
-            # Notify the first reserved user if any
-            reserved_user_id = ReservationService.notify_reservation(book.id)
-            if reserved_user_id:
-                # Log or handle the notification any way you want
-                print(f"📢 Notifying user {reserved_user_id} that '{book.title}' is now available!")
-
-            return jsonify({"message": "Book returned successfully"}), 200
+            return jsonify({"message": "Book returned successfully", "fine_amount": loan.fine_amount}), 200
 
         except SQLAlchemyError as e:
             db.session.rollback()
@@ -113,17 +73,15 @@ class StudentService:
 
     @staticmethod
     def request_extension(borrow_id):
-        """Allows a student to request a 7-day extension for a borrowed book."""
+        """Allows a student to request an extension (RENEWAL_DAYS) for a borrowed book."""
         try:
-            borrow_entry = BorrowedBook.query.get(borrow_id)
-            if not borrow_entry or borrow_entry.returned:
+            loan, reason = CirculationService.renew_loan(loan_id=borrow_id)
+            if reason:
                 return jsonify({"error": "No active borrow record found"}), 400
 
-            borrow_entry.due_date += timedelta(days=7)
-            db.session.commit()
             return jsonify({
                 "message": "Book extension granted",
-                "new_due_date": borrow_entry.due_date.strftime('%Y-%m-%d')
+                "new_due_date": loan.due_date.strftime('%Y-%m-%d')
             }), 200
 
         except SQLAlchemyError as e:
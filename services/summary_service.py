@@ -0,0 +1,189 @@
+# services/summary_service.py
+
+import logging
+from datetime import datetime
+from sqlalchemy import Integer, bindparam, event, func, insert, select, update
+
+# Import the single db instance
+from models import db
+from database import values_table
+from models.user_model import User
+from models.transaction_model import BorrowedBook, UserCirculationSummary, ACTIVE_LOAN, UNPAID_FINE
+
+Summary = UserCirculationSummary
+
+
+class SummaryService:
+    """
+    Per-user circulation counters in `user_circulation_summary`, so borrow
+    eligibility and dashboards read one row instead of scanning
+    borrowed_book.
+
+    CirculationService calls `apply` inside every checkout, return, renewal,
+    fine payment and fine accrual transaction with the change in active
+    loans per user; one UPDATE ... FROM (VALUES ...) applies them and
+    recounts those users' unpaid fines and overdue loans over the partial
+    indexes, so a fine that grows or is paid never leaves a stale total.
+    Loans also turn overdue just by time passing, so the periodic
+    `reconcile` job refreshes overdue counts for everyone and repairs any
+    drift left by writes that bypassed the service.
+    """
+
+    FINE_TOLERANCE = 0.005  # Float totals closer than this to the truth are not drift
+    DRIFT_SAMPLE = 50       # Drifted user ids listed in a reconcile report
+
+    @staticmethod
+    def get(user_id):
+        """Returns a user's counters (zeros when the user has no summary row yet)."""
+        summary = db.session.get(Summary, user_id)
+        if summary is None:
+            return {"active_count": 0, "unpaid_fine_total": 0.0, "overdue_count": 0, "updated_at": None}
+        return SummaryService.serialize(summary)
+
+    @staticmethod
+    def serialize(summary):
+        """Converts a summary row into a JSON-friendly dictionary."""
+        return {
+            "active_count": summary.active_count,
+            "unpaid_fine_total": summary.unpaid_fine_total,
+            "overdue_count": summary.overdue_count,
+            "updated_at": summary.updated_at.isoformat() if summary.updated_at else None,
+        }
+
+    @staticmethod
+    def totals():
+        """Library-wide sums of the counters, for the admin dashboard."""
+        active, fines, overdue = db.session.execute(select(
+            func.coalesce(func.sum(Summary.active_count), 0),
+            func.coalesce(func.sum(Summary.unpaid_fine_total), 0),
+            func.coalesce(func.sum(Summary.overdue_count), 0),
+        )).one()
+        return {"active_loans": active, "unpaid_fines": fines, "overdue_loans": overdue}
+
+    @staticmethod
+    def apply(deltas, now=None):
+        """
+        Applies {user_id: active loans delta} inside the current transaction
+        and recounts those users' unpaid fines and overdue loans. Users
+        without a row yet get one computed from borrowed_book.
+        """
+        if not deltas:
+            return
+        now = now or datetime.utcnow()
+        if len(deltas) == 1:
+            # Single-user writes use bound parameters so the statement stays in the compiled cache
+            [(user_id, active)] = deltas.items()
+            active, match = bindparam("active", active), Summary.user_id == int(user_id)
+        else:
+            changes = values_table(
+                "changes", {"user_id": Integer, "active": Integer}, deltas.items(),
+            )
+            active, match = changes.c.active, Summary.user_id == changes.c.user_id
+        updated = db.session.execute(
+            update(Summary)
+            .where(match)
+            .values(
+                active_count=Summary.active_count + active,
+                unpaid_fine_total=SummaryService._unpaid_total(Summary.user_id),
+                overdue_count=SummaryService._overdue_count(Summary.user_id, now),
+                updated_at=now,
+            )
+            .returning(Summary.user_id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+
+        missing = {int(user_id) for user_id in deltas} - set(updated)
+        if missing:
+            actual = SummaryService._actual(now, missing)
+            db.session.execute(insert(Summary), [
+                {"user_id": user_id, **dict(zip(("active_count", "unpaid_fine_total", "overdue_count"),
+                                                actual.get(user_id, (0, 0.0, 0)))), "updated_at": now}
+                for user_id in sorted(missing)
+            ])
+
+    @staticmethod
+    def reconcile(repair=True, now=None):
+        """
+        Recomputes every user's counters from borrowed_book and compares them
+        with the stored rows. Active-loan or fine mismatches and missing rows
+        are drift; overdue counts are simply refreshed. With `repair` the rows
+        are fixed and committed. Returns a report.
+        """
+        now = now or datetime.utcnow()
+        actual = SummaryService._actual(now)
+        stored = db.session.execute(
+            select(User.id, Summary.active_count, Summary.unpaid_fine_total, Summary.overdue_count)
+            .outerjoin(Summary, Summary.user_id == User.id)
+        ).all()
+
+        drifted, stale, missing = [], [], []
+        for user_id, active, fines, overdue in stored:
+            true_active, true_fines, true_overdue = actual.get(user_id, (0, 0.0, 0))
+            row = {"user_id": user_id, "active_count": true_active, "unpaid_fine_total": true_fines,
+                   "overdue_count": true_overdue, "updated_at": now}
+            if active is None:
+                missing.append(row)
+            elif active != true_active or abs(fines - true_fines) > SummaryService.FINE_TOLERANCE:
+                drifted.append(row)
+            elif overdue != true_overdue:
+                stale.append(row)
+
+        if drifted or missing:
+            logging.warning(f"⚠ Circulation summary drift: {len(drifted)} wrong, {len(missing)} missing rows")
+        if repair:
+            if drifted or stale:
+                db.session.execute(update(Summary), drifted + stale)
+            if missing:
+                db.session.execute(insert(Summary), missing)
+            db.session.commit()
+
+        return {
+            "checked": len(stored),
+            "drifted": len(drifted),
+            "missing": len(missing),
+            "overdue_refreshed": len(stale),
+            "repaired": repair,
+            "user_ids": sorted(row["user_id"] for row in drifted + missing)[:SummaryService.DRIFT_SAMPLE],
+        }
+
+    @staticmethod
+    def _unpaid_total(user_id):
+        """Correlated sum of a user's unpaid fines, read from the unpaid-fines index."""
+        return (
+            select(func.coalesce(func.sum(BorrowedBook.fine_amount), 0.0))
+            .where(BorrowedBook.user_id == user_id, UNPAID_FINE)
+            .scalar_subquery()
+        )
+
+    @staticmethod
+    def _overdue_count(user_id, now):
+        """Correlated count of a user's active loans past their due date."""
+        return (
+            select(func.count())
+            .where(BorrowedBook.user_id == user_id, ACTIVE_LOAN, BorrowedBook.due_date < now)
+            .scalar_subquery()
+        )
+
+    @staticmethod
+    def _actual(now, user_ids=None):
+        """{user_id: (active loans, unpaid fines, overdue loans)} computed from borrowed_book."""
+        query = (
+            select(
+                BorrowedBook.user_id,
+                func.count().filter(ACTIVE_LOAN),
+                func.coalesce(func.sum(BorrowedBook.fine_amount).filter(UNPAID_FINE), 0.0),
+                func.count().filter(ACTIVE_LOAN, BorrowedBook.due_date < now),
+            )
+            .group_by(BorrowedBook.user_id)
+        )
+        if user_ids is not None:
+            query = query.where(BorrowedBook.user_id.in_(user_ids))
+        return {user_id: (active, fines, overdue) for user_id, active, fines, overdue in db.session.execute(query)}
+
+
+# ─────────────────────────────────────────────────────────
+#  Every new user starts with an all-zero summary row
+# ─────────────────────────────────────────────────────────
+@event.listens_for(User, "after_insert")
+def _create_summary(mapper, connection, user):
+    connection.execute(insert(Summary).values(user_id=user.id, updated_at=datetime.utcnow()))
@@ -0,0 +1,232 @@
+# services/typeahead_service.py
+
+import bisect
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+
+# Import the single db instance
+from models import db
+from models.book_model import Book
+from models.transaction_model import BorrowedBook
+from services.cache_service import CatalogCache
+from services.catalog_service import CatalogService
+
+def normalize(text):
+    """Lowercases, strips accents and collapses punctuation to single spaces."""
+    text = "".join(char for char in unicodedata.normalize("NFKD", text or "") if not unicodedata.combining(char))
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+class PrefixIndex:
+    """
+    Sorted-array prefix index of suggestion strings ranked by popularity.
+    Keys live in one sorted list, so the keys starting with a prefix are the
+    contiguous slice found with two bisects. Wide slices (short prefixes) are
+    ranked once and their top results memoized until a key under that
+    prefix changes.
+    """
+
+    MEMO_THRESHOLD = 256  # Slices wider than this are memoized
+
+    def __init__(self):
+        self.keys = []       # sorted "normalized text\0kind" keys
+        self.entries = {}    # key -> [display text, kind, popularity, book count]
+        self.books = {}      # book id -> ([keys], popularity)
+        self.memo = {}       # (prefix, limit) -> cached results
+        self.sorted = True
+
+    def set_book(self, book_id, title, author, popularity):
+        """Adds or replaces one book's title and author suggestions."""
+        self.remove_book(book_id)
+        keys = []
+        for kind, text in (("title", title), ("author", author)):
+            normalized = normalize(text)
+            if not normalized:
+                continue
+            key = f"{normalized}\x00{kind}"
+            entry = self.entries.get(key)
+            if entry is None:
+                self.entries[key] = [text, kind, popularity, 1]
+                self._insert_key(key)
+            else:
+                entry[2] += popularity
+                entry[3] += 1
+            self._forget(normalized)
+            keys.append(key)
+        self.books[book_id] = (keys, popularity)
+
+    def remove_book(self, book_id):
+        """Drops one book's contribution; suggestions no book uses any more disappear."""
+        keys, popularity = self.books.pop(book_id, ((), 0))
+        for key in keys:
+            entry = self.entries[key]
+            entry[2] -= popularity
+            entry[3] -= 1
+            if entry[3] == 0:
+                del self.entries[key]
+                if self.sorted:
+                    del self.keys[bisect.bisect_left(self.keys, key)]
+                else:
+                    self.keys.remove(key)
+            self._forget(key.split("\x00", 1)[0])
+
+    def lookup(self, prefix, limit=10):
+        """Returns up to `limit` (text, kind, popularity) for keys starting with `prefix`."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        if not self.sorted:
+            self.keys.sort()
+            self.sorted = True
+
+        memoized = self.memo.get((prefix, limit))
+        if memoized is not None:
+            return memoized
+
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + "\uffff", start)
+        best = heapq.nsmallest(
+            limit,
+            (self.entries[key] for key in self.keys[start:end]),
+            key=lambda entry: (-entry[2], entry[0]),
+        )
+        results = [(text, kind, popularity) for text, kind, popularity, _ in best]
+        if end - start > self.MEMO_THRESHOLD:
+            self.memo[(prefix, limit)] = results
+        return results
+
+    def bulk_load(self, rows):
+        """Loads (book id, title, author, popularity) rows and sorts the keys once at the end."""
+        self.sorted = False
+        for book_id, title, author, popularity in rows:
+            self.set_book(book_id, title, author, popularity)
+        self.keys.sort()
+        self.sorted = True
+
+    def _insert_key(self, key):
+        """Inserts a new key, deferring the sort during bulk loads."""
+        if self.sorted:
+            bisect.insort(self.keys, key)
+        else:
+            self.keys.append(key)
+
+    def _forget(self, normalized):
+        """Invalidates memoized results for every prefix of a changed key."""
+        if self.memo:
+            self.memo = {key: value for key, value in self.memo.items() if not normalized.startswith(key[0])}
+
+
+class TypeaheadService:
+    """
+    Process-wide typeahead over catalog titles and authors, ranked by how
+    often each book has been borrowed.
+
+    The index is loaded from the database once per process and then kept
+    current from the catalog change feed (`CatalogService.get_changes`):
+    at most every TYPEAHEAD_SYNC_INTERVAL seconds a lookup checks the Redis
+    catalog version and only pulls the (usually empty) delta when it moved.
+    Lookups themselves never touch the database.
+    """
+
+    _index = None
+    _since = None          # change feed watermark
+    _checked_at = 0.0      # monotonic time of the last freshness check
+    _version = None        # last seen Redis catalog list version
+    _pending_until = 0.0   # keep polling the feed until changes clear the feed lag
+    _lock = threading.Lock()
+
+    @classmethod
+    def suggest(cls, query, limit=None):
+        """Returns up to `limit` ranked {"text", "type", "popularity"} suggestions."""
+        limit = max(1, min(limit or current_app.config["TYPEAHEAD_LIMIT"], current_app.config["TYPEAHEAD_MAX_LIMIT"]))
+        index = cls._current()
+        with cls._lock:
+            results = index.lookup(query, limit)
+        return [{"text": text, "type": kind, "popularity": popularity} for text, kind, popularity in results]
+
+    @classmethod
+    def reset(cls):
+        """Drops the index so the next lookup reloads it."""
+        with cls._lock:
+            cls._index, cls._since, cls._checked_at, cls._version, cls._pending_until = None, None, 0.0, None, 0.0
+
+    @classmethod
+    def _current(cls):
+        """Returns the index, loading it on first use and applying pending changes."""
+        now = time.monotonic()
+        if cls._index is not None and now - cls._checked_at < current_app.config["TYPEAHEAD_SYNC_INTERVAL"]:
+            return cls._index
+
+        with cls._lock:
+            if cls._index is None:
+                cls._load()
+            elif now - cls._checked_at >= current_app.config["TYPEAHEAD_SYNC_INTERVAL"]:
+                cls._checked_at = now
+                if cls._catalog_moved(now):
+                    cls._apply_changes()
+        return cls._index
+
+    @classmethod
+    def _catalog_moved(cls, now):
+        """True when the Redis catalog version changed or Redis cannot tell us."""
+        versions = CatalogCache.versions([CatalogCache.version_key("list")])
+        if versions is None:
+            return True
+        if versions[0] != cls._version:
+            cls._version = versions[0]
+            # The feed holds back fresh rows, so keep polling until they are visible
+            cls._pending_until = now + current_app.config["CHANGE_FEED_LAG_SECONDS"] + 1
+        return now < cls._pending_until
+
+    @classmethod
+    def _load(cls):
+        """Builds the index from every active book and its borrow count."""
+        lag = current_app.config["CHANGE_FEED_LAG_SECONDS"]
+        started = datetime.utcnow()
+        versions = CatalogCache.versions([CatalogCache.version_key("list")])
+
+        popularity = dict(
+            db.session.query(BorrowedBook.book_id, func.count()).group_by(BorrowedBook.book_id)
+        )
+        books = (
+            db.session.query(Book.id, Book.title, Book.author)
+            .filter(Book.deleted_at.is_(None))
+            .yield_per(5000)
+        )
+        index = PrefixIndex()
+        index.bulk_load((book_id, title, author, popularity.get(book_id, 0)) for book_id, title, author in books)
+
+        # Replaying a few already-loaded rows is harmless: set_book is idempotent
+        cls._index = index
+        cls._since = CatalogService.encode_watermark(started - timedelta(seconds=lag), 0)
+        cls._version = versions[0] if versions else None
+        cls._checked_at = time.monotonic()
+        cls._pending_until = cls._checked_at + lag + 1
+
+    @classmethod
+    def _apply_changes(cls):
+        """Applies every change feed page since the last watermark."""
+        while True:
+            books, _, cls._since, has_more = CatalogService.get_changes(
+                cls._since, current_app.config["CATALOG_MAX_PAGE_SIZE"]
+            )
+            live_ids = [book["id"] for book in books if not book["deleted"]]
+            popularity = dict(
+                db.session.query(BorrowedBook.book_id, func.count())
+                .filter(BorrowedBook.book_id.in_(live_ids))
+                .group_by(BorrowedBook.book_id)
+            ) if live_ids else {}
+
+            for book in books:
+                if book["deleted"]:
+                    cls._index.remove_book(book["id"])
+                else:
+                    cls._index.set_book(book["id"], book["title"], book["author"], popularity.get(book["id"], 0))
+            if not has_more:
+                return
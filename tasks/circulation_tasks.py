@@ -0,0 +1,21 @@
+# tasks/circulation_tasks.py
+
+from celery_config import celery
+from services.circulation_service import CirculationService
+from services.inventory_service import InventoryService
+from services.summary_service import SummaryService
+
+@celery.task
+def reconcile_circulation_summaries_task():
+    """Celery task to refresh overdue counts and repair drifted circulation summaries."""
+    return SummaryService.reconcile()
+
+@celery.task
+def accrue_fines_task():
+    """Celery task to accrue fines on every overdue active loan (idempotent per day)."""
+    return CirculationService.accrue_fines()
+
+@celery.task
+def check_inventory_task():
+    """Celery task auditing copies_available/total_copies against copies and active loans, repairing drift."""
+    return InventoryService.check_consistency()
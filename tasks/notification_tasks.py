@@ -2,6 +2,7 @@
 
 from celery_config import celery
 from services.notification_service import NotificationService
+from services.outbox_service import OutboxService
 
 @celery.task
 def send_due_date_reminders_task():
@@ -12,3 +13,8 @@ def send_due_date_reminders_task():
 def send_fine_reminders_task():
     """Celery task to send fine reminders."""
     return NotificationService.send_fine_reminders()
+
+@celery.task
+def drain_outbox_task():
+    """Celery task to send the queued outbox emails, with retry and backoff."""
+    return OutboxService.drain()
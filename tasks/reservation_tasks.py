@@ -0,0 +1,9 @@
+# tasks/reservation_tasks.py
+
+from celery_config import celery
+from services.reservation_service import ReservationService
+
+@celery.task
+def expire_holds_task():
+    """Celery task to expire uncollected holds and notify the next students in line."""
+    return ReservationService.expire_holds()
@@ -0,0 +1,145 @@
+# tests/conftest.py
+#
+# In-process fixtures for tests that exercise the app directly instead of a
+# running server. They always use TEST_DATABASE_URL (SQLite in memory by
+# default) so a real DATABASE_URL from .env is never touched.
+
+import os
+import pytest
+
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL", "sqlite://")
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from config import Config
+from models import db
+from models.user_model import User
+from models.book_model import Book, Category
+
+# No Redis in the test environment, so keep the limiter, caches and idempotency keys out of the way
+Config.RATELIMIT_ENABLED = False
+Config.CATALOG_CACHE_ENABLED = False
+Config.IDEMPOTENCY_ENABLED = False
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import create_app
+
+    app = create_app()
+    app.config["TESTING"] = True
+    return app
+
+
+@pytest.fixture
+def db_session(app):
+    with app.app_context():
+        db.create_all()
+        yield db.session
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app, db_session):
+    return app.test_client()
+
+
+@pytest.fixture
+def fake_redis(app):
+    """Swaps in an in-memory Redis and enables the caches for one test."""
+    fakeredis = pytest.importorskip("fakeredis")
+    original = app.extensions["redis"]
+    app.extensions["redis"] = fakeredis.FakeRedis(decode_responses=True)
+    app.config["CATALOG_CACHE_ENABLED"] = True
+    app.config["IDEMPOTENCY_ENABLED"] = True
+    yield app.extensions["redis"]
+    app.extensions["redis"] = original
+    app.config["CATALOG_CACHE_ENABLED"] = False
+    app.config["IDEMPOTENCY_ENABLED"] = False
+
+
+@pytest.fixture
+def make_user(db_session):
+    def _make_user(role="user", **fields):
+        count = User.query.count()
+        user = User(name=f"{role} {count}", email=f"{role}{count}@example.com", role=role, **fields)
+        user.set_password("password123")
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return _make_user
+
+
+@pytest.fixture
+def auth_headers():
+    def _auth_headers(user):
+        token = create_access_token(identity=str(user.id))
+        return {"Authorization": f"Bearer {token}"}
+    return _auth_headers
+
+
+@pytest.fixture
+def make_books(db_session):
+    def _make_books(count, copies=1, category_name="General"):
+        category = Category.query.filter_by(name=category_name).first()
+        if not category:
+            category = Category(name=category_name)
+            db.session.add(category)
+            db.session.flush()
+        start = Book.query.count()
+        books = [
+            Book(
+                title=f"Book {start + i}",
+                author=f"Author {start + i}",
+                isbn=f"978{start + i:010d}",
+                category_id=category.id,
+                copies_available=copies,
+            )
+            for i in range(count)
+        ]
+        db.session.add_all(books)
+        db.session.commit()
+        return books
+    return _make_books
+
+
+@pytest.fixture
+def count_queries(db_session):
+    """Counts SQL statements executed inside a `with count_queries() as counter:` block."""
+    class _Counter:
+        def __init__(self):
+            self.count = 0
+
+        def _on_execute(self, *args):
+            self.count += 1
+
+        def __enter__(self):
+            event.listen(db.engine, "before_cursor_execute", self._on_execute)
+            return self
+
+        def __exit__(self, *exc):
+            event.remove(db.engine, "before_cursor_execute", self._on_execute)
+
+    return _Counter
+
+
+@pytest.fixture
+def concurrent_app(tmp_path, monkeypatch):
+    """
+    An app whose threads get real, separate database connections (the shared
+    in-memory SQLite engine serializes everything on one connection).
+    """
+    from app import create_app
+
+    url = os.getenv("TEST_DATABASE_URL") or f"sqlite:///{tmp_path / 'concurrency.db'}"
+    monkeypatch.setattr(Config, "SQLALCHEMY_DATABASE_URI", url)
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
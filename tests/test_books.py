@@ -110,6 +110,26 @@ def get_books():
     return response.status_code == 200
 
 
+def get_books_paginated():
+    """Walks the catalog page by page using next_cursor"""
+    print("\n🚀 Paging Through Books...")
+    seen_ids = []
+    cursor = None
+    while True:
+        endpoint = f"/books/?limit=2&after={cursor}" if cursor else "/books/?limit=2"
+        response = test_api("GET", endpoint)
+        if response.status_code != 200:
+            return False
+        page = response.json()
+        seen_ids.extend(book["id"] for book in page["books"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    # Keyset pages must be strictly increasing with no duplicates
+    return seen_ids == sorted(set(seen_ids))
+
+
 def get_books_by_category():
     """Fetches books by category"""
     if CATEGORY_ID is None:
@@ -199,6 +219,7 @@ def run_tests():
         return
 
     get_books()
+    get_books_paginated()
 
     if add_category():
         if add_book():
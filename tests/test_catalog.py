@@ -0,0 +1,248 @@
+# tests/test_catalog.py
+
+import pytest
+
+from models import db
+
+
+@pytest.mark.parametrize("endpoint, role", [
+    ("/books/", None),
+    ("/students/books", "user"),
+    ("/admin/books", "admin"),
+])
+def test_listing_query_count_is_constant(client, make_user, auth_headers, make_books, count_queries, endpoint, role):
+    """Catalog listings must not issue one category query per book."""
+    headers = auth_headers(make_user(role)) if role else {}
+
+    counts = []
+    for batch in (3, 30):
+        # One category per book, so a lazy category load would show up per row
+        for i in range(batch):
+            make_books(1, category_name=f"Category {len(counts)}-{i}")
+        with count_queries() as counter:
+            response = client.get(f"{endpoint}?limit=100", headers=headers)
+        assert response.status_code == 200
+        counts.append(counter.count)
+
+    assert counts[0] == counts[1]
+
+
+def test_listing_includes_category_name(client, make_books):
+    make_books(2, category_name="Science")
+
+    response = client.get("/books/")
+
+    assert response.status_code == 200
+    assert {book["category_name"] for book in response.json["books"]} == {"Science"}
+
+
+def test_keyset_pages_cover_catalog_once(client, make_books):
+    make_books(7)
+
+    seen, cursor = [], None
+    while True:
+        url = f"/books/?limit=3&after={cursor}" if cursor else "/books/?limit=3"
+        page = client.get(url).json
+        seen.extend(book["id"] for book in page["books"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == sorted(set(seen))
+    assert len(seen) == 7
+
+
+def test_search_ranks_title_above_author(client, db_session, make_books):
+    book_in_author, book_in_title = make_books(2)
+    book_in_author.author = "Ursula Garden"
+    book_in_title.title = "The Secret Garden"
+    db_session.commit()
+
+    response = client.get("/books/search?q=gard")
+
+    assert response.status_code == 200
+    assert [book["id"] for book in response.json["books"]] == [book_in_title.id, book_in_author.id]
+
+
+def test_search_requires_every_term(client, db_session, make_books):
+    first, second = make_books(2)
+    first.title = "Silent River"
+    second.title = "Silent Night"
+    db_session.commit()
+
+    response = client.get("/books/search?q=silent riv")
+
+    assert [book["id"] for book in response.json["books"]] == [first.id]
+
+
+def test_empty_search_suggests_spelling_fix(client, db_session, make_books):
+    from services.fuzzy_index import CatalogSpellIndex
+
+    book, = make_books(1)
+    book.author = "Ursula Le Guin"
+    db_session.commit()
+    CatalogSpellIndex.reset()
+
+    response = client.get("/books/search?q=ursla")
+
+    assert response.json["books"] == []
+    assert response.json["did_you_mean"] == "ursula"
+    assert client.get("/books/search?q=ursula").json["books"][0]["id"] == book.id
+
+
+def test_symspell_prefers_closest_then_most_frequent():
+    from services.fuzzy_index import SymSpellIndex
+
+    index = SymSpellIndex()
+    for word, count in [("garden", 3), ("warden", 9), ("gardener", 1)]:
+        index.add(word, count)
+
+    assert index.lookup("gardn")[0][0] == "garden"
+    assert index.lookup("arden")[0][0] == "warden"  # tie on distance, higher frequency wins
+    assert index.lookup("xyzzy") == []
+    assert index.suggest(["gardn", "wardn"])[0] == ["garden", "warden"]
+
+    # Long queries are enumerated best-first, never as the full product; words past max_tokens stay as typed
+    suggestions = index.suggest(["gardn"] * 40, limit=3, max_tokens=12)
+    assert len(suggestions) == 3 and suggestions[0] == ["garden"] * 12 + ["gardn"] * 28
+    assert index.suggest(["gardn", "arden"], limit=10) == [
+        ["garden", "warden"], ["garden", "garden"], ["warden", "warden"], ["warden", "garden"],
+    ]
+
+
+def test_cached_listing_is_fresh_after_write(client, db_session, fake_redis, make_user, auth_headers, make_books, count_queries):
+    book, = make_books(1, copies=2)
+    client.get("/books/")
+
+    with count_queries() as counter:
+        cached = client.get("/books/")
+    assert counter.count == 0
+    assert cached.json["books"][0]["copies_available"] == 2
+
+    headers = auth_headers(make_user())
+    client.post(f"/students/books/borrow/{book.id}", headers=headers)
+
+    assert client.get("/books/").json["books"][0]["copies_available"] == 1
+    assert client.get(f"/books/{book.id}").json["copies_available"] == 1
+    assert client.get(f"/books/category/{book.category_id}").json["books"][0]["copies_available"] == 1
+
+    stats = client.get("/books/cache/stats", headers=auth_headers(make_user("admin"))).json
+    assert stats["hits"] >= 1 and stats["misses"] >= 1
+
+
+def test_unchanged_listing_answers_304_without_querying(client, db_session, fake_redis, make_books, count_queries):
+    make_books(2)
+    etag = client.get("/books/").headers["ETag"]
+
+    with count_queries() as counter:
+        response = client.get("/books/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert counter.count == 0
+
+    make_books(1)
+    response = client.get("/books/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_borrowed_list_etag_tracks_own_loans(client, db_session, fake_redis, make_user, auth_headers, make_books):
+    first, second = make_books(2)
+    student, other = make_user(), make_user()
+    headers = auth_headers(student)
+    etag = client.get("/students/books/borrowed", headers=headers).headers["ETag"]
+
+    client.post(f"/students/books/borrow/{first.id}", headers=auth_headers(other))
+    assert client.get("/students/books/borrowed", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    client.post(f"/students/books/borrow/{second.id}", headers=headers)
+    assert client.get("/students/books/borrowed", headers={**headers, "If-None-Match": etag}).status_code == 200
+
+
+def test_change_feed_returns_only_rows_changed_since_watermark(app, client, db_session, make_user, auth_headers, make_books, monkeypatch):
+    monkeypatch.setitem(app.config, "CHANGE_FEED_LAG_SECONDS", 0)
+    headers = auth_headers(make_user())
+    admin_headers = auth_headers(make_user("admin"))
+    first, second, third = make_books(3)
+
+    seen, since = [], None
+    while True:
+        page = client.get("/books/changes", query_string={"since": since, "limit": 2}, headers=headers).json
+        seen += [book["id"] for book in page["books"]]
+        since = page["next_since"]
+        if not page["has_more"]:
+            break
+    assert sorted(seen) == [first.id, second.id, third.id]
+    assert client.get("/books/changes", query_string={"since": since}, headers=headers).json["books"] == []
+
+    client.put(f"/books/update/{first.id}", json={"title": "Renamed"}, headers=admin_headers)
+    client.delete(f"/books/delete/{second.id}", headers=admin_headers)
+
+    changes = client.get("/books/changes", query_string={"since": since}, headers=headers).json
+    by_id = {book["id"]: book for book in changes["books"]}
+    assert set(by_id) == {first.id, second.id}
+    assert by_id[first.id]["title"] == "Renamed" and not by_id[first.id]["deleted"]
+    assert by_id[second.id]["deleted"]
+
+    # Tombstoned books disappear from listings and lookups
+    assert second.id not in [book["id"] for book in client.get("/books/").json["books"]]
+    assert client.get(f"/books/{second.id}").status_code == 404
+    assert client.get("/admin/reports", headers=admin_headers).json["total_books"] == 2
+    assert client.get("/books/changes", query_string={"since": "garbage"}, headers=headers).status_code == 400
+
+
+def test_typeahead_follows_change_feed_and_ranks_by_popularity(app, client, db_session, make_user, auth_headers, make_books, count_queries, monkeypatch):
+    from services.typeahead_service import TypeaheadService
+
+    monkeypatch.setitem(app.config, "CHANGE_FEED_LAG_SECONDS", 0)
+    monkeypatch.setitem(app.config, "TYPEAHEAD_SYNC_INTERVAL", 0)
+    TypeaheadService.reset()
+    admin_headers = auth_headers(make_user("admin"))
+    quiet, popular = make_books(2)
+    client.put(f"/books/update/{quiet.id}", json={"title": "Garden Paths"}, headers=admin_headers)
+    client.put(f"/books/update/{popular.id}", json={"title": "Garden Ãrt"}, headers=admin_headers)
+
+    assert [s["text"] for s in client.get("/books/suggest?q=gard").json["suggestions"]] == ["Garden Paths", "Garden Ãrt"]
+    assert [s["text"] for s in client.get("/books/suggest?q=garden-ar").json["suggestions"]] == ["Garden Ãrt"]
+
+    client.post(f"/students/books/borrow/{quiet.id}", headers=auth_headers(make_user()))
+    client.post("/books/add", json={
+        "title": "Gardening Basics", "author": "Ann Smith", "isbn": "9781111111111", "category_id": quiet.category_id,
+    }, headers=admin_headers)
+    client.delete(f"/books/delete/{popular.id}", headers=admin_headers)
+
+    assert client.get("/books/suggest?q=garden ar").json["suggestions"] == []
+    suggestions = client.get("/books/suggest?q=GARD").json["suggestions"]
+    assert [(s["text"], s["popularity"]) for s in suggestions] == [("Garden Paths", 1), ("Gardening Basics", 0)]
+    assert client.get("/books/suggest?q=ann").json["suggestions"][0]["type"] == "author"
+
+    # Between sync intervals a lookup is answered entirely from memory
+    monkeypatch.setitem(app.config, "TYPEAHEAD_SYNC_INTERVAL", 60)
+    client.get("/books/suggest?q=g")
+    with count_queries() as counter:
+        client.get("/books/suggest?q=gar")
+    assert counter.count == 0
+    TypeaheadService.reset()
+
+
+def test_faceted_search_counts_every_hit_in_one_statement(client, db_session, fake_redis, make_books, count_queries):
+    fiction = make_books(3, copies=0, category_name="Fiction")
+    science = make_books(2, category_name="Science")
+    for book in fiction + science:
+        book.title = f"River {book.title}"
+    fiction[0].author = science[0].author = "Ann Smith"
+    db.session.commit()
+
+    with count_queries() as counter:
+        response = client.get("/books/search?q=river&facets=true&available=true").json
+    assert counter.count == 2  # hits + one facet aggregate
+    assert {book["id"] for book in response["books"]} == {book.id for book in science}
+
+    facets = response["facets"]
+    assert facets["total"] == 5
+    assert [(c["name"], c["count"]) for c in facets["category"]] == [("Fiction", 3), ("Science", 2)]
+    assert facets["author"][0] == {"name": "Ann Smith", "count": 2}
+    assert facets["availability"] == {"available": 2, "borrowed": 3}
+
+    with count_queries() as counter:
+        client.get("/books/search?q=river&facets=true&category_id=%d" % science[0].category_id)
+    assert counter.count == 1  # facets served from the cache
@@ -0,0 +1,430 @@
+# tests/test_circulation.py
+
+import time
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import event
+
+from models import db
+from models.user_model import User
+from models.book_model import Book, BookCopy, Category
+from models.transaction_model import BorrowedBook, UserCirculationSummary
+from services.circulation_service import CirculationService
+from services.inventory_service import InventoryService
+from services.summary_service import SummaryService
+
+BORROWERS = 64
+COPIES = 10
+
+
+def test_parallel_checkouts_never_oversubscribe(concurrent_app):
+    with concurrent_app.app_context():
+        category = Category(name="Stress")
+        db.session.add(category)
+        db.session.flush()
+        book = Book(title="Last Copy", author="Ann Smith", isbn="9780000000001",
+                    category_id=category.id, copies_available=COPIES)
+        users = [User(name=f"user {i}", email=f"user{i}@example.com", password="x") for i in range(BORROWERS)]
+        db.session.add_all([book, *users])
+        db.session.commit()
+        book_id, user_ids = book.id, [user.id for user in users]
+
+    def borrow(user_id):
+        with concurrent_app.app_context():
+            loan, error = CirculationService.checkout(user_id, book_id)
+            return error is None
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=BORROWERS) as pool:
+        results = list(pool.map(borrow, user_ids))
+    elapsed = time.perf_counter() - started
+    print(f"\n{BORROWERS} parallel checkouts in {elapsed * 1000:.1f} ms ({BORROWERS / elapsed:,.0f}/s)")
+
+    with concurrent_app.app_context():
+        assert sum(results) == COPIES
+        assert BorrowedBook.query.filter_by(book_id=book_id).count() == COPIES
+        assert db.session.get(Book, book_id).copies_available == 0
+        assert BookCopy.query.filter_by(book_id=book_id, status="on_loan").count() == COPIES
+
+
+def test_checkout_sets_a_real_due_date(client, db_session, make_user, auth_headers, make_books):
+    book, = make_books(1)
+    response = client.post("/books/borrow", json={"book_id": book.id}, headers=auth_headers(make_user()))
+    assert response.status_code == 200
+
+    loan = BorrowedBook.query.filter_by(book_id=book.id).one()
+    assert (loan.due_date - loan.borrow_date).days >= CirculationService.LOAN_DAYS - 1
+    assert client.post("/books/borrow", json={"book_id": book.id}, headers=auth_headers(make_user())).status_code == 400
+
+
+def test_eligibility_is_one_statement_with_a_reason_code(client, db_session, make_user, auth_headers, make_books, count_queries):
+    books = make_books(5)
+    student = make_user()
+    headers = auth_headers(student)
+
+    student_id, book_id = student.id, books[0].id
+    with count_queries() as counter:
+        assert CirculationService.check_eligibility(student_id, book_id) is None
+    assert counter.count == 1
+
+    assert client.post(f"/students/books/borrow/{books[0].id}", headers=headers).status_code == 200
+    assert CirculationService.check_eligibility(student.id, books[0].id) == "already_borrowed"
+    assert CirculationService.check_eligibility(make_user().id, books[0].id) == "unavailable"
+    assert CirculationService.check_eligibility(student.id, 999) == "book_not_found"
+    assert CirculationService.check_eligibility(999, books[1].id) == "user_not_found"
+
+    for book in books[1:3]:
+        client.post(f"/students/books/borrow/{book.id}", headers=headers)
+    response = client.post(f"/students/books/borrow/{books[3].id}", headers=headers)
+    assert response.status_code == 400 and "Borrow limit" in response.json["error"]
+
+    fined = make_user()
+    db.session.add(BorrowedBook(user_id=fined.id, book_id=books[4].id, due_date=books[4].created_at,
+                                returned=True, fine_amount=10, fine_paid=False))
+    blocked = make_user(is_blocked=True)
+    db.session.commit()
+    SummaryService.reconcile()  # the fine above bypassed the circulation engine
+    assert CirculationService.check_eligibility(fined.id, books[4].id) == "unpaid_fines"
+    assert CirculationService.check_eligibility(blocked.id, books[4].id) == "blocked"
+    assert client.post(f"/students/books/borrow/{books[4].id}", headers=auth_headers(fined)).status_code == 403
+
+    # The generic /books/borrow route applies the same rules
+    for user, status in ((fined, 403), (blocked, 403), (student, 400)):
+        assert client.post("/books/borrow", json={"book_id": books[4].id}, headers=auth_headers(user)).status_code == status
+    assert client.post("/books/borrow", json={"book_id": 999}, headers=auth_headers(make_user())).status_code == 404
+
+
+def test_circulation_queries_use_their_indexes(db_session, make_user, make_books):
+    """EXPLAIN the statements the services really issue and check each one's index is picked."""
+    from services.notification_service import NotificationService
+    from services.reservation_service import ReservationService
+
+    student, (book,) = make_user(), make_books(1)
+    student_id, book_id = student.id, book.id
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    def plan_for(call):
+        captured.clear()
+        event.listen(db.engine, "before_cursor_execute", capture)
+        try:
+            call()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", capture)
+        statement, parameters = captured[0]
+
+        connection = db.session.connection().connection.dbapi_connection
+        cursor = connection.cursor()
+        if db.engine.dialect.name == "postgresql":
+            cursor.execute("SET LOCAL enable_seqscan = off")  # empty tables would always seq scan
+            cursor.execute("EXPLAIN " + statement, parameters)
+        else:
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        return " ".join(str(column) for row in cursor.fetchall() for column in row)
+
+    eligibility = plan_for(lambda: CirculationService.check_eligibility(student_id, book_id))
+    assert "idx_borrowed_book_user_active" in eligibility
+    assert "user_circulation_summary" in eligibility
+
+    assert "idx_borrowed_book_due_active" in plan_for(NotificationService.send_due_date_reminders)
+    assert "idx_borrowed_book_unpaid_fines" in plan_for(NotificationService.send_fine_reminders)
+    assert "idx_reserved_books_queue" in plan_for(lambda: ReservationService.promote({book_id: 1}))
+    holds = plan_for(lambda: ReservationService.holds(student_id))
+    assert "idx_reserved_books_queue" in holds and "idx_reserved_books_user" in holds
+
+
+def test_return_renew_and_fines_share_one_engine(client, db_session, make_user, auth_headers, make_books, count_queries):
+    book, other = make_books(2)
+    student, admin = make_user(), make_user(role="admin")
+    headers = auth_headers(student)
+    assert client.post(f"/students/books/borrow/{book.id}", headers=headers).status_code == 200
+    assert client.post(f"/students/books/borrow/{other.id}", headers=headers).status_code == 200
+
+    loan = BorrowedBook.query.filter_by(book_id=book.id).one()
+    original_due = loan.due_date
+    response = client.post(f"/students/books/extend/{book.id}", headers=headers)
+    assert response.status_code == 200
+    renewed = BorrowedBook.query.filter_by(book_id=book.id).one()
+    assert (renewed.due_date - original_due).days == CirculationService.RENEWAL_DAYS
+
+    # Three and a half days late -> three days of fines
+    renewed.due_date = datetime.utcnow() - timedelta(days=3, hours=12)
+    db.session.commit()
+    loan_id, student_id, book_id = renewed.id, student.id, book.id
+    with count_queries() as counter:
+        returned, error = CirculationService.return_loan(loan_id=loan_id, user_id=student_id)
+    assert error is None and returned.fine_amount == 3 * CirculationService.FINE_PER_DAY
+    assert counter.count <= 5  # close loan + restore counter + shelve copy + summary + reservation lookup
+    assert db.session.get(Book, book_id).copies_available == 1
+    assert client.post(f"/students/books/return/{loan_id}", headers=headers).status_code == 400
+
+    # A desk request naming no student (or no book) touches nobody's loan
+    other_due = BorrowedBook.query.filter_by(book_id=other.id).one().due_date
+    assert client.post("/admin/books/return", json={}, headers=auth_headers(admin)).status_code == 400
+    assert client.put("/admin/books/extend", json={"action": "accept"}, headers=auth_headers(admin)).status_code == 400
+    assert client.post("/books/return", json={}, headers=headers).status_code == 400
+    with pytest.raises(ValueError):
+        CirculationService.return_loan()
+    with pytest.raises(ValueError):
+        CirculationService.return_loan(user_id=student.id)
+    assert BorrowedBook.query.filter_by(book_id=other.id, returned=False).one().due_date == other_due
+
+    # Every other return path uses the same rules
+    response = client.post("/admin/books/return", json={"book_id": other.id, "student_id": student.id},
+                           headers=auth_headers(admin))
+    assert response.status_code == 200 and response.json["fine_amount"] == 0
+    assert db.session.get(Book, other.id).copies_available == 1
+    assert client.post("/books/return", json={"book_id": other.id}, headers=headers).status_code == 404
+
+    assert CirculationService.check_eligibility(student.id, other.id) == "unpaid_fines"
+    assert client.post("/students/books/pay-fine", headers=headers).json["message"] == "All pending fines have been paid."
+    assert CirculationService.check_eligibility(student.id, other.id) is None
+
+
+def test_desk_batches_issue_and_return_in_constant_statements(client, db_session, make_user, auth_headers, make_books, count_queries):
+    one_copy, two_copies = make_books(1), make_books(1, copies=2)
+    book, popular = one_copy[0], two_copies[0]
+    students = [make_user() for _ in range(3)]
+    headers = auth_headers(make_user(role="admin"))
+    items = [
+        {"student_id": students[0].id, "book_id": book.id},
+        {"student_id": students[1].id, "book_id": book.id},        # no copy left
+        *({"student_id": student.id, "book_id": popular.id} for student in students),  # third one runs out
+        {"student_id": 999, "book_id": popular.id},
+        {"student_id": students[0].id, "book_id": 999},
+        {"student_id": "x"},
+    ]
+
+    with count_queries() as counter:
+        response = client.post("/admin/books/issue/batch", json={"items": items}, headers=headers)
+    report = response.json
+    assert response.status_code == 200
+    assert (report["processed"], report["succeeded"], report["failed"]) == (8, 3, 5)
+    assert [result.get("reason") for result in report["results"]] == [
+        None, "unavailable", None, None, "unavailable", "student_not_found", "book_not_found", "invalid_item",
+    ]
+    assert counter.count <= 8  # admin check + students + stock + claim counters + claim copies + insert + holds + commit
+    assert BorrowedBook.query.filter(BorrowedBook.copy_id.is_(None)).count() == 0
+    assert db.session.get(Book, popular.id).copies_available == 0
+    assert BorrowedBook.query.count() == 3
+
+    loan = BorrowedBook.query.filter_by(user_id=students[0].id, book_id=book.id).one()
+    loan.due_date = datetime.utcnow() - timedelta(days=2, hours=1)
+    db.session.commit()
+    returns = [items[0], items[2], items[2], items[3]]
+    report = client.post("/admin/books/return/batch", json={"items": returns}, headers=headers).json
+    assert [result["status"] for result in report["results"]] == ["returned", "returned", "failed", "returned"]
+    assert report["results"][0]["fine_amount"] == 2 * CirculationService.FINE_PER_DAY
+    assert db.session.get(Book, popular.id).copies_available == 2
+    assert db.session.get(Book, book.id).copies_available == 1
+
+    assert client.post("/admin/books/issue/batch", json={"items": []}, headers=headers).status_code == 400
+
+
+def test_summary_tracks_every_operation_and_reconcile_repairs_drift(client, db_session, make_user, auth_headers, make_books):
+    books = make_books(2)
+    student = make_user()
+    headers = auth_headers(student)
+    for book in books:
+        assert client.post(f"/students/books/borrow/{book.id}", headers=headers).status_code == 200
+    assert SummaryService.get(student.id)["active_count"] == 2
+
+    late = BorrowedBook.query.filter_by(book_id=books[0].id).one()
+    late.due_date = datetime.utcnow() - timedelta(days=2, hours=1)
+    db.session.commit()
+    assert SummaryService.reconcile() | {"user_ids": None} == {
+        "checked": 1, "drifted": 0, "missing": 0, "overdue_refreshed": 1, "repaired": True, "user_ids": None,
+    }
+    assert SummaryService.get(student.id)["overdue_count"] == 1
+
+    client.post(f"/students/books/return/{late.id}", headers=headers)
+    summary = client.get("/students/summary", headers=headers).json
+    assert (summary["active_count"], summary["unpaid_fine_total"], summary["overdue_count"]) == (
+        1, 2 * CirculationService.FINE_PER_DAY, 0,
+    )
+    client.post("/students/books/pay-fine", headers=headers)
+    assert SummaryService.get(student.id)["unpaid_fine_total"] == 0
+
+    # A write that bypasses the engine is drift: reported, then repaired
+    db.session.execute(db.update(UserCirculationSummary).values(active_count=7))
+    db.session.commit()
+    report = SummaryService.reconcile(repair=False)
+    assert (report["drifted"], report["user_ids"]) == (1, [student.id])
+    SummaryService.reconcile()
+    assert SummaryService.get(student.id)["active_count"] == 1
+    assert SummaryService.reconcile(repair=False)["drifted"] == 0
+
+
+def test_nightly_fine_accrual_is_set_based_and_idempotent(client, db_session, make_user, auth_headers, make_books, count_queries):
+    books = make_books(4)
+    students = [make_user() for _ in range(3)]
+    for student, book in zip(students, books):
+        CirculationService.checkout(student.id, book.id)
+    CirculationService.checkout(students[0].id, books[3].id)
+
+    # Due dates relative to midnight, so the run is stable whatever time the test runs
+    midnight = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    lateness = {books[0].id: 3, books[1].id: 1, books[3].id: 2}
+    for loan in BorrowedBook.query.all():
+        loan.due_date = midnight - timedelta(days=lateness.get(loan.book_id, -5), hours=1)
+    db.session.commit()
+
+    with count_queries() as counter:
+        report = CirculationService.accrue_fines(chunk_size=2)
+    assert (report["touched"], report["users"], report["chunks"]) == (3, 2, 2)
+    assert counter.count <= 2 * 4 + 1  # per chunk: bounds + update + summary + commit, then the empty probe
+    fines = {loan.book_id: loan.fine_amount for loan in BorrowedBook.query.all()}
+    assert fines == {book_id: days * CirculationService.FINE_PER_DAY for book_id, days in lateness.items()} | {
+        books[2].id: 0,
+    }
+    assert SummaryService.get(students[0].id)["unpaid_fine_total"] == 5 * CirculationService.FINE_PER_DAY
+    assert SummaryService.reconcile(repair=False)["drifted"] == 0
+    assert CirculationService.check_eligibility(students[1].id, books[2].id) == "fines_on_loan"
+
+    # Same day again: nothing left to change
+    assert CirculationService.accrue_fines()["touched"] == 0
+
+    # Accrued fines are settled after the return, which assesses the final fine once
+    assert CirculationService.settle_fines(students[1].id) == []
+    response = client.post("/students/books/pay-fine", headers=auth_headers(students[1]))
+    assert response.status_code == 400 and "Return them first" in response.json["error"]
+    returned, _ = CirculationService.return_loan(user_id=students[1].id, book_id=books[1].id)
+    assert SummaryService.get(students[1].id)["unpaid_fine_total"] == returned.fine_amount
+    assert CirculationService.check_eligibility(students[1].id, books[2].id) == "unpaid_fines"
+    assert CirculationService.settle_fines(students[1].id) == [returned.fine_amount]
+    db.session.commit()
+    assert SummaryService.reconcile(repair=False)["drifted"] == 0
+
+
+def test_stale_book_edits_conflict_instead_of_overwriting_inventory(client, db_session, fake_redis, make_user, auth_headers, make_books):
+    book = make_books(1, copies=2)[0]
+    book_id = book.id
+    student, admin = make_user(), auth_headers(make_user(role="admin"))
+    read = client.get(f"/books/{book_id}").json
+    assert read["version"] == 1
+
+    # A checkout lands after the admin loaded the edit form
+    assert client.post(f"/students/books/borrow/{book_id}", headers=auth_headers(student)).status_code == 200
+    for url in (f"/books/update/{book_id}", f"/admin/books/update/{book_id}"):
+        response = client.put(url, json={"copies_available": 5}, headers={**admin, "If-Match": f'"{read["version"]}"'})
+        assert (response.status_code, response.json["version"]) == (409, 2)
+    assert db.session.get(Book, book_id).copies_available == 1
+
+    # The ETag a GET sends is what the update expects back as If-Match, and it answers If-None-Match too
+    etag = client.get(f"/books/{book_id}").headers["ETag"]
+    assert client.get(f"/books/{book_id}", headers={"If-None-Match": etag}).status_code == 304
+    response = client.put(f"/books/update/{book_id}", json={"copies_available": 5}, headers={**admin, "If-Match": etag})
+    assert response.status_code == 200 and response.headers["ETag"] == '"3"'
+    assert client.get(f"/books/{book_id}").headers["ETag"] == '"3"'
+    assert client.put(f"/books/update/{book_id}", json={}, headers={**admin, "If-Match": '"abc"'}).status_code == 400
+
+    # Without If-Match the write is still versioned: a change between read and flush is a conflict
+    def concurrent_checkout(session, flush_context, instances):
+        session.connection().execute(db.update(Book).where(Book.id == book_id).values(version=Book.version + 1))
+    event.listen(db.session, "before_flush", concurrent_checkout, once=True)
+    assert client.put(f"/admin/books/update/{book_id}", json={"title": "Renamed"}, headers=admin).status_code == 409
+    assert db.session.get(Book, book_id).title != "Renamed"
+
+    # Core circulation writes bump loan versions too
+    loan = BorrowedBook.query.filter_by(book_id=book_id).one()
+    CirculationService.renew_loan(loan_id=loan.id)
+    db.session.refresh(loan)
+    assert loan.version == 2
+
+
+def test_copies_are_lent_by_barcode_and_the_counter_follows_them(client, db_session, make_user, auth_headers, make_books):
+    book = make_books(1, copies=2)[0]
+    book_id = book.id
+    student, admin = make_user(), auth_headers(make_user(role="admin"))
+    assert sorted(copy.barcode for copy in book.copies) == [f"B{book_id}-1", f"B{book_id}-2"]
+
+    # The desk scans a specific copy; returning it by barcode shelves that copy again
+    response = client.post("/admin/books/issue", json={"student_id": student.id, "barcode": f"B{book_id}-2"}, headers=admin)
+    assert response.status_code == 200
+    loan = BorrowedBook.query.filter_by(book_id=book_id).one()
+    assert loan.copy.barcode == f"B{book_id}-2"
+    assert client.get(f"/admin/copies/B{book_id}-2", headers=admin).json["loan"]["id"] == loan.id
+    response = client.post("/admin/books/issue", json={"student_id": make_user().id, "barcode": f"B{book_id}-2"}, headers=admin)
+    assert response.status_code == 400
+    assert db.session.get(Book, book_id).copies_available == 1
+    assert client.post("/admin/books/issue", json={"student_id": student.id, "barcode": "nope"}, headers=admin).status_code == 404
+    response = client.post("/admin/books/return", json={"student_id": student.id, "barcode": f"B{book_id}-2"}, headers=admin)
+    assert response.status_code == 200
+    assert InventoryService.find(f"B{book_id}-2").status == "available"
+
+    # Shelf status changes move the counter with them
+    assert client.put(f"/admin/copies/B{book_id}-1", json={"status": "damaged"}, headers=admin).status_code == 200
+    assert client.put(f"/admin/copies/B{book_id}-1", json={"status": "on_loan"}, headers=admin).status_code == 400
+    assert db.session.get(Book, book_id).copies_available == 1
+    response = client.post(f"/admin/books/{book_id}/copies", json={"count": 1, "barcodes": ["SHELF-9"]}, headers=admin)
+    assert response.status_code == 201 and response.json["barcodes"] == [f"B{book_id}-3", "SHELF-9"]
+    assert client.post(f"/admin/books/{book_id}/copies", json={"barcodes": ["SHELF-9"]}, headers=admin).status_code == 409
+    db.session.expire_all()
+    assert db.session.get(Book, book_id).copies_available == 3
+
+    # Editing the counter withdraws (or shelves) copies to match; a numeric string counts too
+    for bad in ({"copies_available": "lots"}, {"copies_available": -3}, {"total_copies": -1}, {"total_copies": "x"}):
+        assert client.put(f"/books/update/{book_id}", json=bad, headers=admin).status_code == 400
+    assert db.session.get(Book, book_id).copies_available == 3
+    version = client.get(f"/books/{book_id}").json["version"]
+    response = client.put(f"/books/update/{book_id}", json={"copies_available": "1"}, headers={**admin, "If-Match": f'"{version}"'})
+    assert response.status_code == 200
+    assert BookCopy.query.filter_by(book_id=book_id, status="available").count() == 1
+
+    # New books are shelved from a JSON count given as a number or a numeric string
+    new_book = {"title": "Fresh", "author": "A", "isbn": "9781111111111", "category_id": book.category_id}
+    for copies in (-1, "many", 2.5, True):
+        response = client.post("/admin/books/add", json={**new_book, "copies_available": copies}, headers=admin)
+        assert response.status_code == 400
+    response = client.post("/admin/books/add", json={**new_book, "copies_available": "3"}, headers=admin)
+    assert response.status_code == 201
+    fresh = db.session.get(Book, response.json["id"])
+    assert (fresh.copies_available, fresh.total_copies, fresh.copies.count()) == (3, 3, 3)
+
+    # Drift from a raw counter write is found with one GROUP BY and repaired
+    assert InventoryService.check_consistency()["drifted"] == 0
+    db.session.execute(db.update(Book).where(Book.id == book_id).values(copies_available=7))
+    db.session.commit()
+    report = client.post("/admin/inventory/check?dry_run=true", headers=admin).json
+    assert (report["drifted"], report["book_ids"]) == (1, [book_id])
+    assert InventoryService.check_consistency()["drifted"] == 1
+    db.session.expire_all()
+    assert db.session.get(Book, book_id).copies_available == 1
+
+
+def test_drift_auditor_finds_every_kind_of_drift_and_repairs_in_batches(client, db_session, fake_redis, make_user, auth_headers, make_books):
+    lent, inflated, orphaned = make_books(3, copies=2)
+    ids = lent.id, inflated.id, orphaned.id
+    student, admin = make_user(), auth_headers(make_user(role="admin"))
+    CirculationService.checkout(student.id, ids[0])
+    assert InventoryService.check_consistency()["drifted"] == 0
+
+    # An overwritten counter, a stale total and a copy stuck on loan with no loan behind it
+    db.session.execute(db.update(Book).where(Book.id == ids[0]).values(copies_available=5))
+    db.session.execute(db.update(Book).where(Book.id == ids[1]).values(total_copies=9))
+    db.session.execute(db.update(BookCopy).where(BookCopy.book_id == ids[2], BookCopy.status == "available")
+                       .values(status="on_loan"))
+    db.session.commit()
+
+    report = InventoryService.check_consistency(repair=False)
+    assert (report["drifted"], report["batches"], report["book_ids"]) == (3, 0, list(ids))
+    report = InventoryService.check_consistency(batch_size=2)
+    assert (report["drifted"], report["batches"]) == (3, 2)
+    db.session.expire_all()
+    assert [(db.session.get(Book, book_id).copies_available, db.session.get(Book, book_id).total_copies)
+            for book_id in ids] == [(1, 2), (2, 2), (2, 2)]
+    assert InventoryService.check_consistency()["drifted"] == 0
+    assert client.get("/admin/stats", headers=admin).json["inventory_drift"] == 0
+
+    # Admins edit the total; availability is derived from it and the loans
+    version = client.get(f"/books/{ids[0]}").json["version"]
+    response = client.put(f"/books/update/{ids[0]}", json={"total_copies": 4}, headers={**admin, "If-Match": f'"{version}"'})
+    assert response.status_code == 200
+    read = client.get(f"/books/{ids[0]}").json
+    assert (read["copies_available"], read["total_copies"]) == (3, 4)
+    assert client.put(f"/books/update/{ids[0]}", json={"total_copies": 0}, headers=admin).status_code == 400
+    assert InventoryService.check_consistency(repair=False)["drifted"] == 0
@@ -0,0 +1,61 @@
+# tests/test_idempotency.py
+
+import json
+
+import pytest
+from flask_jwt_extended import verify_jwt_in_request
+
+from models.transaction_model import BorrowedBook
+from services.circulation_service import CirculationService
+from services.idempotency_service import IdempotencyService
+
+
+def test_retried_borrow_replays_the_first_response_without_the_database(client, db_session, fake_redis, make_user, auth_headers, make_books, count_queries):
+    book, other = make_books(2, copies=2)
+    student = make_user()
+    headers = {**auth_headers(student), "Idempotency-Key": "borrow-1"}
+    url = f"/students/books/borrow/{book.id}"
+
+    first = client.post(url, headers=headers)
+    assert first.status_code == 200 and "Idempotent-Replayed" not in first.headers
+    with count_queries() as counter:
+        retry = client.post(url, headers=headers)
+    assert counter.count == 0
+    assert (retry.status_code, retry.json) == (200, first.json)
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert BorrowedBook.query.count() == 1
+
+    # Same key, different request: rejected instead of replayed
+    assert client.post(f"/students/books/borrow/{other.id}", headers=headers).status_code == 422
+    # Keys belong to one caller; another student's identical key is a new request
+    someone = {**auth_headers(make_user()), "Idempotency-Key": "borrow-1"}
+    assert client.post(url, headers=someone).json == first.json
+    assert BorrowedBook.query.count() == 2
+    # Without the header nothing changes: the borrow rules answer as before
+    response = client.post(url, headers=auth_headers(student))
+    assert response.status_code == 400
+
+
+def test_in_flight_duplicates_wait_and_failures_free_the_key(app, client, db_session, fake_redis, make_user, auth_headers, make_books, monkeypatch):
+    book = make_books(1)[0]
+    student = make_user()
+    headers = {**auth_headers(student), "Idempotency-Key": "borrow-2"}
+
+    with app.test_request_context(f"/students/books/borrow/{book.id}", method="POST", headers=headers):
+        verify_jwt_in_request()
+        storage_key = IdempotencyService.storage_key("borrow-2")
+        IdempotencyService.claim(fake_redis, storage_key, IdempotencyService.fingerprint())
+    response = client.post(f"/students/books/borrow/{book.id}", headers=headers)
+    assert response.status_code == 409 and response.headers["Retry-After"]
+    fake_redis.delete(storage_key)
+
+    def broken(user_id, book_id):
+        raise RuntimeError("database went away")
+    monkeypatch.setattr(CirculationService, "borrow", broken)
+    with pytest.raises(RuntimeError):
+        client.post(f"/students/books/borrow/{book.id}", headers=headers)
+    assert fake_redis.get(storage_key) is None
+
+    monkeypatch.undo()
+    assert client.post(f"/students/books/borrow/{book.id}", headers=headers).status_code == 200
+    assert json.loads(fake_redis.get(storage_key))["state"] == "done"
@@ -0,0 +1,178 @@
+# tests/test_reservations.py
+
+from datetime import datetime, timedelta
+
+from models import db
+from models.reservation_model import ReservedBook
+from models.transaction_model import BorrowedBook
+from services.circulation_service import CirculationService
+from services.reservation_service import ReservationService
+
+
+def test_waitlist_positions_and_estimates_come_from_one_statement(client, db_session, make_user, auth_headers, make_books, count_queries):
+    book, other = make_books(2, copies=2)
+    now = datetime.utcnow()
+    for days, borrower in ((3, make_user()), (8, make_user())):
+        CirculationService.checkout(borrower.id, book.id, due_date=now + timedelta(days=days))
+    CirculationService.checkout(make_user().id, other.id, due_date=now + timedelta(days=5))
+    CirculationService.checkout(make_user().id, other.id, due_date=now + timedelta(days=6))
+
+    waiting = [make_user() for _ in range(3)]
+    for user in waiting:
+        assert client.post(f"/reservations/reserve/{book.id}", headers=auth_headers(user)).status_code == 201
+    assert client.post(f"/reservations/reserve/{other.id}", headers=auth_headers(waiting[2])).status_code == 201
+    assert client.post(f"/reservations/reserve/{book.id}", headers=auth_headers(waiting[0])).status_code == 400
+
+    # Each hold waits for the loan that comes back in its turn; beyond the copies out there is no estimate
+    positions = [client.get(f"/reservations/position/{book.id}", headers=auth_headers(user)).json for user in waiting]
+    assert [(hold["position"], hold["queue_length"]) for hold in positions] == [(1, 3), (2, 3), (3, 3)]
+    assert [hold["estimated_available"] for hold in positions] == [
+        (now + timedelta(days=3)).strftime("%Y-%m-%d"), (now + timedelta(days=8)).strftime("%Y-%m-%d"), None,
+    ]
+    assert client.get(f"/reservations/position/{other.id}", headers=auth_headers(waiting[0])).status_code == 404
+
+    student_id = waiting[2].id
+    with count_queries() as counter:
+        holds = ReservationService.holds(student_id)
+    assert counter.count == 1
+    assert [(hold["book_id"], hold["position"], hold["estimated_available"]) for hold in holds] == [
+        (book.id, 3, None), (other.id, 1, (now + timedelta(days=5)).strftime("%Y-%m-%d")),
+    ]
+    assert client.get("/reservations/mine", headers=auth_headers(waiting[2])).json["reservations"] == holds
+
+    # The head of the queue leaves: everyone moves up, and an overdue loan means "any day now"
+    assert client.delete(f"/reservations/cancel/{book.id}", headers=auth_headers(waiting[0])).status_code == 200
+    loan = BorrowedBook.query.filter_by(book_id=book.id).order_by(BorrowedBook.due_date).first()
+    loan.due_date = now - timedelta(days=1)
+    db.session.commit()
+    hold = ReservationService.holds(waiting[1].id, book_id=book.id)[0]
+    assert (hold["position"], hold["estimated_available"]) == (1, now.strftime("%Y-%m-%d"))
+
+    # Same-second reservations keep their arrival order
+    db.session.query(ReservedBook).update({"reserved_at": now})
+    db.session.commit()
+    assert ReservationService.holds(waiting[2].id, book_id=book.id)[0]["position"] == 2
+
+
+def test_returns_queue_reservation_emails_in_the_outbox_and_the_drain_retries(app, client, db_session, make_user, auth_headers, make_books, monkeypatch):
+    import flask_mail
+    from extensions import mail
+    from models.notification_model import NotificationLog, OutboxMessage
+    from services.outbox_service import OutboxService
+
+    def smtp_down(*args, **kwargs):
+        raise ConnectionRefusedError("SMTP is down")
+    monkeypatch.setattr(flask_mail.Connection, "send", smtp_down)
+    monkeypatch.setitem(app.config, "OUTBOX_MAX_ATTEMPTS", 3)
+
+    book = make_books(1)[0]
+    borrower, waiting = make_user(), make_user()
+    assert client.post(f"/students/books/borrow/{book.id}", headers=auth_headers(borrower)).status_code == 200
+    assert client.post(f"/reservations/reserve/{book.id}", headers=auth_headers(waiting)).status_code == 201
+
+    # The return commits the notice with it and never touches SMTP
+    loan = BorrowedBook.query.one()
+    assert client.post(f"/students/books/return/{loan.id}", headers=auth_headers(borrower)).status_code == 200
+    assert ReservedBook.query.one().status == "notified"
+    queued = OutboxMessage.query.one()
+    assert (queued.topic, queued.status, queued.payload["email"]) == ("reservation_available", "pending", waiting.email)
+
+    # Failures back off exponentially
+    now = datetime.utcnow()
+    assert OutboxService.drain(now=now) == {"batches": 1, "sent": 0, "retried": 1, "failed": 0}
+    assert OutboxService.drain(now=now)["batches"] == 0
+    db.session.refresh(queued)
+    assert queued.attempts == 1 and queued.available_at == now + timedelta(seconds=app.config["OUTBOX_RETRY_BASE_SECONDS"])
+
+    monkeypatch.undo()
+    monkeypatch.setattr(app.extensions["mail"], "suppress", True)
+    with mail.record_messages() as sent:
+        report = OutboxService.drain(now=now + timedelta(minutes=1))
+    assert (report["sent"], [message.recipients for message in sent]) == (1, [[waiting.email]])
+    db.session.refresh(queued)
+    assert queued.status == "sent"
+    assert NotificationLog.query.filter_by(user_id=waiting.id, notification_type="reservation_available").count() == 1
+
+    # After OUTBOX_MAX_ATTEMPTS a message is given up on
+    monkeypatch.setattr(flask_mail.Connection, "send", smtp_down)
+    monkeypatch.setitem(app.config, "OUTBOX_MAX_ATTEMPTS", 2)
+    OutboxService.enqueue("reservation_available", [{"user_id": waiting.id, "email": waiting.email, "title": "T"}])
+    db.session.commit()
+    assert OutboxService.drain(now=now + timedelta(minutes=1))["retried"] == 1
+    assert OutboxService.drain(now=now + timedelta(hours=1))["failed"] == 1
+    assert OutboxMessage.query.filter_by(status="failed").count() == 1
+
+
+def test_uncollected_holds_expire_in_batches_and_pass_to_the_next_in_line(app, client, db_session, make_user, auth_headers, make_books):
+    from models.notification_model import OutboxMessage
+
+    books = make_books(2)
+    borrowers, queue = [make_user() for _ in books], [make_user() for _ in range(3)]
+    for book, borrower in zip(books, borrowers):
+        CirculationService.checkout(borrower.id, book.id)
+        for student in queue:
+            assert client.post(f"/reservations/reserve/{book.id}", headers=auth_headers(student)).status_code == 201
+    for book, borrower in zip(books, borrowers):
+        CirculationService.return_loan(user_id=borrower.id, book_id=book.id)
+
+    def statuses(book):
+        return [ReservedBook.query.filter_by(book_id=book.id, user_id=student.id).one().status for student in queue]
+    assert statuses(books[0]) == statuses(books[1]) == ["notified", "pending", "pending"]
+
+    # Within the pickup window nothing happens; after it, one hold per batch expires and the next student is told
+    window = timedelta(hours=app.config["HOLD_PICKUP_HOURS"])
+    assert ReservationService.expire_holds(now=datetime.utcnow() + window / 2)["expired"] == 0
+    report = ReservationService.expire_holds(now=datetime.utcnow() + window * 1.5, batch_size=1)
+    assert report == {"expired": 2, "promoted": 2, "batches": 2}
+    assert statuses(books[0]) == statuses(books[1]) == ["expired", "notified", "pending"]
+
+    # Borrowing collects the hold; cancelling a notified hold hands the copy on straight away
+    CirculationService.checkout(queue[1].id, books[0].id)
+    assert client.delete(f"/reservations/cancel/{books[1].id}", headers=auth_headers(queue[1])).status_code == 200
+    assert statuses(books[0]) == ["expired", "fulfilled", "pending"]
+    assert ReservedBook.query.filter_by(book_id=books[1].id, user_id=queue[2].id).one().status == "notified"
+    assert ReservationService.expire_holds(now=datetime.utcnow() + window / 2)["expired"] == 0
+
+    # A hold expiring with no copy left on the shelf notifies nobody
+    CirculationService.checkout(make_user().id, books[1].id)
+    assert ReservationService.expire_holds(now=datetime.utcnow() + window * 3) == {"expired": 1, "promoted": 0, "batches": 1}
+    emails = [message.payload["email"] for message in OutboxMessage.query.order_by(OutboxMessage.id)]
+    assert emails == [queue[0].email] * 2 + [queue[1].email] * 2 + [queue[2].email]
+
+
+def test_copies_added_by_an_admin_go_to_the_waitlist_in_one_batch(client, db_session, make_user, auth_headers, make_books, count_queries):
+    from models.notification_model import OutboxMessage
+
+    book = make_books(1)[0]
+    admin, borrower, queue = make_user(role="admin"), make_user(), [make_user() for _ in range(4)]
+    CirculationService.checkout(borrower.id, book.id)
+    for student in queue:
+        assert client.post(f"/reservations/reserve/{book.id}", headers=auth_headers(student)).status_code == 201
+
+    def notified():
+        return [row.user_id for row in ReservedBook.query.filter_by(book_id=book.id, status="notified").order_by(ReservedBook.id)]
+
+    # Raising the stock by two notifies the first two in line, in the same commit as the edit
+    response = client.put(f"/admin/books/update/{book.id}", json={"total_copies": 3}, headers=auth_headers(admin))
+    assert response.status_code == 200
+    assert notified() == [queue[0].id, queue[1].id]
+
+    response = client.post(f"/admin/books/{book.id}/copies", json={"count": 1}, headers=auth_headers(admin))
+    assert response.status_code == 201
+    assert notified() == [student.id for student in queue[:3]]
+
+    # Every shelved copy is promised: a copy back from repair frees nothing, and asking again is one cheap read
+    barcode = response.json["barcodes"][0]
+    for status in ("damaged", "available"):
+        assert client.put(f"/admin/copies/{barcode}", json={"status": status}, headers=auth_headers(admin)).status_code == 200
+    book_id = book.id
+    with count_queries() as counter:
+        assert ReservationService.promote({book_id: 5}) == []
+    assert counter.count == 1
+    assert len(notified()) == 3
+
+    # The loan coming back is the one copy nobody was promised
+    CirculationService.return_loan(user_id=borrower.id, book_id=book.id)
+    assert notified() == [student.id for student in queue]
+    emails = [message.payload["email"] for message in OutboxMessage.query.order_by(OutboxMessage.id)]
+    assert emails == [student.email for student in queue]
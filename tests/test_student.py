@@ -57,8 +57,8 @@ def view_books():
     print("\n🚀 Viewing Available Books...")
     response = test_api("GET", "/students/books", token=STUDENT_TOKEN)
 
-    if response.status_code == 200 and response.json():
-        BOOK_ID = response.json()[0]["id"]  # pick first available
+    if response.status_code == 200 and response.json()["books"]:
+        BOOK_ID = response.json()["books"][0]["id"]  # pick first available
         print(f"✅ Selected Book ID {BOOK_ID} for borrowing")
         return True
     print("❌ No books available.")